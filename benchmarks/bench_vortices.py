@@ -5,13 +5,16 @@ from timeit import default_timer as timer
 n = 8192
 Vortices.core_radius = 0.01
 
-pos = np.array(np.random.rand(2*n), dtype=np.float32).reshape((n,2))
-gamma = np.array(np.random.rand(n), dtype=np.float32)
+pos = np.random.rand(n, 2)
+gamma = np.random.rand(n)
 print("Computing induced velocity for %d vortices" % n)
 
-start = timer()
-vort = Vortices(pos, gamma)
-vel = vort.induced_velocity()
-elapsed = timer() - start
+elapsed = {}
+for dtype in (np.float64, np.float32):
+    start = timer()
+    vort = Vortices(pos, gamma, dtype=dtype)
+    vel = vort.induced_velocity()
+    elapsed[dtype] = timer() - start
+    print("%s: %f sec" % (np.dtype(dtype).name, elapsed[dtype]))
 
-print("Time: %f sec" % elapsed)
+print("Speedup with float32: %.2f" % (elapsed[np.float64] / elapsed[np.float32]))
@@ -0,0 +1,285 @@
+"""Benchmark suite for pysces
+
+Runs a set of benchmarks over a grid of parameters, and reports statistics
+of the timings and the peak memory allocated by each case:
+
+kernel
+    Velocity induced by N vortices on themselves, for each evaluator
+    (direct sum, fast multipole, treecode, vortex-in-cell) and dtype
+influence
+    Influence matrix of a body with n panels, and its inverse
+solve
+    Unsteady solve for the bound vortex strengths of a body with n panels,
+    with a wake of N vortices
+step
+    One step of each timestepper, for a flapping airfoil with a wake
+scaling
+    A run of many steps from the start, to show how the cost grows with the
+    length of the run
+
+Each case is run ``--warmup`` times untimed, then timed ``--repeat`` times.
+Peak memory is measured with :mod:`tracemalloc` in a separate call, since
+tracing slows down the computation.
+
+Usage::
+
+    python benchmarks/suite.py                   # run all benchmarks
+    python benchmarks/suite.py -k kernel --quick # a quick subset
+    python benchmarks/suite.py -o results.json   # save the results
+    python benchmarks/suite.py --compare baseline.json --threshold 0.2
+
+With ``--compare``, each case is compared with the same case in a file
+saved earlier by ``-o``, and the script exits with status 1 if the median
+time or the peak memory of any case increased by more than the threshold
+(a fraction, default 0.2).
+"""
+from __future__ import division, print_function
+
+import argparse
+import datetime
+import fnmatch
+import gc
+import itertools
+import json
+import math
+import platform
+import sys
+import tracemalloc
+from timeit import default_timer as timer
+
+import numpy as np
+from pysces import *
+
+EVALUATORS = {
+    'direct': lambda: None,
+    'fmm': FastMultipole,
+    'treecode': BarnesHut,
+    'vic': VortexInCell,
+}
+
+STEPPERS = {
+    'euler': ExplicitEuler,
+    'rk2': RungeKutta2,
+    'rk4': RungeKutta4,
+    'ab3': AdamsBashforth3,
+    'dopri': DormandPrince,
+}
+
+
+def random_vortices(num_vortices, dtype=np.float64, seed=0):
+    rng = np.random.RandomState(seed)
+    pos = rng.rand(num_vortices, 2)
+    gam = rng.randn(num_vortices) / num_vortices
+    return Vortices(pos, gam, dtype=dtype)
+
+
+def flapping_airfoil(num_points):
+    airfoil = naca_airfoil("2412", num_points)
+    airfoil = TransformedBody(airfoil, displacement=(-0.25, 0))
+    freq = 0.3 * 2 * np.pi
+    airfoil = Pitching(airfoil, 10, freq, phase=90)
+    return Heaving(airfoil, (0,0.2), freq, phase=0)
+
+
+# Each benchmark is called with one value of each of its parameters, and
+# returns a function of no arguments that runs the case once.
+
+def bench_kernel(num_vortices, dtype, evaluator):
+    vort = random_vortices(num_vortices, dtype)
+    vort.evaluator = EVALUATORS[evaluator]()
+    return vort.induced_velocity
+
+
+def bench_influence(num_panels):
+    bound = BoundVortices(naca_airfoil("0012", num_panels // 2 + 1))
+
+    def run():
+        bound.update_positions()
+        return bound.influence_inverse
+    return run
+
+
+def bench_solve(num_panels, num_vortices):
+    bound = BoundVortices(flapping_airfoil(num_panels // 2 + 1))
+    wake = random_vortices(num_vortices)
+    wake.positions = wake.positions + (1.5, -0.5)
+    bound.influence_inverse
+    return lambda: bound.update_strengths_unsteady(0.01, (1,0), wake)
+
+
+def bench_step(stepper, num_vortices, dtype, evaluator):
+    bound = BoundVortices(flapping_airfoil(20), dtype=dtype)
+    wake = random_vortices(num_vortices, dtype)
+    wake.positions = wake.positions + (1.5, -0.5)
+    wake.evaluator = EVALUATORS[evaluator]()
+    flow = STEPPERS[stepper](0.01, (1,0), bound, wake, dtype=dtype)
+    return flow.advance
+
+
+def bench_scaling(num_steps):
+    def run():
+        bound = BoundVortices(flapping_airfoil(20))
+        flow = RungeKutta2(0.01, (1,0), bound)
+        for i in range(num_steps):
+            flow.advance()
+    return run
+
+
+# name: (function, parameter grid, smaller grid for --quick, repeat)
+BENCHMARKS = {
+    'kernel': (bench_kernel,
+               {'num_vortices': [1024, 4096, 16384],
+                'dtype': ['float64', 'float32'],
+                'evaluator': ['direct', 'fmm', 'treecode', 'vic']},
+               {'num_vortices': [1024],
+                'dtype': ['float64'],
+                'evaluator': ['direct', 'treecode']}, None),
+    'influence': (bench_influence,
+                  {'num_panels': [32, 128, 512]},
+                  {'num_panels': [32, 128]}, None),
+    'solve': (bench_solve,
+              {'num_panels': [32, 128, 512],
+               'num_vortices': [0, 1000, 10000]},
+              {'num_panels': [32],
+               'num_vortices': [0, 1000]}, None),
+    'step': (bench_step,
+             {'stepper': sorted(STEPPERS),
+              'num_vortices': [100, 1000],
+              'dtype': ['float64', 'float32'],
+              'evaluator': ['direct', 'treecode']},
+             {'stepper': ['rk2', 'ab3'],
+              'num_vortices': [100],
+              'dtype': ['float64'],
+              'evaluator': ['direct']}, None),
+    'scaling': (bench_scaling,
+                {'num_steps': [100, 200, 400, 800]},
+                {'num_steps': [50, 100]}, 1),
+}
+
+
+def case_key(name, params):
+    return '%s[%s]' % (name, ','.join('%s=%s' % (k, params[k])
+                                      for k in sorted(params)))
+
+
+def cases(names, quick):
+    for name in names:
+        func, grid, quick_grid, repeat = BENCHMARKS[name]
+        if quick:
+            grid = quick_grid
+        keys = sorted(grid)
+        for values in itertools.product(*[grid[k] for k in keys]):
+            yield name, func, dict(zip(keys, values)), repeat
+
+
+def peak_memory(func):
+    """Return the peak memory (bytes) allocated during a call to func"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(func, params, repeat, warmup):
+    run = func(**params)
+    for i in range(warmup):
+        run()
+    times = []
+    for i in range(repeat):
+        gc.collect()
+        start = timer()
+        run()
+        times.append(timer() - start)
+    mean = sum(times) / len(times)
+    var = sum((t - mean)**2 for t in times) / max(len(times) - 1, 1)
+    return {'times': times, 'min': min(times),
+            'median': float(np.median(times)), 'mean': mean,
+            'stdev': math.sqrt(var), 'peak_memory': peak_memory(run)}
+
+
+def compare(results, baseline, threshold):
+    """Print the change of each case from the baseline
+
+    Returns the keys of cases whose median time or peak memory increased by
+    more than the given fraction.
+    """
+    old = dict((r['key'], r) for r in baseline['results'])
+    regressions = []
+    print('\n%-72s %10s %10s' % ('case', 'time', 'memory'))
+    for result in results:
+        key = result['key']
+        if key not in old:
+            print('%-72s %10s %10s' % (key, 'new', 'new'))
+            continue
+        time_ratio = result['median'] / old[key]['median']
+        mem_ratio = (result['peak_memory'] /
+                     max(old[key]['peak_memory'], 1))
+        flag = ''
+        if time_ratio > 1 + threshold or mem_ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print('%-72s %+9.1f%% %+9.1f%%%s' %
+              (key, 100 * (time_ratio - 1), 100 * (mem_ratio - 1), flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-k', '--select', action='append',
+                        help='run only benchmarks matching this pattern '
+                        '(e.g. "kernel" or "s*"); may be repeated')
+    parser.add_argument('--quick', action='store_true',
+                        help='use smaller parameter grids')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of timed runs of each case')
+    parser.add_argument('--warmup', type=int, default=1,
+                        help='number of untimed runs of each case')
+    parser.add_argument('-o', '--output', help='save results as JSON')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='compare with results saved earlier')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative increase flagged as a regression')
+    args = parser.parse_args(argv)
+
+    names = sorted(BENCHMARKS)
+    if args.select:
+        names = [name for name in names
+                 if any(fnmatch.fnmatch(name, pattern)
+                        for pattern in args.select)]
+    results = []
+    print('%-72s %10s %10s %12s' % ('case', 'median', 'stdev', 'memory'))
+    for name, func, params, repeat in cases(names, args.quick):
+        result = run_case(func, params, repeat or args.repeat,
+                          args.warmup if repeat is None else 0)
+        result.update(name=name, params=params, key=case_key(name, params))
+        results.append(result)
+        print('%-72s %10.5f %10.5f %10.1fMB' %
+              (result['key'], result['median'], result['stdev'],
+               result['peak_memory'] / 2**20))
+        sys.stdout.flush()
+
+    if args.output:
+        metadata = {'date': datetime.datetime.now().isoformat(),
+                    'python': platform.python_version(),
+                    'numpy': np.__version__,
+                    'platform': platform.platform(),
+                    'repeat': args.repeat, 'warmup': args.warmup,
+                    'quick': args.quick}
+        with open(args.output, 'w') as f:
+            json.dump({'metadata': metadata, 'results': results}, f,
+                      indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print('\n%d regressions' % len(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
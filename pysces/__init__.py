@@ -6,7 +6,16 @@ fluid flows.
 from .body import *
 from .panel import *
 from .force import *
+from .field import *
+from .fmm import *
+from .treecode import *
+from .vic import *
+from .profiler import *
 from .timestepper import *
+from .ensemble import *
+from .sweep import *
+from .trajectory import *
 from .vortex import *
+from .wake import *
 
 __version__ = "0.1"
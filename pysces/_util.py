@@ -0,0 +1,14 @@
+"""Small helpers shared by several modules"""
+import os
+
+
+def _replace(src, dst):
+    """Rename src to dst, overwriting dst if it exists
+
+    os.replace is not available in Python 2, and on Windows os.rename fails
+    if dst exists, so dst is removed first there (the replacement is then
+    not atomic).
+    """
+    if os.name == 'nt' and os.path.exists(dst):
+        os.remove(dst)
+    os.rename(src, dst)
@@ -205,22 +205,37 @@ def naca_airfoil(code, num_points, zero_thick_te=False, uniform=False):
 
 class TransformedBody(object):
     """Base class for rigid (Euclidean) transformations of existing bodies
+
+    The motion returned by :meth:`get_motion` is cached, and computed again
+    only when the time of the body, or the motion of the parent body,
+    changes.  The cached motion is shared by all callers, so it should not
+    be modified.
     """
     def __init__(self, body, angle=0, displacement=(0,0)):
         """angles are clockwise, in degrees"""
         self._parent = body
         self._body = body.get_body()
         self._motion = RigidMotion(-angle * np.pi / 180, displacement)
+        # (time, motion of parent, composed motion) when last computed
+        self._cache = None
 
     def get_body(self):
         return self._body
 
     def get_motion(self):
-        self._update()
-        return self._motion.compose(self._parent.get_motion())
+        time = self.time
+        parent_motion = self._parent.get_motion()
+        cache = self._cache
+        if (cache is None or cache[0] != time or
+                cache[1] is not parent_motion):
+            self._update()
+            cache = (time, parent_motion, self._motion.compose(parent_motion))
+            self._cache = cache
+        return cache[2]
 
     def set_motion(self, value):
         self._motion = value
+        self._cache = None
 
     @property
     def time(self):
@@ -229,6 +244,7 @@ class TransformedBody(object):
     @time.setter
     def time(self, value):
         self._body.time = value
+        self._cache = None
 
     def _update(self):
         # update body motion: subclasses override this
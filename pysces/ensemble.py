@@ -0,0 +1,368 @@
+"""Advance an ensemble of independent simulations together
+
+For parameter sweeps over many small simulations, the cost of each step is
+dominated by Python overhead rather than arithmetic.  The timesteppers in
+this module advance K simulations at once: the wakes are stored as stacked
+arrays of shape (K, N, 2), the bound vortex strengths of all the bodies are
+found by a single batched solve, and the induced velocities of all the
+members are computed by a single call to a batched kernel for each stage.
+
+All members share the timestep, the farfield velocity and the number of
+wake vortices, and their bodies must have the same number of panels.  The
+bodies may differ in shape and motion (e.g., pitching at different
+frequencies).
+"""
+from __future__ import division
+
+import numpy as np
+from .timestepper import _EulerMethod, _RungeKutta2Method, _RungeKutta4Method
+from .vortex import Vortices, _batched_velocity
+
+__all__ = ['EnsembleEuler', 'EnsembleRungeKutta2', 'EnsembleRungeKutta4']
+
+
+class Ensemble(object):
+    """Base class for timesteppers that advance an ensemble of simulations
+
+    This class is combined with the ``_advance`` method of a fixed-step
+    :class:`Timestepper`, which is used unchanged: positions and velocities
+    are stacked arrays of shape (K, N, 2), so the same formulas advance all
+    of the members together.
+
+    Parameters
+    ----------
+    dt : float
+        Timestep
+    Uinfty : array_like, optional
+        Farfield fluid velocity (default (1,0))
+    bounds : list of BoundVortices, optional
+        Bound elements representing the body of each member (default None)
+    wakes : list of Vortices, optional
+        Initial wake vortices of each member, all of the same length
+        (default None)
+    dtype : data-type, optional
+        Floating point type used to store and advance the wakes (default
+        float64)
+
+    Notes
+    -----
+    The core radius of each member's wake and bound vortices, and the
+    distance at which vortices are shed (:attr:`BoundVortices.wake_fac`),
+    are taken from its :class:`Vortices` and :class:`BoundVortices`.  The
+    batched sums are evaluated in blocks of the smallest
+    :attr:`Vortices.block_size` of the members.
+
+    Ensembles have no wake policies, recorders, tracers or checkpoints.
+    """
+
+    def __init__(self, dt, Uinfty=(1,0), bounds=None, wakes=None,
+                 dtype=np.float64):
+        if bounds is None and wakes is None:
+            raise ValueError("bounds or wakes must be specified")
+        self._dt = dt
+        self._dtype = np.dtype(dtype)
+        self._Uinfty = np.array(Uinfty, dtype=self._dtype)
+        self._bounds = None if bounds is None else list(bounds)
+        self._has_body = (bounds is not None)
+        if self._has_body:
+            self._setup_bounds()
+        self.initialize(wakes)
+
+    def _setup_bounds(self):
+        """Stack the panel geometry of the bodies, in the body-fixed frame"""
+        bounds = self._bounds
+        if len(set(b.num_panels for b in bounds)) > 1:
+            raise ValueError("bodies must have the same number of panels")
+        dtype = self._dtype
+        self._xcoll = np.array([b.collocation_pts for b in bounds], dtype)
+        self._normals = np.array([b.normals for b in bounds], dtype)
+        self._tangents = np.array([b.tangents for b in bounds], dtype)
+        self._xbound = np.array([b.vortices.positions for b in bounds], dtype)
+        self._trailing_edge = np.array([b.trailing_edge for b in bounds],
+                                       dtype)
+        self._wake_dir = np.array([b.wake_direction for b in bounds], dtype)
+        self._wake_fac = np.array([b.wake_fac for b in bounds])
+        self._bound_core_radius = np.array(
+            [b.vortices.core_radius for b in bounds])[:,np.newaxis,np.newaxis]
+        self._bound_block_size = min(b.vortices.block_size for b in bounds)
+        # the influence matrices do not change for rigid motions
+        self._influence_inverse = np.linalg.inv(
+            np.array([b.influence_matrix for b in bounds], dtype))
+
+    def initialize(self, wakes=None):
+        """Initialize the ensemble
+
+        Solve for panel strengths so that surface boundary conditions are
+        satisfied, and shed a particle into each wake so that overall
+        circulation is zero.
+        """
+        self._time = 0
+        if self._has_body:
+            num_members = len(self._bounds)
+        else:
+            num_members = len(wakes)
+        if wakes is None:
+            self._positions = np.zeros((num_members, 0, 2), self._dtype)
+            self._strengths = np.zeros((num_members, 0), self._dtype)
+            core_radius = [Vortices.core_radius] * num_members
+            block_size = [Vortices.block_size] * num_members
+        else:
+            if len(wakes) != num_members:
+                raise ValueError("need one wake for each body")
+            if len(set(len(w) for w in wakes)) > 1:
+                raise ValueError("wakes must have the same length")
+            self._positions = np.array(
+                [np.reshape(w.positions, (-1, 2)) for w in wakes],
+                self._dtype)
+            self._strengths = np.array([w.strengths for w in wakes],
+                                       self._dtype)
+            core_radius = [w.core_radius for w in wakes]
+            block_size = [w.block_size for w in wakes]
+        self._wake_core_radius = np.array(
+            core_radius)[:,np.newaxis,np.newaxis]
+        self._wake_block_size = block_size
+        self._num_members = num_members
+        self._birth_times = [0] * self._positions.shape[1]
+        if self._has_body:
+            self._solve(self._frames(0), self._dt, None,
+                        np.zeros(num_members))
+            self._shed()
+
+    @property
+    def time(self):
+        """Current simulation time"""
+        return self._time
+
+    @property
+    def dt(self):
+        """Timestep for the simulation"""
+        return self._dt
+
+    @property
+    def Uinfty(self):
+        """Farfield fluid velocity"""
+        return self._Uinfty
+
+    @property
+    def num_members(self):
+        """Number of simulations in the ensemble"""
+        return self._num_members
+
+    @property
+    def bound(self):
+        """Body panels of each member"""
+        return self._bounds
+
+    @property
+    def wake(self):
+        """Wake vortices of each member, as a list of :class:`Vortices`"""
+        wakes = [Vortices(x, g, dtype=self._dtype)
+                 for x, g in zip(self._positions, self._strengths)]
+        for k, wake in enumerate(wakes):
+            wake.core_radius = self._wake_core_radius[k,0,0]
+            wake.block_size = self._wake_block_size[k]
+        return wakes
+
+    @property
+    def wake_ages(self):
+        """Time since each wake vortex was shed (the same for all members)
+
+        Vortices in the initial wakes have age equal to the simulation time.
+        """
+        return self._time - np.array(self._birth_times, dtype=np.float64)
+
+    @property
+    def wake_positions(self):
+        """Positions of the wake vortices, shape (K, N, 2)"""
+        return self._positions
+
+    @property
+    def wake_strengths(self):
+        """Strengths of the wake vortices, shape (K, N)"""
+        return self._strengths
+
+    @property
+    def bound_strengths(self):
+        """Strengths of the bound vortices, shape (K, n)"""
+        return self._gam
+
+    def advance(self, dt=None):
+        """Advance all members of the ensemble for one timestep"""
+        if not dt:
+            dt = self._dt
+        self._advance(self._positions, dt)
+
+    def _frames(self, time):
+        """Move the bodies to the given time, and stack their motions
+
+        Returns the rotation matrices, displacements and their time
+        derivatives, with shapes (K,2,2), (K,2), (K,2,2) and (K,2).
+        """
+        theta = np.zeros(self._num_members)
+        thetadot = np.zeros(self._num_members)
+        x = np.zeros((self._num_members, 2))
+        xdot = np.zeros((self._num_members, 2))
+        for k, bound in enumerate(self._bounds):
+            bound.time = time
+            motion = bound.body.get_motion()
+            if motion:
+                theta[k] = motion.theta
+                thetadot[k] = motion.thetadot
+                x[k] = motion.x
+                xdot[k] = motion.xdot
+        c = np.cos(theta)
+        s = np.sin(theta)
+        R = np.array([[c, -s], [s, c]]).transpose(2, 0, 1)
+        Rdot = (np.array([[-s, -c], [c, -s]]) * thetadot).transpose(2, 0, 1)
+        dtype = self._dtype
+        return (R.astype(dtype), x.astype(dtype), Rdot.astype(dtype),
+                xdot.astype(dtype))
+
+    @staticmethod
+    def _map(R, x, q):
+        """Map stacked points q, shape (K,n,2), by stacked motions"""
+        return np.matmul(q, R.transpose(0, 2, 1)) + x[:,np.newaxis,:]
+
+    def _solve(self, frames, dt, coll_vel, circ):
+        """Solve for the bound strengths and newly shed vortex of each body
+
+        Parameters
+        ----------
+        frames : tuple
+            Motions of the bodies, as returned by :meth:`_frames`
+        dt : float
+            Timestep, which determines the location of the shed vortices
+        coll_vel : 3d array, shape (K,n,2)
+            Velocity induced by the wakes at the collocation points of each
+            body (in the inertial frame), or None if there is no wake
+        circ : 1d array, shape (K,)
+            Total bound circulation of each body
+
+        Notes
+        -----
+        This is :meth:`BoundVortices.update_strengths_unsteady` for all the
+        bodies at once.
+        """
+        R, x, Rdot, xdot = frames
+        normals = np.matmul(self._normals, R.transpose(0, 2, 1))
+        tangents = np.matmul(self._tangents, R.transpose(0, 2, 1))
+        vel = np.zeros_like(self._xcoll) if coll_vel is None else coll_vel
+        vel = vel - (np.matmul(self._xcoll, Rdot.transpose(0, 2, 1)) +
+                     xdot[:,np.newaxis,:])
+        vel += self._Uinfty
+        rhs0 = -np.sum(vel * normals, 2)
+        tangential = np.sum(vel * tangents, 2)
+        # new wake vortex, a distance wake_fac * Uinfty * dt from trailing
+        # edge
+        distance = self._wake_fac * np.sqrt(np.sum(self._Uinfty**2)) * dt
+        x_shed = self._trailing_edge + distance[:,np.newaxis] * self._wake_dir
+        # normal velocity at collocation points due to the shed vortices
+        # (in the body-fixed frame)
+        r = self._xcoll - x_shed[:,np.newaxis,:]
+        rsq = np.maximum(np.sum(r * r, 2), self._bound_core_radius[:,:,0]**2)
+        shed_vel = np.stack([-r[:,:,1], r[:,:,0]], 2) / (2 * np.pi *
+                                                         rsq[:,:,np.newaxis])
+        shed_normal = np.sum(shed_vel * self._normals, 2)
+        # bordered system, as in BoundVortices.update_strengths_unsteady
+        gam0 = np.matmul(self._influence_inverse, rhs0[:,:,np.newaxis])[:,:,0]
+        gam1 = np.matmul(self._influence_inverse,
+                         shed_normal[:,:,np.newaxis])[:,:,0]
+        gam_shed = (circ - np.sum(gam0, 1)) / (1 - np.sum(gam1, 1))
+        gam0 -= gam_shed[:,np.newaxis] * gam1
+        self._gam = gam0.astype(self._dtype)
+        self._x_shed = x_shed
+        self._gam_shed = gam_shed.astype(self._dtype)
+        # tangential velocity at the collocation points, for the pressure
+        self._coll_tangential = tangential + (
+            gam_shed[:,np.newaxis] * np.sum(shed_vel * self._tangents, 2))
+        # inertial positions of bound vortices and shed vortices
+        self._xbound_inertial = self._map(R, x, self._xbound)
+        self._x_shed_inertial = self._map(R, x, x_shed[:,np.newaxis,:])
+
+    def _bound_circulation(self):
+        return -np.sum(self._strengths, 1)
+
+    def _shed(self):
+        """Add the vortices most recently shed by the bodies to the wakes"""
+        self._positions = np.concatenate(
+            [self._positions, self._x_shed_inertial], 1)
+        self._strengths = np.concatenate(
+            [self._strengths, self._gam_shed[:,np.newaxis]], 1)
+        self._birth_times.append(self._time)
+        # keep the BoundVortices objects up to date (including the history
+        # of strengths used for the pressure)
+        for k, bound in enumerate(self._bounds):
+            bound.restore_state((self._time, self._gam[k], self._x_shed[k],
+                                 self._gam_shed[k], None, None,
+                                 self._coll_tangential[k]))
+
+    def _velocity(self, x, xvort, gam, core_radius, block_size, out=None):
+        if out is None:
+            out = np.zeros(x.shape, self._dtype)
+        return _batched_velocity(x, xvort, gam, core_radius, block_size,
+                                 out=out)
+
+    def _wake_on(self, x, pos):
+        """Velocity induced at x by wake vortices at pos"""
+        return self._velocity(x, pos, self._strengths, self._wake_core_radius,
+                              min(self._wake_block_size))
+
+    def _bound_on(self, x, vel, shed=False):
+        """Add the velocity induced at x by the bound (and shed) vortices"""
+        xvort, gam = self._xbound_inertial, self._gam
+        if shed:
+            xvort = np.concatenate([xvort, self._x_shed_inertial], 1)
+            gam = np.concatenate([gam, self._gam_shed[:,np.newaxis]], 1)
+        return self._velocity(x, xvort, gam, self._bound_core_radius,
+                              self._bound_block_size, vel)
+
+    def _wake_velocity(self, pos=None, dt=0):
+        """Compute the induced velocity at the wake vortices of each member
+
+        As :meth:`Timestepper._wake_velocity`, with positions and velocities
+        of shape (K, N, 2).
+        """
+        if pos is None:
+            pos = self._positions
+            vel = self._wake_on(pos, pos)
+            if self._has_body:
+                self._bound_on(pos, vel)
+        elif self._has_body:
+            self._positions = pos
+            num_wake = pos.shape[1]
+            # velocity induced by the wakes on themselves, and on the
+            # collocation points
+            frames = self._frames(self._time + dt)
+            xcoll = self._map(frames[0], frames[1], self._xcoll)
+            vel = self._wake_on(np.concatenate([pos, xcoll], 1), pos)
+            self._solve(frames, dt, vel[:,num_wake:],
+                        self._bound_circulation())
+            vel = self._bound_on(pos, vel[:,:num_wake], shed=True)
+        else:
+            self._positions = pos
+            vel = self._wake_on(pos, pos)
+        vel += self._Uinfty
+        return vel
+
+    def _update_flow(self, wake_pos, dt):
+        """Update the ensemble with new positions of wake vortices"""
+        self._positions = wake_pos
+        self._time += dt
+        if self._has_body:
+            frames = self._frames(self._time)
+            xcoll = self._map(frames[0], frames[1], self._xcoll)
+            coll_vel = self._wake_on(xcoll, wake_pos)
+            self._solve(frames, dt, coll_vel, self._bound_circulation())
+            self._shed()
+
+
+class EnsembleEuler(Ensemble, _EulerMethod):
+    """Ensemble timestepper using the explicit Euler method"""
+
+
+class EnsembleRungeKutta2(Ensemble, _RungeKutta2Method):
+    """Ensemble timestepper using 2nd-order Runge Kutta"""
+
+
+class EnsembleRungeKutta4(Ensemble, _RungeKutta4Method):
+    """Ensemble timestepper using 4th-order Runge Kutta"""
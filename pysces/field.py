@@ -0,0 +1,211 @@
+"""Evaluate the flow field on large sets of points
+
+A :class:`FlowField` combines the contributions of the wake vortices, the
+bound vortices of the body and the freestream, and evaluates the velocity,
+vorticity or streamfunction at any number of points (for instance, a grid
+for plotting).  Points are processed in tiles of bounded size, optionally in
+several threads, so memory use does not grow with the number of points.
+"""
+from __future__ import division
+
+import numpy as np
+from .treecode import BarnesHut
+from .vortex import _direct_velocity, _thread_pool
+
+__all__ = ['FlowField']
+
+
+def _direct_streamfunction(x, xvort, gam, core_radius, block_size, out):
+    """Add the streamfunction at points x due to vortices at xvort
+
+    Outside the core radius :math:`r_0`, the streamfunction of a vortex of
+    strength :math:`\\Gamma` is :math:`-\\Gamma \\log r / 2\\pi`; inside, it
+    is the streamfunction of solid-body rotation, consistent with the
+    regularized velocity of :meth:`Vortices.induced_velocity_single`.
+    """
+    rsq_min = core_radius**2
+    gam_fac = np.asarray(gam) / (-4 * np.pi)
+    for i in range(0, x.shape[0], block_size):
+        xi = x[i:i+block_size]
+        for j in range(0, xvort.shape[0], block_size):
+            rx = xi[:,0,np.newaxis] - xvort[np.newaxis,j:j+block_size,0]
+            ry = xi[:,1,np.newaxis] - xvort[np.newaxis,j:j+block_size,1]
+            rsq = rx * rx + ry * ry
+            if rsq_min > 0:
+                psi = (np.log(np.maximum(rsq, rsq_min)) +
+                       np.minimum(rsq / rsq_min, 1) - 1)
+            else:
+                with np.errstate(divide='ignore'):
+                    psi = np.log(rsq)
+            out[i:i+block_size] += np.dot(psi, gam_fac[j:j+block_size])
+    return out
+
+
+def _direct_vorticity(x, xvort, gam, radius, gaussian, block_size, out):
+    """Add the vorticity at points x due to vortices at xvort
+
+    The vorticity of each vortex is uniform within the given radius (the
+    regularization of :class:`Vortices`), or a Gaussian of that radius.
+    """
+    rsq_min = radius**2
+    gam_fac = np.asarray(gam) / (np.pi * rsq_min)
+    for i in range(0, x.shape[0], block_size):
+        xi = x[i:i+block_size]
+        for j in range(0, xvort.shape[0], block_size):
+            rx = xi[:,0,np.newaxis] - xvort[np.newaxis,j:j+block_size,0]
+            ry = xi[:,1,np.newaxis] - xvort[np.newaxis,j:j+block_size,1]
+            rsq = rx * rx + ry * ry
+            if gaussian:
+                omega = np.exp(-rsq / rsq_min)
+            else:
+                omega = (rsq < rsq_min).astype(np.float64)
+            out[i:i+block_size] += np.dot(omega, gam_fac[j:j+block_size])
+    return out
+
+
+class FlowField(object):
+    """Velocity, vorticity and streamfunction of the flow
+
+    For a :class:`Timestepper` ``flow``, the field at the current time is
+    ``FlowField(flow.wake, flow.bound, flow.Uinfty)``.
+
+    Parameters
+    ----------
+    wake : Vortices, optional
+        Wake vortices (default None)
+    bound : BoundVortices, optional
+        Bound vortices representing the body (default None)
+    Uinfty : array_like, optional
+        Farfield fluid velocity (default (1,0))
+    tile_size : int, optional
+        Maximum number of points evaluated at once (default 16384)
+    num_workers : int, optional
+        Number of threads among which tiles are divided (default 1)
+
+    Notes
+    -----
+    Velocities induced by the wake are computed by the wake's
+    ``evaluator``, if it has one.  If the evaluator is a
+    :class:`BarnesHut` treecode whose tree was built for the current wake
+    (for instance, during the last timestep), the tree is reused for all the
+    tiles.  Other evaluators are called once per tile.  The streamfunction
+    and vorticity are computed by direct summation.
+    """
+
+    def __init__(self, wake=None, bound=None, Uinfty=(1,0), tile_size=16384,
+                 num_workers=1):
+        self.wake = wake
+        self.bound = bound
+        self.Uinfty = np.array(Uinfty, dtype=np.float64)
+        self.tile_size = tile_size
+        self.num_workers = num_workers
+
+    def _sources(self):
+        """Return the vortices of the wake and the body
+
+        Each vortex set is a tuple (positions, strengths, core_radius,
+        block_size).
+        """
+        sources = []
+        wake = self.wake
+        if wake is not None and len(wake):
+            sources.append((np.reshape(wake.positions, (-1, 2)),
+                            wake.strengths, wake.core_radius,
+                            wake.block_size))
+        if self.bound is not None:
+            vort = self.bound.vortices
+            motion = self.bound.body.get_motion()
+            positions = vort.positions
+            if motion:
+                positions = motion.map_position(positions)
+            sources.append((positions, vort.strengths, vort.core_radius,
+                            vort.block_size))
+        return [(np.asarray(x, dtype=np.float64),
+                 np.asarray(gam, dtype=np.float64), core_radius, block_size)
+                for x, gam, core_radius, block_size in sources]
+
+    def _map_tiles(self, func, x, shape):
+        """Apply func to tiles of the points x, and reshape the result"""
+        pts = np.reshape(np.asarray(x, dtype=np.float64), (-1, 2))
+        starts = range(0, pts.shape[0], self.tile_size)
+        tile = lambda i: func(pts[i:i+self.tile_size])
+        if self.num_workers > 1 and len(starts) > 1:
+            results = _thread_pool(self.num_workers).map(tile, starts)
+        else:
+            results = [tile(i) for i in starts]
+        if not results:
+            return np.zeros(shape)
+        return np.reshape(np.concatenate(results), shape)
+
+    def velocity(self, x):
+        """Return the velocity at points x, an array of shape (..., 2)"""
+        sources = self._sources()
+        evaluator = None
+        if self.wake is not None and len(self.wake):
+            evaluator = self.wake.evaluator
+            if isinstance(evaluator, BarnesHut):
+                tree = evaluator.build(*sources[0][:2])
+
+        def tile(pts):
+            vel = np.zeros(pts.shape)
+            for k, (xvort, gam, core_radius, block_size) in enumerate(
+                    sources):
+                if k == 0 and isinstance(evaluator, BarnesHut):
+                    vel += tree.induced_velocity(pts, core_radius,
+                                                 evaluator.theta, block_size)
+                elif k == 0 and evaluator is not None:
+                    vel += evaluator.induced_velocity(pts, xvort, gam,
+                                                      core_radius,
+                                                      block_size=block_size)
+                else:
+                    _direct_velocity(pts, xvort, gam, core_radius,
+                                     block_size, out=vel)
+            vel += self.Uinfty
+            return vel
+
+        return self._map_tiles(tile, x, np.shape(x))
+
+    def streamfunction(self, x):
+        """Return the streamfunction at points x, an array of shape (...)
+
+        The streamfunction :math:`\\psi` satisfies :math:`u = \\partial
+        \\psi / \\partial y`, :math:`v = -\\partial \\psi / \\partial x`, and
+        is defined up to a constant.
+        """
+        sources = self._sources()
+
+        def tile(pts):
+            psi = self.Uinfty[0] * pts[:,1] - self.Uinfty[1] * pts[:,0]
+            for xvort, gam, core_radius, block_size in sources:
+                _direct_streamfunction(pts, xvort, gam, core_radius,
+                                       block_size, out=psi)
+            return psi
+
+        return self._map_tiles(tile, x, np.shape(x)[:-1])
+
+    def vorticity(self, x, radius=None):
+        """Return the vorticity at points x, an array of shape (...)
+
+        Parameters
+        ----------
+        x : array, shape (..., 2)
+            Points at which to evaluate the vorticity
+        radius : float, optional
+            If given, the vorticity of each vortex is spread as a Gaussian of
+            this radius, which gives a smooth field for plotting.  If None
+            (default), return the vorticity of the regularized vortices, which
+            is uniform within the core radius of each vortex, and zero
+            elsewhere.
+        """
+        sources = self._sources()
+
+        def tile(pts):
+            omega = np.zeros(pts.shape[0])
+            for xvort, gam, core_radius, block_size in sources:
+                _direct_vorticity(pts, xvort, gam,
+                                  core_radius if radius is None else radius,
+                                  radius is not None, block_size,
+                                  out=omega)
+            return omega
+
+        return self._map_tiles(tile, x, np.shape(x)[:-1])
@@ -0,0 +1,257 @@
+"""Fast multipole evaluation of velocities induced by point vortices
+
+The velocity induced by a vortex of strength :math:`\\Gamma_j` at
+:math:`z_j` is given in complex form by
+
+.. math:: u - i v = \\frac{q_j}{z - z_j}, \\qquad q_j = \\frac{\\Gamma_j}{2\\pi i}
+
+so the sum over all vortices can be approximated by the multipole and local
+expansions of Greengard and Rokhlin [1]_.
+"""
+from __future__ import division
+
+import numpy as np
+from .vortex import Vortices, _direct_velocity
+
+__all__ = ['FastMultipole']
+
+
+def _binomial_table(n):
+    """Return an array C with C[k,l] equal to the binomial coefficient (k l)"""
+    C = np.zeros((n + 1, n + 1))
+    C[:, 0] = 1
+    for k in range(1, n + 1):
+        C[k, 1:] = C[k-1, 1:] + C[k-1, :-1]
+    return C
+
+
+class FastMultipole(object):
+    """Fast multipole method for the velocity induced by point vortices
+
+    Sources and targets are sorted into a uniform quadtree.  Interactions
+    between well-separated boxes are computed with multipole and local
+    expansions truncated at order :attr:`order`, and interactions between
+    neighboring leaf boxes are computed by direct summation, using the same
+    regularization as :class:`Vortices`.
+
+    To use the method for a set of vortices, set its ``evaluator``::
+
+        vort.evaluator = FastMultipole(tol=1.e-8)
+
+    Parameters
+    ----------
+    tol : float, optional
+        Requested relative accuracy of the far-field expansions (default
+        1.e-6).  Determines the order of the expansions.
+    leaf_size : int, optional
+        Average number of particles per leaf box (default 32).  Smaller
+        values move work from direct summation to the expansions.
+    max_level : int, optional
+        Maximum depth of the quadtree (default 10).
+
+    Notes
+    -----
+    Boxes are never made narrower than the core radius, so that every pair
+    of particles closer than the core radius is handled by direct summation.
+    Expansion coefficients are scaled by powers of the box width, so the
+    translation operators are the same on every level of the tree.
+
+    References
+    ----------
+    .. [1] Greengard, L. and Rokhlin, V., "A fast algorithm for particle
+       simulations", J. Comput. Phys. 73, 325-348, 1987.
+    """
+
+    # error of the interaction-list expansions decreases like RATE**order
+    RATE = 0.4
+
+    def __init__(self, tol=1.e-6, leaf_size=32, max_level=10):
+        self.tol = tol
+        self.leaf_size = leaf_size
+        self.max_level = max_level
+
+    @property
+    def tol(self):
+        """Relative accuracy of the far-field expansions"""
+        return self._tol
+
+    @tol.setter
+    def tol(self, value):
+        if value <= 0:
+            raise ValueError("tolerance must be positive")
+        self._tol = value
+        self._order = max(2, int(np.ceil(np.log(value) / np.log(self.RATE))))
+        self._build_operators()
+
+    @property
+    def order(self):
+        """Number of terms retained in multipole and local expansions"""
+        return self._order
+
+    def _build_operators(self):
+        p = self._order
+        C = _binomial_table(2 * p)
+        k = np.arange(p)
+        # shifts between a parent box and its children, in units of the
+        # parent width, indexed by child position (ci, cj)
+        shifts = [((ci - 0.5) + 1j * (cj - 0.5)) / 2
+                  for ci in (0, 1) for cj in (0, 1)]
+        half = 0.5 ** k
+        self._m2m = []
+        self._l2l = []
+        for s in shifts:
+            power = np.triu(s ** np.subtract.outer(k, k).T.clip(0))
+            binom = C[:p, :p]
+            # multipole, child to parent: b_l = sum_k a_k C(l,k) 2^-k s^(l-k)
+            self._m2m.append(half[:, np.newaxis] * binom.T * power)
+            # local, parent to child: d_m = sum_l c_l C(l,m) s^(l-m) 2^-m
+            self._l2l.append(binom * power.T * half[np.newaxis, :])
+        # multipole to local for source box offset (ox, oy), in box widths
+        kl = np.add.outer(k, k)
+        sign = (-1.) ** k
+        self._m2l = {}
+        for ox in range(-3, 4):
+            for oy in range(-3, 4):
+                if max(abs(ox), abs(oy)) < 2:
+                    continue
+                delta = -(ox + 1j * oy)
+                self._m2l[ox, oy] = (C[kl, k[:, np.newaxis]] *
+                                     sign[np.newaxis, :] / delta ** (kl + 1))
+
+    def _num_levels(self, num_particles, width, core_radius):
+        levels = int(np.ceil(np.log(max(num_particles, 1) / self.leaf_size) /
+                             np.log(4)))
+        if core_radius > 0:
+            levels = min(levels, int(np.floor(np.log2(width / core_radius))))
+        return max(0, min(levels, self.max_level))
+
+    def induced_velocity(self, x, xvort, gam, core_radius, block_size=None):
+        """Compute the velocity induced at points x by vortices at xvort
+
+        Parameters
+        ----------
+        x : 2d array, shape (n,2)
+            Locations at which to compute induced velocity
+        xvort : 2d array, shape (m,2)
+            Locations of vortices
+        gam : 1d array, shape (m,)
+            Strengths of vortices
+        core_radius : float
+            Velocities are regularized as solid-body rotation within this
+            radius (see :meth:`Vortices.induced_velocity_single`)
+        block_size : int, optional
+            Number of targets and sources in each block of the direct sums
+            (default :attr:`Vortices.block_size`)
+
+        Returns
+        -------
+        vel : 2d array, shape (n,2)
+        """
+        if block_size is None:
+            block_size = Vortices.block_size
+        x = np.asarray(x, dtype=np.float64)
+        xvort = np.asarray(xvort, dtype=np.float64)
+        vel = np.zeros((x.shape[0], 2))
+        if x.shape[0] == 0 or xvort.shape[0] == 0:
+            return vel
+        allpts = np.vstack([x, xvort])
+        lower = allpts.min(axis=0)
+        width = np.max(allpts.max(axis=0) - lower)
+        # enlarge slightly so no particle lies on the upper boundary
+        width = max(width, core_radius) * (1 + 1.e-8) + 1.e-300
+        levels = self._num_levels(max(x.shape[0], xvort.shape[0]), width,
+                                  core_radius)
+        if levels < 2:
+            # no well-separated boxes: use direct summation
+            return _direct_velocity(x, xvort, gam, core_radius,
+                                    block_size, out=vel)
+        n = 2**levels
+        leaf_width = width / n
+        src_cell = np.floor((xvort - lower) / leaf_width).astype(int)
+        tgt_cell = np.floor((x - lower) / leaf_width).astype(int)
+
+        # upward pass: form multipole expansions in leaves, shift to parents
+        p = self._order
+        q = np.asarray(gam) / (2j * np.pi)
+        centers = lower + (src_cell + 0.5) * leaf_width
+        w = ((xvort[:,0] - centers[:,0]) +
+             1j * (xvort[:,1] - centers[:,1])) / leaf_width
+        terms = q[:, np.newaxis] * w[:, np.newaxis] ** np.arange(p)
+        leaf = src_cell[:,0] * n + src_cell[:,1]
+        mpole = np.zeros((n * n, p), dtype=complex)
+        for k in range(p):
+            mpole[:,k] = (np.bincount(leaf, terms[:,k].real, n * n) +
+                          1j * np.bincount(leaf, terms[:,k].imag, n * n))
+        mpoles = [None] * (levels + 1)
+        mpoles[levels] = mpole.reshape((n, n, p))
+        for lev in range(levels - 1, 1, -1):
+            child = mpoles[lev + 1]
+            parent = np.zeros((2**lev, 2**lev, p), dtype=complex)
+            for c, (ci, cj) in enumerate(((0,0), (0,1), (1,0), (1,1))):
+                parent += np.dot(child[ci::2, cj::2], self._m2m[c])
+            mpoles[lev] = parent
+
+        # downward pass: interaction lists, then shift locals to children
+        local = None
+        for lev in range(2, levels + 1):
+            m = 2**lev
+            box_width = width / m
+            if local is None:
+                local = np.zeros((m, m, p), dtype=complex)
+            else:
+                parent = local
+                local = np.empty((m, m, p), dtype=complex)
+                for c, (ci, cj) in enumerate(((0,0), (0,1), (1,0), (1,1))):
+                    local[ci::2, cj::2] = np.dot(parent, self._l2l[c])
+            padded = np.zeros((m + 6, m + 6, p), dtype=complex)
+            padded[3:3+m, 3:3+m] = mpoles[lev]
+            for pi in (0, 1):
+                for pj in (0, 1):
+                    acc = np.zeros((m // 2, m // 2, p), dtype=complex)
+                    # source parent must neighbor the target parent
+                    for ox in range(-2 - pi, 4 - pi):
+                        for oy in range(-2 - pj, 4 - pj):
+                            if max(abs(ox), abs(oy)) < 2:
+                                continue
+                            src = padded[pi+ox+3:pi+ox+3+m:2,
+                                         pj+oy+3:pj+oy+3+m:2]
+                            acc += np.dot(src, self._m2l[ox, oy])
+                    local[pi::2, pj::2] += acc / box_width
+
+        # evaluate local expansions at targets
+        tgt_centers = lower + (tgt_cell + 0.5) * leaf_width
+        w = ((x[:,0] - tgt_centers[:,0]) +
+             1j * (x[:,1] - tgt_centers[:,1])) / leaf_width
+        coefs = local[tgt_cell[:,0], tgt_cell[:,1]]
+        f = coefs[:, p - 1]
+        for k in range(p - 2, -1, -1):
+            f = f * w + coefs[:, k]
+        vel[:,0] = f.real
+        vel[:,1] = -f.imag
+
+        # near field: direct summation over neighboring leaves
+        order = np.argsort(leaf, kind='mergesort')
+        sorted_leaf = leaf[order]
+        xs = xvort[order]
+        gs = np.asarray(gam)[order]
+        starts = np.searchsorted(sorted_leaf, np.arange(n * n + 1))
+        tgt_leaf = tgt_cell[:,0] * n + tgt_cell[:,1]
+        tgt_order = np.argsort(tgt_leaf, kind='mergesort')
+        tgt_bounds = np.searchsorted(tgt_leaf[tgt_order],
+                                     np.arange(n * n + 1))
+        for cell in np.unique(tgt_leaf):
+            ci, cj = divmod(cell, n)
+            idx = []
+            for i in range(max(ci - 1, 0), min(ci + 2, n)):
+                lo = starts[i * n + max(cj - 1, 0)]
+                hi = starts[i * n + min(cj + 1, n - 1) + 1]
+                if hi > lo:
+                    idx.append(np.arange(lo, hi))
+            if not idx:
+                continue
+            idx = np.concatenate(idx)
+            targets = tgt_order[tgt_bounds[cell]:tgt_bounds[cell + 1]]
+            near = _direct_velocity(x[targets], xs[idx], gs[idx],
+                                    core_radius, block_size)
+            vel[targets] += near
+        return vel
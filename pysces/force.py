@@ -1,4 +1,224 @@
-__all__ = ['compute_forces']
+"""Forces on the body, computed from the impulse of the vorticity
 
-def compute_forces(body, wake):
-    return 0, 0
+The force and moment on a body in a two-dimensional incompressible flow
+whose total circulation is zero are given by the time derivatives of the
+linear and angular impulse of the vorticity (see Wu [1]_).  For point
+vortices of strengths :math:`\\Gamma_j` at positions :math:`x_j` (wake and
+bound vortices together), per unit density,
+
+.. math::
+
+   F = -\\frac{d}{dt} \\sum_j \\Gamma_j (y_j, -x_j)
+       + \\frac{d}{dt} (A_b V_b), \\qquad
+   M = \\frac{1}{2} \\frac{d}{dt} \\sum_j \\Gamma_j |x_j|^2
+
+where :math:`A_b` is the area of the body and :math:`V_b` the velocity of
+its centroid.  These hold in a frame in which the fluid at infinity is at
+rest, so the positions are measured in a frame moving with the freestream
+(which does not change the force, since the total circulation is zero).
+The sums need only the positions and strengths of the vortices, so they
+cost O(N) per step and no velocity evaluations.  The time derivatives are
+approximated by backward differences of the sums after successive steps.
+
+References
+----------
+.. [1] Wu, J. C., "Theory for aerodynamic force and moment in viscous
+   flows", AIAA Journal 19, 432-441, 1981.
+"""
+from __future__ import division
+
+import numpy as np
+
+__all__ = ['compute_forces', 'Impulse']
+
+
+def _moments(x, gam):
+    """Return the zeroth, first and second moments of point vortices"""
+    if x is None or len(gam) == 0:
+        return 0., np.zeros(2), 0.
+    x = np.reshape(np.asarray(x, dtype=np.float64), (-1, 2))
+    gam = np.asarray(gam, dtype=np.float64)
+    return np.sum(gam), np.dot(gam, x), np.dot(gam, np.sum(x * x, 1))
+
+
+def _body_area(body):
+    """Return the area and centroid (in the body frame) of a closed body"""
+    q = body.get_points(body_frame=True)
+    x, y = q[:,0], q[:,1]
+    x1, y1 = np.roll(x, -1), np.roll(y, -1)
+    cross = x * y1 - x1 * y
+    area = np.sum(cross) / 2
+    if abs(area) < 1.e-12:
+        return 0., np.zeros(2)
+    centroid = np.array([np.sum((x + x1) * cross),
+                         np.sum((y + y1) * cross)]) / (6 * area)
+    return abs(area), centroid
+
+
+def _backward_difference(times, samples):
+    """Return the time derivative of samples at the latest time
+
+    Uses the 2nd-order backward difference when three samples are given,
+    and the 1st-order difference when there are two.  Returns zeros if there
+    is only one sample.
+    """
+    t = times
+    f = samples
+    if len(t) < 2:
+        return np.zeros_like(f[-1])
+    if len(t) == 2:
+        return (f[1] - f[0]) / (t[1] - t[0])
+    t0, t1, t2 = t[-3:]
+    f0, f1, f2 = f[-3:]
+    return (f2 * (2 * t2 - t0 - t1) / ((t2 - t0) * (t2 - t1)) -
+            f1 * (t2 - t0) / ((t1 - t0) * (t2 - t1)) +
+            f0 * (t2 - t1) / ((t1 - t0) * (t2 - t0)))
+
+
+class Impulse(object):
+    """Moments of the vorticity of a simulation, at the most recent steps
+
+    A :class:`Timestepper` keeps one of these, updated after each step, from
+    which :func:`compute_forces` finds the force and moment on the body.
+
+    The moments are measured in a frame moving with the freestream, in
+    which the fluid at infinity is at rest: a point x at time t has position
+    x - Uinfty t.
+
+    Vortices removed from the wake by wake policies are assumed to continue
+    to drift with the freestream, so removing them does not change the
+    force.  In the moving frame they are at rest, so their moments are kept
+    in running sums that change only when vortices are removed.
+    """
+
+    # number of steps kept for the backward differences
+    num_samples = 3
+
+    def __init__(self, Uinfty=(1,0)):
+        self._Uinfty = np.array(Uinfty, dtype=np.float64)
+        self.reset()
+
+    def reset(self):
+        """Forget all samples and removed vortices"""
+        self._times = []
+        self._samples = []
+        # moments of removed vortices, in the moving frame
+        self._removed = [0., np.zeros(2), 0.]
+
+    def _moving_frame(self, time, moments):
+        """Transform moments to the frame moving with the freestream"""
+        s0, s1, s2 = moments
+        U = self._Uinfty
+        return (s0, s1 - s0 * U * time,
+                s2 - 2 * time * np.dot(U, s1) + time**2 * np.dot(U, U) * s0)
+
+    def remove(self, time, before, after):
+        """Record the removal of wake vortices
+
+        Parameters
+        ----------
+        time : float
+            Time at which vortices are removed
+        before, after : tuple of arrays
+            Positions and strengths of the wake before and after removal
+        """
+        m_before = _moments(*before)
+        m_after = _moments(*after)
+        removed = self._moving_frame(time, [b - a for b, a in
+                                            zip(m_before, m_after)])
+        self._removed = [r + s for r, s in zip(self._removed, removed)]
+
+    def update(self, time, wake=None, bound=None):
+        """Add a sample of the moments at the given time"""
+        moments = [0., np.zeros(2), 0.]
+        parts = []
+        if wake is not None and len(wake):
+            parts.append(_moments(wake.positions, wake.strengths))
+        body_momentum = np.zeros(2)
+        if bound is not None:
+            motion = bound.body.get_motion()
+            xvort = bound.vortices.positions
+            if motion:
+                xvort = motion.map_position(xvort)
+            parts.append(_moments(xvort, bound.vortices.strengths))
+            if motion:
+                area, centroid = _body_area(bound.body)
+                if area:
+                    body_momentum = area * motion.map_velocity(centroid)
+        for part in parts:
+            moments = [m + p for m, p in zip(moments, part)]
+        moments = self._moving_frame(time, moments)
+        m0, (m1x, m1y), m2 = [m + r for m, r in zip(moments, self._removed)]
+        # linear impulse, angular impulse and momentum of displaced fluid
+        sample = np.array([m1y, -m1x, -0.5 * m2,
+                           body_momentum[0], body_momentum[1], m1x, m1y])
+        if self._times and time == self._times[-1]:
+            self._samples[-1] = sample
+        else:
+            self._times.append(time)
+            self._samples.append(sample)
+            del self._times[:-self.num_samples]
+            del self._samples[:-self.num_samples]
+
+    def derivative(self):
+        """Return the time derivative of the samples at the latest time
+
+        Uses the 2nd-order backward difference when three samples are
+        available, and the 1st-order difference when there are two.
+        Returns zeros if there is only one sample.
+        """
+        if not self._samples:
+            return np.zeros(7)
+        return _backward_difference(self._times, self._samples)
+
+    def save_state(self):
+        """Return the samples and removed moments, as a dict of arrays"""
+        s0, s1, s2 = self._removed
+        return {'times': np.array(self._times, dtype=np.float64),
+                'samples': np.array(self._samples).reshape((-1, 7)),
+                'removed': np.array([s0, s1[0], s1[1], s2])}
+
+    def restore_state(self, state):
+        """Restore a state returned by :meth:`save_state`"""
+        self._times = list(np.array(state['times']))
+        self._samples = list(np.array(state['samples']))
+        s0, s1x, s1y, s2 = np.array(state['removed'])
+        self._removed = [s0, np.array([s1x, s1y]), s2]
+
+
+def compute_forces(flow, density=1., center=(0,0)):
+    """Return the force and moment on the body of a :class:`Timestepper`
+
+    The force and moment are found from the rate of change of the impulse
+    of the vorticity, which the timestepper updates after each step (see
+    :class:`Impulse`), so calling this function costs O(1).  The values
+    refer to the time of the latest step, and are computed by backward
+    differences, so they are zero at the initial time, and first order
+    accurate after the first step.
+
+    Parameters
+    ----------
+    flow : Timestepper
+        The simulation
+    density : float, optional
+        Fluid density (default 1)
+    center : array_like, optional
+        Point about which the moment is computed (default (0,0))
+
+    Returns
+    -------
+    fx, fy : float
+        Components of the force on the body (drag and lift, for a
+        freestream in the x direction)
+    moment : float
+        Moment on the body (counterclockwise positive)
+    """
+    rate = flow.impulse.derivative()
+    # the center, in the frame moving with the freestream
+    cx, cy = np.asarray(center) - np.asarray(flow.Uinfty) * flow.time
+    # moment about center: the second moment about center is
+    # m2 - 2 c . m1 + |c|^2 m0, and m0 is constant
+    fx = density * (-rate[0] + rate[3])
+    fy = density * (-rate[1] + rate[4])
+    moment = density * (-rate[2] - (cx * rate[5] + cy * rate[6]))
+    return fx, fy, moment
@@ -2,6 +2,14 @@ import numpy as np
 
 __all__ = ['RigidMotion']
 
+def _float_type(q):
+    """Floating point type in which to map the array q
+
+    Single precision arrays are mapped in single precision; anything else
+    is mapped in double precision.
+    """
+    return np.result_type(np.asarray(q).dtype, np.float32)
+
 class RigidMotion(object):
     """A class representing rigid body motions, elements of TSE(2)"""
 
@@ -100,13 +108,16 @@ class RigidMotion(object):
 
         The group action of the element (R, x) is given by
             q -> R . q + x
+
+        Arrays of type float32 are mapped (and returned) in single precision.
         """
+        dtype = _float_type(q)
         if self._theta:
-            q_new = np.dot(q, np.transpose(self._R))
+            q_new = np.dot(q, np.transpose(self._R).astype(dtype))
         else:
-            q_new = np.array(q, copy=True)
+            q_new = np.array(q, dtype=dtype)
         if self._x.any():
-            q_new += self._x
+            q_new += self._x.astype(dtype)
             # if q.ndim == 1:
                 # q_new += self._x
             # else:
@@ -121,10 +132,11 @@ class RigidMotion(object):
         The tangent action is given by
             qdot -> R . qdot
         """
+        dtype = _float_type(qdot)
         if self._theta:
-            return np.dot(qdot, np.transpose(self._R))
+            return np.dot(qdot, np.transpose(self._R).astype(dtype))
         else:
-            return np.array(qdot, copy=True)
+            return np.array(qdot, dtype=dtype)
 
     def map_velocity(self, q, qdot=None):
         """Return the velocity of the transformed base point q, velocity qdot
@@ -132,13 +144,14 @@ class RigidMotion(object):
         If transformation is (R, x), then
             d/dt (R, x) q = Rdot q + R qdot + xdot
         """
-        qdot_new = np.zeros_like(q, dtype="float64")
+        dtype = _float_type(q)
+        qdot_new = np.zeros_like(q, dtype=dtype)
         if self._thetadot:
-            qdot_new += np.dot(q, np.transpose(self._Rdot))
+            qdot_new += np.dot(q, np.transpose(self._Rdot).astype(dtype))
         if self._theta and qdot is not None and qdot.any():
-            qdot_new += np.dot(qdot, np.transpose(self._R))
+            qdot_new += np.dot(qdot, np.transpose(self._R).astype(dtype))
         if self._xdot.any():
-            qdot_new += self._xdot
+            qdot_new += self._xdot.astype(dtype)
             # if q.ndim == 1:
                 # qdot_new += self._xdot
             # else:
@@ -2,16 +2,35 @@ from __future__ import division
 
 import numpy as np
 import sys
+from .force import _backward_difference
 from .vortex import Vortices
 
 __all__ = ['BoundVortices', 'BoundSourceDoublets']
 
 class BoundVortices(object):
-    """A class for bound vortex panels"""
-
-    def __init__(self, body, Uinfty=(1,0)):
+    """A class for bound vortex panels
+
+    Parameters
+    ----------
+    body : Body
+        The body whose surface is represented by the panels
+    Uinfty : array_like, optional
+        Farfield fluid velocity (default (1,0)), used to orient the panels
+    dtype : data-type, optional
+        Floating point type of the panel geometry, influence matrix and
+        vortex strengths (default float64)
+    """
+
+    # number of solves kept for the time derivative of the potential
+    num_history = 3
+    # default distance of a newly shed vortex from the trailing edge, as a
+    # fraction of Uinfty * dt
+    wake_fac = 0.25
+
+    def __init__(self, body, Uinfty=(1,0), dtype=np.float64):
         self._body = body
         self._time = 0
+        self._dtype = np.dtype(dtype)
         self._update(Uinfty)
 
     def _update(self, Uinfty=(1,0)):
@@ -20,6 +39,7 @@ class BoundVortices(object):
         q = self._body.get_points(body_frame=True)
         dq = np.diff(q, axis=0)
         self._numpanels = dq.shape[0]
+        self._lengths = np.linalg.norm(dq, axis=1).astype(self._dtype)
         self._tangents = dq / np.linalg.norm(dq, axis=1)[:,np.newaxis]
         self._normals = np.transpose(np.array([dq[:,1], -dq[:,0]]) /
                                      np.linalg.norm(dq, axis=1))
@@ -36,6 +56,9 @@ class BoundVortices(object):
         top, = np.where(np.dot(dq, Uinfty) <= 0)
         xvort[top] = q75[top]
         self._xcoll[top] = q25[top]
+        self._xcoll = self._xcoll.astype(self._dtype)
+        self._tangents = self._tangents.astype(self._dtype)
+        self._normals = self._normals.astype(self._dtype)
         # find trailing edge and wake vortex direction
         if np.linalg.norm(q[0] - q[-1]) < 0.005:
             # closed body
@@ -46,8 +69,19 @@ class BoundVortices(object):
             # thin airfoil
             self._trailing_edge = q[0]
             self._wake_dir = -dq[0] / np.linalg.norm(dq[0])
-        self._vortices = Vortices(xvort)
+        self._trailing_edge = self._trailing_edge.astype(self._dtype)
+        self._wake_dir = self._wake_dir.astype(self._dtype)
+        self._vortices = Vortices(xvort, dtype=self._dtype)
         self._influence_matrix = None
+        self._influence_inverse = None
+        self._tangential_matrix = None
+        self._x_shed = None
+        self._gam_shed = None
+        # tangential velocity at the collocation points, relative to the
+        # body, induced by everything except the bound vortices
+        self._coll_tangential = np.zeros(self._numpanels, dtype=self._dtype)
+        # times and potential jumps of the most recent solves
+        self._history = []
 
     def update_positions(self):
         # If non-rigid bodies are used, update panel positions here.
@@ -55,22 +89,74 @@ class BoundVortices(object):
         # Note that if the only motion is rigid body motion, the panel positions
         # do not need to be updated, since they are in body-fixed frame
 
-        # need to recompute influence matrix when points change
+        # need to recompute influence matrix (and its inverse) when points
+        # change
         self._influence_matrix = None
+        self._influence_inverse = None
+        self._tangential_matrix = None
+
+    def _influence(self, directions):
+        """Velocity component along the given direction at each collocation
+        point, due to each unit-strength bound vortex"""
+        n = self._numpanels
+        A = np.empty((n, n), dtype=self._dtype)
+        xvort = self._vortices.positions
+        rsq_min = self._vortices.core_radius**2
+        block = self._vortices.block_size
+        for i in range(0, n, block):
+            xcoll = self._xcoll[i:i+block]
+            d = directions[i:i+block]
+            rx = xcoll[:,0,np.newaxis] - xvort[np.newaxis,:,0]
+            ry = xcoll[:,1,np.newaxis] - xvort[np.newaxis,:,1]
+            rsq = np.maximum(rx * rx + ry * ry, rsq_min)
+            # same operations as induced_velocity_single, with gam = 1
+            u = 1 / (2 * np.pi) * -ry / rsq
+            v = 1 / (2 * np.pi) * rx / rsq
+            A[i:i+block] = u * d[:,0,np.newaxis] + v * d[:,1,np.newaxis]
+        return A
 
     @property
     def influence_matrix(self):
+        """Normal velocity at each collocation point due to each bound vortex
+
+        Entry (i, j) is the normal velocity at collocation point i induced by
+        a unit-strength vortex at bound vortex j.  All pairs are computed at
+        once, in blocks of ``vortices.block_size`` collocation points.
+        """
         if self._influence_matrix is None:
             # time to recompute
-            n = self._numpanels
-            A = np.zeros((n, n))
-            for j, vort in enumerate(self._vortices):
-                vel = self._vortices.induced_velocity_single(self._xcoll,
-                                                             vort[0], 1)
-                A[:, j] = np.sum(vel * self._normals, 1)
-            self._influence_matrix = A
+            self._influence_matrix = self._influence(self._normals)
+            self._influence_inverse = None
         return self._influence_matrix
 
+    @property
+    def influence_inverse(self):
+        """Inverse of the influence matrix
+
+        Computed once and cached until the panel positions change, so that
+        each solve with the influence matrix costs O(n^2) rather than
+        O(n^3).
+        """
+        A = self.influence_matrix
+        if self._influence_inverse is None:
+            self._influence_inverse = np.linalg.inv(A)
+        return self._influence_inverse
+
+    @property
+    def dtype(self):
+        """Floating point type used for the panels"""
+        return self._dtype
+
+    @property
+    def trailing_edge(self):
+        """Location of the trailing edge, in the body-fixed frame"""
+        return self._trailing_edge
+
+    @property
+    def wake_direction(self):
+        """Unit vector along which vortices are shed, in the body frame"""
+        return self._wake_dir
+
     @property
     def num_panels(self):
         return self._numpanels
@@ -83,13 +169,21 @@ class BoundVortices(object):
     def normals(self):
         return self._normals
 
+    @property
+    def lengths(self):
+        """Length of each panel"""
+        return self._lengths
+
     def update_strengths(self, Uinfty=(1,0)):
         """Update vortex strengths"""
         rhs = self.compute_rhs(Uinfty)
-        self._vortices.strengths = np.linalg.solve(self.influence_matrix, rhs)
+        self._vortices.strengths = np.dot(self.influence_inverse, rhs)
+        # steady flow: no time derivative of the potential
+        self._history = []
+        self._record_history()
 
     def update_strengths_unsteady(self, dt, Uinfty=(1,0), wake=None, circ=None,
-                                  wake_fac=0.25):
+                                  wake_fac=None):
         """Update strengths for unsteady calculation
 
         Shed a new wake panel (not added into wake)
@@ -108,21 +202,20 @@ class BoundVortices(object):
             assuming overall circulation (body + wake) is zero
         wake_fac : float, optional
             New wake vortex is placed a distance wake_fac * Uinfty * dt from
-            trailing edge (see Katz & Plotkin, p390).
+            trailing edge (see Katz & Plotkin, p390).  If None (default), use
+            the attribute :attr:`wake_fac` (0.25 unless changed).
         """
 
         # determine new wake vortex position (in body-fixed frame)
+        if wake_fac is None:
+            wake_fac = self.wake_fac
         distance = wake_fac * np.sqrt(Uinfty[0]**2 + Uinfty[1]**2) * dt
-        x_shed = self._trailing_edge + distance * self._wake_dir
+        x_shed = (self._trailing_edge +
+                  distance * self._wake_dir).astype(self._dtype)
         # compute velocity induced on collocation points by newly shed vortex
         # (done in the body-fixed frame)
         shed_vel = self._vortices.induced_velocity_single(self._xcoll, x_shed, 1)
         shed_normal = np.sum(shed_vel * self._normals, 1)
-        # determine overall influence matrix, including newly shed vortex
-        # last equation: sum of all the vortex strengths = total circulation
-        A = np.vstack([np.hstack([self.influence_matrix,
-                                  shed_normal[:,np.newaxis]]),
-                       np.ones((1, self._numpanels + 1))])
 
         rhs0 = self.compute_rhs(Uinfty, wake)
         if circ is None:
@@ -130,12 +223,103 @@ class BoundVortices(object):
                 circ = 0
             else:
                 circ = -wake.circulation
-        rhs = np.hstack([rhs0, circ])
 
-        gam = np.linalg.solve(A, rhs)
-        self._vortices.strengths = gam[:-1]
+        # The overall system, including the newly shed vortex, is
+        #   [ A   b ] [ gam      ]   [ rhs0 ]
+        #   [ 1^T 1 ] [ gam_shed ] = [ circ ]
+        # where b = shed_normal and the last equation says the sum of all
+        # the vortex strengths is the total circulation.  Eliminate gam
+        # using the cached inverse of A (Schur complement):
+        #   gam = A^-1 rhs0 - gam_shed A^-1 b
+        Ainv = self.influence_inverse
+        gam0 = np.dot(Ainv, rhs0)
+        gam1 = np.dot(Ainv, shed_normal)
+        gam_shed = (circ - np.sum(gam0)) / (1 - np.sum(gam1))
+        gam0 -= gam_shed * gam1
+        self._vortices.strengths = gam0
         self._x_shed = x_shed
-        self._gam_shed = gam[-1]
+        self._gam_shed = self._dtype.type(gam_shed)
+        self._coll_tangential += gam_shed * np.sum(shed_vel * self._tangents,
+                                                   1)
+        # a solve at time t + dt replaces any solves since time t (e.g., at
+        # the intermediate stages of a Runge-Kutta step)
+        latest = self._time - dt * (1 - 1.e-6)
+        while self._history and self._history[-1][0] > latest:
+            self._history.pop()
+        self._record_history()
+
+    def _record_history(self):
+        """Save the jump in potential across each panel at the current time
+
+        The jump in potential across panel j is the sum of the strengths of
+        the bound vortices from panel j to the end of the body.
+        """
+        gam = self._vortices.strengths
+        self._history.append((self._time, np.cumsum(gam[::-1])[::-1]))
+        del self._history[:-self.num_history]
+
+    def pressure(self, density=1.):
+        """Return the pressure difference across each panel
+
+        The pressure difference is found from the unsteady Bernoulli equation
+        (see Katz & Plotkin, section 13.8).  At the collocation point of panel
+        j, the pressure on the side opposite the normal, minus the pressure on
+        the side of the normal, is
+
+        .. math::
+
+           \\Delta p_j = \\rho \\left( \\bar u_j \\frac{\\Gamma_j}{\\Delta s_j}
+               - \\frac{\\partial}{\\partial t} \\sum_{k \\ge j} \\Gamma_k
+               \\right)
+
+        where :math:`\\Gamma_k` are the strengths of the bound vortices,
+        :math:`\\Delta s_j` is the length of panel j, and :math:`\\bar u_j`
+        is the tangential velocity relative to the body, averaged across the
+        panel.  The force on panel j is ``dp[j] * lengths[j] * normals[j]``.
+
+        The velocities induced by the wake, the freestream and the body
+        motion are those computed for the last solve, and the time
+        derivative is a backward difference of the strengths at the last few
+        solves, so no velocities are evaluated here other than those due to
+        the bound vortices themselves.
+
+        Parameters
+        ----------
+        density : float, optional
+            Fluid density (default 1)
+
+        Returns
+        -------
+        dp : 1d array, shape (n,)
+            Pressure difference across each panel
+
+        Notes
+        -----
+        For a thin airfoil, the last point of the body is the leading edge,
+        where the pressure difference vanishes, and the sum is the jump in
+        potential across the panel.  For a closed body, :math:`\\Delta p_j` is
+        the pressure of the fluid inside the body minus that outside, up to a
+        constant.  This gives the loads on the body only for thin bodies, or
+        when the body is not accelerating, so that the pressure inside is
+        nearly uniform.
+
+        With a multistage timestepper, the solves at intermediate stages are
+        discarded from the history when the step is completed, so the time
+        derivative uses the strengths at the end of the last few steps.
+        """
+        if self._tangential_matrix is None:
+            self._tangential_matrix = self._influence(self._tangents)
+        gam = self._vortices.strengths
+        vel = self._coll_tangential + np.dot(self._tangential_matrix, gam)
+        times = [t for t, _ in self._history]
+        rate = _backward_difference(times, [phi for _, phi in self._history])
+        return density * (vel * gam / self._lengths - rate)
+
+    def pressure_coefficient(self, Uinfty=(1,0)):
+        """Return the pressure difference across each panel, divided by
+        the dynamic pressure of the freestream (see :meth:`pressure`)"""
+        qinf = 0.5 * (Uinfty[0]**2 + Uinfty[1]**2)
+        return self.pressure() / qinf
 
     def compute_rhs(self, Uinfty=(1,0), wake=None):
         # get collocation points and normals
@@ -145,21 +329,63 @@ class BoundVortices(object):
         if motion:
             xcoll_inertial = motion.map_position(self._xcoll)
             normals_inertial = motion.map_vector(self._normals)
+            tangents_inertial = motion.map_vector(self._tangents)
         else:
             xcoll_inertial = self._xcoll
             normals_inertial = self._normals
+            tangents_inertial = self._tangents
         # velocity induced by wake
         if wake:
-            vel = wake.induced_velocity(xcoll_inertial)
+            vel = wake.induced_velocity(xcoll_inertial).astype(self._dtype)
         else:
-            vel = np.zeros((self._numpanels, 2))
+            vel = np.zeros((self._numpanels, 2), dtype=self._dtype)
         # assume body is not deforming: only motion is translation/rotation
         if motion:
             vel -= motion.map_velocity(self._xcoll)
-        vel += np.array(Uinfty)
+        vel += np.array(Uinfty, dtype=self._dtype)
+        # save the tangential velocity, for computing the pressure
+        self._coll_tangential = np.sum(vel * tangents_inertial, 1)
         # compute -v . n
         return -np.sum(vel * normals_inertial, 1)
 
+    def save_state(self):
+        """Return the state of the panels, for use with :meth:`restore_state`
+
+        The state consists of the time, the strengths of the bound vortices,
+        the location and strength of the newly shed vortex, and what
+        :meth:`pressure` needs: the times and potential jumps of the most
+        recent solves, and the tangential velocity at the collocation points.
+        """
+        times = np.array([t for t, _ in self._history], dtype=np.float64)
+        jumps = np.array([phi for _, phi in self._history],
+                         dtype=self._dtype).reshape((-1, self._numpanels))
+        return (self._time, np.array(self._vortices.strengths),
+                self._x_shed, self._gam_shed, times, jumps,
+                np.array(self._coll_tangential))
+
+    def restore_state(self, state):
+        """Restore a state returned by :meth:`save_state`
+
+        If the times and potential jumps in the state are None, the current
+        strengths are added to the history of solves instead, replacing any
+        solves at the same or later times (this is how an ensemble keeps the
+        panels of its members up to date).  If the tangential velocity is
+        None, it is left unchanged.
+        """
+        (time, strengths, self._x_shed, self._gam_shed, times, jumps,
+         tangential) = state
+        self.time = time
+        self._vortices.strengths = strengths
+        if tangential is not None:
+            self._coll_tangential = np.array(tangential, dtype=self._dtype)
+        if times is None:
+            while self._history and self._history[-1][0] >= time:
+                self._history.pop()
+            self._record_history()
+        else:
+            self._history = [(t, np.array(phi))
+                             for t, phi in zip(times, jumps)]
+
     def get_newly_shed(self):
         """Return newly shed wake vortex in the inertial frame
 
@@ -193,6 +419,11 @@ class BoundVortices(object):
     def vortices(self):
         return self._vortices
 
+    @property
+    def body(self):
+        """The body represented by the panels"""
+        return self._body
+
     @property
     def collocation_pts(self):
         return self._xcoll
@@ -0,0 +1,257 @@
+"""Measure where the time goes in a simulation
+
+A :class:`Profiler` attached to a :class:`Timestepper` records, for each
+step, the wall time spent in each phase of the computation, the number of
+calls, and the number of pairwise vortex interactions.  It works by
+replacing methods of the timestepper, its body and panels and its wake with
+timed wrappers, which are removed again by :meth:`Profiler.detach`, so a
+simulation without a profiler runs exactly the same code as before.
+
+The phases are:
+
+``advance``
+    A whole step (its own time is the time spent in the integrator itself)
+``solve``
+    Solving for the strengths of the bound vortices
+    (:meth:`BoundVortices.update_strengths_unsteady`)
+``rhs``
+    The right-hand side of the solve (:meth:`BoundVortices.compute_rhs`)
+``wake_velocity``
+    Velocity induced by the wake vortices, on themselves, on the tracers
+    and on the collocation points of the body
+``bound_velocity``
+    Velocity induced by the bound vortices
+``shed_velocity``
+    Velocity induced by the vortex shed at an intermediate stage of a step
+``motion``
+    Computing the motion of the body (:meth:`Body.get_motion`)
+``impulse``
+    Updating the impulse used by :func:`compute_forces`
+``policies``, ``recorders``
+    Wake policies and recorders
+
+Phases are nested (for instance, ``rhs`` is called by ``solve``, and calls
+``wake_velocity``), so each phase reports both its total time and its own
+time, which excludes the phases it calls.  The own times of all the phases
+add up to the time of the steps.
+"""
+from __future__ import division
+
+import time
+
+import numpy as np
+
+__all__ = ['Profiler']
+
+try:
+    _clock = time.perf_counter
+except AttributeError:
+    _clock = time.time
+
+
+def _new_phase():
+    return {'calls': 0, 'time': 0., 'self_time': 0., 'pairs': 0}
+
+
+def _num_points(x):
+    """Number of points in an array of shape (..., 2)"""
+    return np.reshape(x, (-1, 2)).shape[0]
+
+
+def _add_phases(total, phases):
+    for name, phase in phases.items():
+        entry = total.setdefault(name, _new_phase())
+        for key, value in phase.items():
+            entry[key] += value
+
+
+class Profiler(object):
+    """Per-phase timers and counters for a :class:`Timestepper`
+
+    Pass the profiler to a timestepper in the ``profiler`` argument, or call
+    :meth:`attach`::
+
+        profiler = Profiler()
+        flow = RungeKutta2(dt, Uinfty, bound, profiler=profiler)
+        for i in range(num_steps):
+            flow.advance()
+        print(profiler.summary())
+
+    Parameters
+    ----------
+    callbacks : list, optional
+        Functions called after each step as ``callback(stepper, record)``,
+        where ``record`` is the record of the step (see :attr:`steps`)
+        (default None)
+    keep_steps : bool, optional
+        If True (default), keep the record of every step in :attr:`steps`.
+        If False, only the totals are kept.
+
+    Notes
+    -----
+    The wake is instrumented when the profiler is attached, so if the
+    timestepper is initialized again (which creates a new wake), the
+    profiler must be attached again.  Pair counts are the number of
+    interactions a direct sum would compute (targets times sources), also
+    when the wake uses a fast summation method.
+    """
+
+    def __init__(self, callbacks=None, keep_steps=True):
+        self.callbacks = list(callbacks or [])
+        self.keep_steps = keep_steps
+        self._stepper = None
+        self._wrapped = []
+        self.reset()
+
+    def reset(self):
+        """Discard all the measurements"""
+        self._steps = []
+        self._num_steps = 0
+        self._totals = {}
+        self._elapsed = 0.
+        self._phases = {}
+        # [phase, start time, time spent in nested phases]
+        self._stack = []
+
+    def add_callback(self, callback):
+        """Add a function called after each step"""
+        self.callbacks.append(callback)
+
+    @property
+    def stepper(self):
+        """The timestepper to which the profiler is attached, or None"""
+        return self._stepper
+
+    @property
+    def num_steps(self):
+        """Number of steps measured"""
+        return self._num_steps
+
+    @property
+    def steps(self):
+        """Record of each step, as a list of dicts
+
+        Each record has keys ``step`` (number of the step), ``time`` and
+        ``dt`` (time at the end of the step and size of the step),
+        ``num_vortices`` (number of wake vortices at the end of the step),
+        ``elapsed`` (wall time of the step, in seconds) and ``phases``, which
+        maps the name of each phase to a dict with keys ``calls``, ``time``,
+        ``self_time`` and ``pairs``.
+        """
+        return self._steps
+
+    def report(self):
+        """Return the totals over all steps, as a dict
+
+        The dict has keys ``num_steps``, ``elapsed`` and ``phases``, as in
+        the records of :attr:`steps`.
+        """
+        phases = dict((name, dict(phase))
+                      for name, phase in self._totals.items())
+        return {'num_steps': self._num_steps, 'elapsed': self._elapsed,
+                'phases': phases}
+
+    def summary(self):
+        """Return a table of the totals over all steps, as a string"""
+        report = self.report()
+        elapsed = report['elapsed']
+        lines = ['%-16s %8s %10s %10s %6s %14s' %
+                 ('phase', 'calls', 'time', 'own time', '%', 'pairs')]
+        phases = sorted(report['phases'].items(),
+                        key=lambda item: -item[1]['self_time'])
+        for name, phase in phases:
+            percent = 100 * phase['self_time'] / elapsed if elapsed else 0.
+            lines.append('%-16s %8d %10.4f %10.4f %6.1f %14d' %
+                         (name, phase['calls'], phase['time'],
+                          phase['self_time'], percent, phase['pairs']))
+        lines.append('%d steps in %.4f s' % (report['num_steps'], elapsed))
+        return '\n'.join(lines)
+
+    def attach(self, stepper):
+        """Instrument a timestepper, its body and its wake"""
+        if self._stepper is not None:
+            self.detach()
+        self._stepper = stepper
+        self._wrap(stepper, 'advance', 'advance', step=True)
+        self._wrap(stepper, '_update_impulse', 'impulse')
+        self._wrap(stepper, '_shed_velocity', 'shed_velocity',
+                   pairs=lambda shed, x: _num_points(x) * len(shed))
+        wake = stepper.wake
+        self._wrap(wake, 'induced_velocity', 'wake_velocity',
+                   pairs=lambda x=None, motion=None:
+                   (len(wake) if x is None else _num_points(x)) * len(wake))
+        bound = stepper.bound
+        if bound is not None:
+            self._wrap(bound, 'update_strengths_unsteady', 'solve')
+            self._wrap(bound, 'compute_rhs', 'rhs')
+            self._wrap(bound, 'induced_velocity', 'bound_velocity',
+                       pairs=lambda x: _num_points(x) * bound.num_panels)
+            self._wrap(bound.body, 'get_motion', 'motion')
+        for policy in stepper.wake_policies:
+            self._wrap(policy, 'apply', 'policies')
+        for recorder in stepper.recorders:
+            self._wrap(recorder, 'record', 'recorders')
+
+    def detach(self):
+        """Remove the instrumentation from the timestepper"""
+        for obj, name in self._wrapped:
+            delattr(obj, name)
+        self._wrapped = []
+        self._stepper = None
+
+    def _wrap(self, obj, name, phase, pairs=None, step=False):
+        """Replace a method of obj by a timed wrapper"""
+        method = getattr(obj, name)
+        enter = self._enter
+        leave = self._leave
+
+        def wrapper(*args, **kwargs):
+            if step:
+                self._start_step()
+            enter(phase)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                leave(phase, pairs(*args, **kwargs) if pairs else 0)
+                if step:
+                    self._end_step()
+
+        setattr(obj, name, wrapper)
+        self._wrapped.append((obj, name))
+
+    def _enter(self, phase):
+        self._stack.append([phase, _clock(), 0.])
+
+    def _leave(self, phase, pairs):
+        name, start, nested = self._stack.pop()
+        elapsed = _clock() - start
+        if self._stack:
+            self._stack[-1][2] += elapsed
+        entry = self._phases.get(name)
+        if entry is None:
+            entry = self._phases[name] = _new_phase()
+        entry['calls'] += 1
+        entry['time'] += elapsed
+        entry['self_time'] += elapsed - nested
+        entry['pairs'] += pairs
+
+    def _start_step(self):
+        _add_phases(self._totals, self._phases)
+        self._phases = {}
+        self._step_time = self._stepper.time
+
+    def _end_step(self):
+        stepper = self._stepper
+        phases, self._phases = self._phases, {}
+        elapsed = phases['advance']['time']
+        self._elapsed += elapsed
+        _add_phases(self._totals, phases)
+        record = {'step': self._num_steps, 'time': stepper.time,
+                  'dt': stepper.time - self._step_time,
+                  'num_vortices': len(stepper.wake), 'elapsed': elapsed,
+                  'phases': phases}
+        self._num_steps += 1
+        if self.keep_steps:
+            self._steps.append(record)
+        for callback in self.callbacks:
+            callback(stepper, record)
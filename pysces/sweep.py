@@ -0,0 +1,252 @@
+"""Run parameter sweeps in a pool of worker processes
+
+A sweep runs one simulation for each combination of parameters in a grid.
+Each case is run in a worker process, and its results (the history of forces
+on the body, the final wake and the elapsed time) are sent back to the main
+process, which collects them in a single ``.npz`` file with one column per
+quantity.  The file is saved periodically while the sweep is running, and
+records which cases have completed or failed, so an interrupted sweep can be
+resumed by running it again with the same file.
+"""
+from __future__ import division
+
+import itertools
+import multiprocessing
+import os
+import time
+import traceback
+
+import numpy as np
+from ._util import _replace
+from .force import compute_forces
+from .vortex import Vortices
+
+__all__ = ['Sweep']
+
+PENDING, DONE, FAILED = 0, 1, 2
+
+
+def _run_case(task):
+    """Run a single case of a sweep (in a worker process)"""
+    index, setup, params, num_steps = task
+    start = time.time()
+    try:
+        stepper = setup(**params)
+        forces = np.zeros((num_steps, 3))
+        for i in range(num_steps):
+            stepper.advance()
+            forces[i] = compute_forces(stepper)
+        wake = stepper.wake
+        return (index, DONE, time.time() - start, forces,
+                np.reshape(wake.positions, (-1, 2)), wake.strengths, '')
+    except Exception:
+        return (index, FAILED, time.time() - start, None, None, None,
+                traceback.format_exc())
+
+
+class Sweep(object):
+    """A sweep over a grid of simulation parameters
+
+    Parameters
+    ----------
+    setup : function
+        Called with one keyword argument for each parameter, and returns a
+        :class:`Timestepper` for that case.  It must be picklable (i.e.,
+        defined at the top level of a module) to run in worker processes.
+    parameters : dict
+        Maps the name of each parameter to a list of values (numbers or
+        strings).  A case is run for each combination of values.
+    num_steps : int
+        Number of timesteps in each case
+    filename : str
+        Name of the ``.npz`` file in which results are stored.  If the file
+        exists, the results it contains are loaded, and running the sweep
+        runs only the cases that have not completed.
+    num_workers : int, optional
+        Number of worker processes (default: number of CPUs).  If 1, cases
+        are run in the current process.
+    save_interval : float, optional
+        Results are saved at most once in this many seconds while the sweep
+        runs (default 30), and always when it finishes or is interrupted
+
+    Examples
+    --------
+    In a module ``mysweep.py``::
+
+        def setup(frequency, amplitude):
+            body = Pitching(flat_plate(20), amplitude, frequency)
+            return RungeKutta2(0.05, (1,0), BoundVortices(body))
+
+        if __name__ == "__main__":
+            sweep = Sweep(setup, {'frequency': [1, 2, 4],
+                                  'amplitude': [5, 10]}, 200, 'sweep.npz')
+            sweep.run()
+
+    Notes
+    -----
+    The file contains the columns ``param_<name>`` for each parameter,
+    ``status`` (0 for pending, 1 for completed, 2 for failed), ``elapsed``
+    (seconds), ``error`` (traceback of failed cases), ``forces`` (force and
+    moment on the body after each step, as returned by
+    :func:`compute_forces`, with shape (num_cases, num_steps, 3), NaN for
+    cases not completed), and the final wakes of all cases concatenated in
+    ``wake_positions`` and ``wake_strengths``, with ``wake_count`` vortices
+    for each case.
+    """
+
+    def __init__(self, setup, parameters, num_steps, filename,
+                 num_workers=None, save_interval=30.):
+        self.setup = setup
+        self.num_steps = num_steps
+        self.filename = filename
+        self.num_workers = num_workers
+        self.save_interval = save_interval
+        self._names = sorted(parameters)
+        grid = list(itertools.product(*[parameters[name]
+                                        for name in self._names]))
+        self._columns = dict(
+            (name, np.array([case[k] for case in grid]))
+            for k, name in enumerate(self._names))
+        num_cases = len(grid)
+        self._status = np.zeros(num_cases, dtype=np.int8)
+        self._elapsed = np.zeros(num_cases)
+        self._errors = [''] * num_cases
+        self._forces = np.full((num_cases, num_steps, 3), np.nan)
+        self._wakes = [None] * num_cases
+        if os.path.exists(filename):
+            self._load()
+
+    @property
+    def num_cases(self):
+        return len(self._status)
+
+    @property
+    def cases(self):
+        """Parameters of each case, as a list of dicts"""
+        return [dict((name, self._columns[name][i].item())
+                     for name in self._names)
+                for i in range(self.num_cases)]
+
+    @property
+    def status(self):
+        """Status of each case: 0 (pending), 1 (completed) or 2 (failed)"""
+        return self._status
+
+    @property
+    def elapsed(self):
+        """Time in seconds taken by each case"""
+        return self._elapsed
+
+    @property
+    def errors(self):
+        """Traceback of each failed case (empty for other cases)"""
+        return self._errors
+
+    @property
+    def forces(self):
+        """Force and moment after each step, shape (cases, steps, 3)"""
+        return self._forces
+
+    def wake(self, index):
+        """Return the final wake of a completed case, as :class:`Vortices`"""
+        if self._wakes[index] is None:
+            return None
+        return Vortices(*self._wakes[index])
+
+    def pending(self, retry_failed=False):
+        """Return the indices of cases that have not completed"""
+        run = self._status == PENDING
+        if retry_failed:
+            run |= self._status == FAILED
+        return np.flatnonzero(run)
+
+    def run(self, retry_failed=False):
+        """Run the cases that have not completed
+
+        Parameters
+        ----------
+        retry_failed : bool, optional
+            If True, also run cases that failed previously (default False)
+        """
+        cases = self.cases
+        tasks = [(i, self.setup, cases[i], self.num_steps)
+                 for i in self.pending(retry_failed)]
+        if not tasks:
+            return
+        pool = None
+        if self.num_workers == 1:
+            results = map(_run_case, tasks)
+        else:
+            pool = multiprocessing.Pool(self.num_workers)
+            results = pool.imap_unordered(_run_case, tasks)
+        last_save = time.time()
+        try:
+            for result in results:
+                self._store(result)
+                if time.time() - last_save > self.save_interval:
+                    self.save()
+                    last_save = time.time()
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            self.save()
+
+    def _store(self, result):
+        index, status, elapsed, forces, positions, strengths, error = result
+        self._status[index] = status
+        self._elapsed[index] = elapsed
+        self._errors[index] = error
+        if status == DONE:
+            self._forces[index] = forces
+            self._wakes[index] = (positions, strengths)
+
+    def save(self):
+        """Save the results to :attr:`filename`
+
+        The results are written to a temporary file, which then replaces
+        the file, so the file is never left incomplete (except briefly on
+        Windows, where the old file is removed first).
+        """
+        counts = np.array([0 if w is None else len(w[1])
+                           for w in self._wakes])
+        wakes = [w for w in self._wakes if w is not None]
+        if wakes:
+            positions = np.concatenate([w[0] for w in wakes])
+            strengths = np.concatenate([w[1] for w in wakes])
+        else:
+            positions = np.zeros((0, 2))
+            strengths = np.zeros(0)
+        columns = dict(('param_' + name, self._columns[name])
+                       for name in self._names)
+        tmpname = self.filename + '.tmp'
+        with open(tmpname, 'wb') as f:
+            np.savez(f, status=self._status, elapsed=self._elapsed,
+                     error=np.array(self._errors, dtype=str),
+                     forces=self._forces, wake_count=counts,
+                     wake_positions=positions, wake_strengths=strengths,
+                     **columns)
+        _replace(tmpname, self.filename)
+
+    def _load(self):
+        with np.load(self.filename) as data:
+            names = sorted(key[len('param_'):] for key in data.files
+                           if key.startswith('param_'))
+            same = (names == self._names and
+                    data['forces'].shape == self._forces.shape and
+                    all(np.array_equal(data['param_' + name],
+                                       self._columns[name])
+                        for name in names))
+            if not same:
+                raise ValueError("%s contains results for different "
+                                 "parameters" % self.filename)
+            self._status = data['status']
+            self._elapsed = data['elapsed']
+            self._errors = [str(e) for e in data['error']]
+            self._forces = data['forces']
+            offsets = np.concatenate([[0], np.cumsum(data['wake_count'])])
+            positions = data['wake_positions']
+            strengths = data['wake_strengths']
+        for i in np.flatnonzero(self._status == DONE):
+            lo, hi = offsets[i], offsets[i+1]
+            self._wakes[i] = (positions[lo:hi], strengths[lo:hi])
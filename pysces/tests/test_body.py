@@ -1,5 +1,6 @@
 import unittest
 from pysces.body import *
+from pysces.motion import RigidMotion
 import numpy as np
 from numpy.testing import assert_array_equal, assert_array_almost_equal
 
@@ -79,3 +80,22 @@ class TestBody(unittest.TestCase):
         new_body = TransformedBody(self.body, displacement=(-1,0))
         new_body = TransformedBody(new_body, angle=45)
         self.assertEqual(new_body.get_body(), self.body)
+
+    def test_motion_cache(self):
+        parent = TransformedBody(self.body, displacement=(0,1))
+        heaving = Heaving(parent, (0,1), 2*np.pi, 0)
+        body = Pitching(heaving, 10, 2*np.pi, 0)
+        body.time = 0.1
+        motion = body.get_motion()
+        self.assertTrue(body.get_motion() is motion)
+        # changing the time at any level recomputes the motion
+        heaving.time = 0.2
+        motion = body.get_motion()
+        fresh = Pitching(Heaving(TransformedBody(self.body,
+                                                 displacement=(0,1)),
+                                 (0,1), 2*np.pi, 0), 10, 2*np.pi, 0)
+        fresh.time = 0.2
+        self.assertEqual(motion, fresh.get_motion())
+        # so does changing the motion of a parent
+        parent.set_motion(RigidMotion(0, (1,0)))
+        self.assertNotEqual(body.get_motion(), motion)
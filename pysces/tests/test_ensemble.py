@@ -0,0 +1,131 @@
+import unittest
+from pysces.ensemble import *
+from pysces.timestepper import RungeKutta2, RungeKutta4
+from pysces.body import flat_plate, Pitching, Heaving
+from pysces.panel import BoundVortices
+from pysces.vortex import Vortices
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
+def make_bounds():
+    return [BoundVortices(Pitching(flat_plate(12), 5, 2, 30)),
+            BoundVortices(Pitching(flat_plate(12), 10, 3)),
+            BoundVortices(Heaving(flat_plate(12), (0, 0.2), 1))]
+
+class TestEnsemble(unittest.TestCase):
+    def check_members(self, ensemble_cls, cls):
+        # each member matches a separate simulation with the same method
+        dt = 0.1
+        num_steps = 5
+        ensemble = ensemble_cls(dt, (1,0), make_bounds())
+        for i in range(num_steps):
+            ensemble.advance()
+        self.assertEqual(ensemble.num_members, 3)
+        self.assertEqual(ensemble.wake_positions.shape, (3, num_steps + 1, 2))
+        for k, bound in enumerate(make_bounds()):
+            flow = cls(dt, (1,0), bound)
+            for i in range(num_steps):
+                flow.advance()
+            wake = ensemble.wake[k]
+            assert_array_almost_equal(wake.positions, flow.wake.positions, 12)
+            assert_array_almost_equal(wake.strengths, flow.wake.strengths, 12)
+            assert_array_almost_equal(ensemble.bound[k].vortices.strengths,
+                                      bound.vortices.strengths, 12)
+            self.assertAlmostEqual(ensemble.bound[k].time, flow.time)
+            assert_array_almost_equal(ensemble.bound[k].pressure(),
+                                      bound.pressure(), 10)
+
+    def test_rk2(self):
+        self.check_members(EnsembleRungeKutta2, RungeKutta2)
+
+    def test_rk4(self):
+        self.check_members(EnsembleRungeKutta4, RungeKutta4)
+
+    def test_circulation(self):
+        ensemble = EnsembleEuler(0.1, (1,0), make_bounds())
+        ensemble.advance()
+        assert_array_almost_equal(np.sum(ensemble.bound_strengths, 1),
+                                  -np.sum(ensemble.wake_strengths, 1))
+
+    def test_wake_only(self):
+        # vortex pairs with different strengths rotate at different rates
+        wakes = [Vortices([(-1,0), (1,0)], [g, g]) for g in (1., 2.)]
+        ensemble = EnsembleRungeKutta4(0.1, (0,0), wakes=wakes)
+        for i in range(10):
+            ensemble.advance()
+        for k, wake in enumerate(wakes):
+            flow = RungeKutta4(0.1, (0,0), wake=wake)
+            for i in range(10):
+                flow.advance()
+            assert_array_almost_equal(ensemble.wake_positions[k],
+                                      flow.wake.positions, 12)
+
+    def test_member_settings(self):
+        # shedding distance and core radii are taken from each member
+        bounds = make_bounds()
+        bounds[1].wake_fac = 0.4
+        bounds[2].vortices.core_radius = 0.05
+        wakes = [Vortices([(2,0.1), (2.1,-0.1)], [0.1, -0.2])
+                 for k in range(3)]
+        wakes[0].core_radius = 0.2
+        ensemble = EnsembleRungeKutta2(0.1, (1,0), bounds, wakes)
+        for i in range(3):
+            ensemble.advance()
+        for k, wake in enumerate(wakes):
+            bound = make_bounds()[k]
+            bound.wake_fac = bounds[k].wake_fac
+            bound.vortices.core_radius = bounds[k].vortices.core_radius
+            flow = RungeKutta2(0.1, (1,0), bound, wake)
+            for i in range(3):
+                flow.advance()
+            self.assertEqual(ensemble.wake[k].core_radius, wake.core_radius)
+            assert_array_almost_equal(ensemble.wake_positions[k],
+                                      flow.wake.positions, 12)
+            assert_array_almost_equal(ensemble.wake_strengths[k],
+                                      flow.wake.strengths, 12)
+            assert_array_almost_equal(ensemble.wake_ages, flow.wake_ages)
+
+    def test_timestepper_api(self):
+        # only the members that make sense for an ensemble are provided
+        ensemble = EnsembleEuler(0.1, (1,0), make_bounds())
+        ensemble.advance()
+        assert_array_almost_equal(ensemble.wake_ages, [0.1, 0])
+        assert_array_almost_equal(ensemble.Uinfty, (1,0))
+        for name in ('tracers', 'impulse', 'replace_wake', 'save_checkpoint',
+                     'load_checkpoint', 'wake_policies', 'recorders'):
+            self.assertFalse(hasattr(ensemble, name))
+
+    def test_block_size(self):
+        # the batched sums use the block sizes of the members
+        import pysces.ensemble
+        sizes = set()
+        batched = pysces.ensemble._batched_velocity
+        def spy(x, xvort, gam, core_radius, block_size, out=None):
+            sizes.add(block_size)
+            return batched(x, xvort, gam, core_radius, block_size, out)
+        wakes = [Vortices(np.random.rand(30, 2) + (1, 0), np.zeros(30))
+                 for k in range(3)]
+        ensemble = EnsembleEuler(0.1, (1,0), make_bounds(), wakes)
+        for wake in wakes:
+            wake.block_size = 4
+        bounds = make_bounds()
+        for bound in bounds:
+            bound.vortices.block_size = 3
+        pysces.ensemble._batched_velocity = spy
+        try:
+            small = EnsembleEuler(0.1, (1,0), bounds, wakes)
+            small.advance()
+        finally:
+            pysces.ensemble._batched_velocity = batched
+        self.assertEqual(sizes, set([3, 4]))
+        self.assertEqual([w.block_size for w in small.wake], [4, 4, 4])
+        ensemble.advance()
+        assert_array_almost_equal(small.wake_positions,
+                                  ensemble.wake_positions, 12)
+
+    def test_panel_mismatch(self):
+        bounds = [BoundVortices(flat_plate(10)), BoundVortices(flat_plate(12))]
+        self.assertRaises(ValueError, EnsembleEuler, 0.1, (1,0), bounds)
+
+if __name__ == "__main__":
+    unittest.main()
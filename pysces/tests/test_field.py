@@ -0,0 +1,86 @@
+import unittest
+from pysces.field import FlowField
+from pysces.timestepper import RungeKutta2
+from pysces.treecode import BarnesHut
+from pysces.body import flat_plate, Pitching
+from pysces.panel import BoundVortices
+from pysces.vortex import Vortices
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
+class TestFlowField(unittest.TestCase):
+    def setUp(self):
+        body = Pitching(flat_plate(10), 10, 2 * np.pi)
+        self.flow = RungeKutta2(0.1, (1,0), BoundVortices(body))
+        for i in range(5):
+            self.flow.advance()
+        x, y = np.meshgrid(np.linspace(-1, 2, 30), np.linspace(-1, 1, 20))
+        self.grid = np.stack([x, y], -1)
+
+    def field(self, **kwargs):
+        return FlowField(self.flow.wake, self.flow.bound, self.flow.Uinfty,
+                         **kwargs)
+
+    def test_velocity(self):
+        pts = np.reshape(self.grid, (-1, 2))
+        expected = (self.flow.wake.induced_velocity(pts) +
+                    self.flow.bound.induced_velocity(pts) + (1, 0))
+        vel = self.field(tile_size=64, num_workers=2).velocity(self.grid)
+        self.assertEqual(vel.shape, self.grid.shape)
+        assert_array_almost_equal(np.reshape(vel, (-1, 2)), expected, 14)
+
+    def test_block_size(self):
+        # the block size of the wake gives the same results
+        field = self.field()
+        expected = (field.velocity(self.grid), field.streamfunction(self.grid),
+                    field.vorticity(self.grid, 0.1))
+        self.flow.wake.block_size = 3
+        self.flow.wake.evaluator = BarnesHut(theta=0)
+        field = self.field()
+        self.assertEqual(field.streamfunction(self.grid).shape,
+                         self.grid.shape[:-1])
+        assert_array_almost_equal(field.velocity(self.grid), expected[0], 12)
+        assert_array_almost_equal(field.streamfunction(self.grid),
+                                  expected[1], 12)
+        assert_array_almost_equal(field.vorticity(self.grid, 0.1),
+                                  expected[2], 12)
+
+    def test_tree_reused(self):
+        wake = self.flow.wake
+        wake.evaluator = BarnesHut(theta=0.3)
+        wake.induced_velocity()
+        tree = wake.evaluator.tree
+        field = self.field(tile_size=100)
+        vel = field.velocity(self.grid)
+        self.assertTrue(wake.evaluator.tree is tree)
+        wake.evaluator = None
+        assert_array_almost_equal(vel, field.velocity(self.grid), 4)
+
+    def test_streamfunction(self):
+        # velocity is the derivative of the streamfunction
+        field = self.field(tile_size=100)
+        x = np.array([[0.5, 0.7], [1.5, -0.4], [-0.8, 0.3]])
+        h = 1.e-5
+        dx = np.array([h, 0])
+        dy = np.array([0, h])
+        psi = field.streamfunction
+        u = (psi(x + dy) - psi(x - dy)) / (2 * h)
+        v = -(psi(x + dx) - psi(x - dx)) / (2 * h)
+        assert_array_almost_equal(np.column_stack([u, v]),
+                                  field.velocity(x), 6)
+        self.assertEqual(psi(self.grid).shape, self.grid.shape[:-1])
+
+    def test_vorticity(self):
+        # integral of the vorticity is the total circulation
+        vort = Vortices([(0.1, 0.05), (-0.2, 0.1)], [1., -0.5])
+        field = FlowField(vort, Uinfty=(0,0))
+        h = 0.01
+        x, y = np.meshgrid(np.arange(-1, 1, h), np.arange(-1, 1, h))
+        grid = np.stack([x, y], -1)
+        omega = field.vorticity(grid, radius=0.1)
+        self.assertAlmostEqual(np.sum(omega) * h * h, 0.5, 6)
+        self.assertEqual(field.vorticity((0.1, 0.05)),
+                         1. / (np.pi * vort.core_radius**2))
+
+if __name__ == "__main__":
+    unittest.main()
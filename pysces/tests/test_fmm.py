@@ -0,0 +1,76 @@
+import unittest
+from pysces.fmm import *
+from pysces.vortex import Vortices
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
+class TestFastMultipole(unittest.TestCase):
+    def check_accuracy(self, x, pos, gam, tol, core_radius=1.e-3):
+        vort = Vortices(pos, gam)
+        vort.core_radius = core_radius
+        vel_direct = vort.induced_velocity(x)
+        vort.evaluator = FastMultipole(tol=tol, leaf_size=8)
+        vel = vort.induced_velocity(x)
+        err = np.max(np.abs(vel - vel_direct)) / np.max(np.abs(vel_direct))
+        self.assertTrue(err < tol)
+
+    def test_self_induced(self):
+        np.random.seed(0)
+        pos = np.random.rand(1000, 2)
+        gam = np.random.randn(1000)
+        for tol in (1.e-3, 1.e-6, 1.e-10):
+            self.check_accuracy(None, pos, gam, tol)
+
+    def test_targets(self):
+        np.random.seed(1)
+        pos = np.random.rand(500, 2)
+        gam = np.random.randn(500)
+        x = 2 * np.random.rand(300, 2) - 0.5
+        self.check_accuracy(x, pos, gam, 1.e-8)
+
+    def test_wake(self):
+        # particles along a curve, with overlapping cores
+        n = 800
+        s = np.linspace(0, 10, n)
+        pos = np.array([s, 0.1 * np.sin(3 * s)]).T
+        gam = np.cos(s)
+        self.check_accuracy(None, pos, gam, 1.e-8, core_radius=0.05)
+
+    def test_few_vortices(self):
+        # too few particles for a tree: falls back to direct summation
+        vort = Vortices([(-1,0), (1,0)], [2 * np.pi, -2 * np.pi])
+        vort.evaluator = FastMultipole()
+        vel = vort.induced_velocity((0,0))
+        assert_array_almost_equal(vel, (0,2))
+
+    def test_block_size(self):
+        # direct sums use the block size of the vortices
+        import pysces.fmm
+        sizes = []
+        direct = pysces.fmm._direct_velocity
+        def spy(x, xvort, gam, core_radius, block_size, out=None):
+            sizes.append(block_size)
+            return direct(x, xvort, gam, core_radius, block_size, out)
+        np.random.seed(2)
+        vort = Vortices(np.random.rand(500, 2), np.random.randn(500))
+        vel_direct = vort.induced_velocity()
+        vort.block_size = 7
+        vort.evaluator = FastMultipole(tol=1.e-10, leaf_size=8)
+        pysces.fmm._direct_velocity = spy
+        try:
+            vel = vort.induced_velocity()
+        finally:
+            pysces.fmm._direct_velocity = direct
+        self.assertTrue(sizes)
+        self.assertEqual(set(sizes), set([7]))
+        assert_array_almost_equal(vel, vel_direct, 8)
+
+    def test_order(self):
+        fmm = FastMultipole(tol=1.e-3)
+        order = fmm.order
+        fmm.tol = 1.e-9
+        self.assertTrue(fmm.order > order)
+        self.assertRaises(ValueError, FastMultipole, 0)
+
+if __name__ == "__main__":
+    unittest.main()
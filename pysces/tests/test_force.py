@@ -0,0 +1,71 @@
+import unittest
+from pysces.force import compute_forces, Impulse
+from pysces.timestepper import RungeKutta2
+from pysces.body import flat_plate, TransformedBody
+from pysces.panel import BoundVortices
+from pysces.vortex import Vortices
+from pysces.wake import FarWake
+import numpy as np
+
+class TestForces(unittest.TestCase):
+    def flat_plate_flow(self, angle=5, **kwargs):
+        body = TransformedBody(flat_plate(20), angle=angle)
+        return RungeKutta2(0.05, (1,0), BoundVortices(body), **kwargs)
+
+    def test_initial(self):
+        flow = self.flat_plate_flow()
+        self.assertEqual(compute_forces(flow), (0, 0, 0))
+
+    def test_steady_lift(self):
+        # lift approaches 2 pi alpha (per unit chord and density), and the
+        # moment about the quarter chord vanishes
+        alpha = 5 * np.pi / 180
+        flow = self.flat_plate_flow()
+        quarter_chord = (0.25 * np.cos(alpha), -0.25 * np.sin(alpha))
+        for i in range(400):
+            flow.advance()
+        fx, fy, moment = compute_forces(flow, center=quarter_chord)
+        self.assertAlmostEqual(fy, np.pi * np.sin(alpha), 1)
+        self.assertLess(abs(fy - np.pi * np.sin(alpha)), 0.03)
+        self.assertLess(abs(fx), 0.01 * fy)
+        self.assertLess(abs(moment), 1.e-4)
+        # Kutta-Joukowski
+        gam = np.sum(flow.bound.vortices.strengths)
+        self.assertAlmostEqual(fy, -gam, 2)
+
+    def test_density(self):
+        flow = self.flat_plate_flow()
+        for i in range(3):
+            flow.advance()
+        forces = np.array(compute_forces(flow))
+        forces2 = np.array(compute_forces(flow, density=2.))
+        np.testing.assert_array_almost_equal(forces2, 2 * forces, 14)
+
+    def test_removed_vortices(self):
+        # removing vortices far from the body hardly changes the force
+        flow = self.flat_plate_flow()
+        truncated = self.flat_plate_flow(wake_policies=[FarWake(distance=3)])
+        for i in range(100):
+            flow.advance()
+            truncated.advance()
+        self.assertLess(len(truncated.wake), len(flow.wake))
+        forces = np.array(compute_forces(flow))
+        forces2 = np.array(compute_forces(truncated))
+        self.assertLess(np.max(np.abs(forces - forces2)), 0.02)
+
+    def test_impulse_derivative(self):
+        # moments quadratic in time are differentiated exactly
+        impulse = Impulse(Uinfty=(0,0))
+        self.assertTrue(np.all(impulse.derivative() == 0))
+        for t in [0, 0.1, 0.3]:
+            wake = Vortices([[t, 1.]], [1.])
+            impulse.update(t, wake)
+        rate = impulse.derivative()
+        # linear impulse (y, -x), and angular impulse -|x|^2 / 2
+        np.testing.assert_array_almost_equal(rate[:3], [0, -1, -0.3])
+        impulse2 = Impulse(Uinfty=(0,0))
+        impulse2.restore_state(impulse.save_state())
+        np.testing.assert_array_equal(impulse2.derivative(), rate)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,9 @@
 import unittest
-from pysces.body import Body, naca_airfoil, flat_plate
+from pysces.body import (Body, TransformedBody, Heaving, naca_airfoil,
+                         flat_plate)
+from pysces.force import compute_forces
 from pysces.panel import *
+from pysces.timestepper import RungeKutta2, RungeKutta4
 import numpy as np
 
 class TestPanel(unittest.TestCase):
@@ -45,6 +48,84 @@ class TestPanel(unittest.TestCase):
         self.check_shed_vortex(body, 0.2)
         self.check_shed_vortex(body, 0.3)
 
+    def test_bordered_solve(self):
+        # compare with a direct solve of the full bordered system
+        body = naca_airfoil("2412", 12)
+        panels = BoundVortices(body)
+        dt = 0.1
+        circ = 0.3
+        panels.update_strengths_unsteady(dt, (1,0), circ=circ)
+        gam = panels.vortices.strengths
+        x_shed, gam_shed = panels.get_newly_shed()
+        n = panels.num_panels
+        shed_vel = panels.vortices.induced_velocity_single(
+            panels.collocation_pts, x_shed, 1)
+        A = np.zeros((n + 1, n + 1))
+        A[:n,:n] = panels.influence_matrix
+        A[:n,n] = np.sum(shed_vel * panels.normals, 1)
+        A[n,:] = 1
+        rhs = np.append(panels.compute_rhs((1,0)), circ)
+        expected = np.linalg.solve(A, rhs)
+        np.testing.assert_array_almost_equal(gam, expected[:-1])
+        self.assertAlmostEqual(gam_shed, expected[-1])
+
+    def test_inverse_cache(self):
+        body = flat_plate(8)
+        panels = BoundVortices(body)
+        Ainv = panels.influence_inverse
+        self.assertTrue(panels.influence_inverse is Ainv)
+        np.testing.assert_array_almost_equal(
+            np.dot(Ainv, panels.influence_matrix), np.eye(8 - 1))
+        panels.update_positions()
+        self.assertTrue(panels.influence_inverse is not Ainv)
+
+    def test_influence_matrix(self):
+        # compare with influence of each vortex computed separately
+        body = naca_airfoil("0012", 20)
+        panels = BoundVortices(body)
+        panels.vortices.block_size = 8
+        vort = panels.vortices
+        n = panels.num_panels
+        expected = np.zeros((n, n))
+        for j, (xvort, gam) in enumerate(vort):
+            vel = vort.induced_velocity_single(panels.collocation_pts, xvort, 1)
+            expected[:, j] = np.sum(vel * panels.normals, 1)
+        np.testing.assert_array_equal(panels.influence_matrix, expected)
+
+    def test_pressure_steady(self):
+        # total force is normal to the plate, with lift close to
+        # Kutta-Joukowski
+        body = TransformedBody(flat_plate(20), angle=5)
+        panels = BoundVortices(body)
+        panels.update_strengths()
+        dp = panels.pressure(density=2.)
+        normals = body.get_motion().map_vector(panels.normals)
+        force = np.sum((dp * panels.lengths)[:,np.newaxis] * normals, 0)
+        alpha = 5 * np.pi / 180
+        self.assertAlmostEqual(force[0] / force[1], np.tan(alpha))
+        lift = -2 * np.sum(panels.vortices.strengths)
+        self.assertLess(abs(force[1] / lift - 1), 0.02)
+        np.testing.assert_array_almost_equal(
+            panels.pressure_coefficient((2,0)), dp / 4)
+
+    def test_pressure_unsteady(self):
+        # force from the pressure agrees with that from the impulse
+        body = Heaving(flat_plate(20), (0, 0.2), 3, 0)
+        panels = BoundVortices(body)
+        flow = RungeKutta4(0.05, (1,0), panels)
+        stages = RungeKutta2(0.05, (1,0), BoundVortices(body))
+        for i in range(20):
+            flow.advance()
+            stages.advance()
+        normals = body.get_motion().map_vector(panels.normals)
+        force = np.sum((panels.pressure() * panels.lengths)[:,np.newaxis] *
+                       normals, 0)
+        fx, fy, moment = compute_forces(flow)
+        self.assertLess(abs(force[1] / fy - 1), 0.05)
+        # intermediate stages do not affect the pressure
+        np.testing.assert_array_almost_equal(panels.pressure(),
+                                             stages.bound.pressure(), 2)
+
     def test_regularization(self):
         pass
 
@@ -0,0 +1,91 @@
+import unittest
+from pysces.profiler import Profiler
+from pysces.timestepper import RungeKutta2
+from pysces.body import flat_plate, Pitching
+from pysces.panel import BoundVortices
+from pysces.wake import FarWake
+import numpy as np
+
+class TestProfiler(unittest.TestCase):
+    def flow(self, **kwargs):
+        body = Pitching(flat_plate(10), 10, 2 * np.pi)
+        return RungeKutta2(0.1, (1,0), BoundVortices(body),
+                           wake_policies=[FarWake(distance=1)], **kwargs)
+
+    def test_counts(self):
+        profiler = Profiler()
+        flow = self.flow(profiler=profiler)
+        num_steps = 5
+        for i in range(num_steps):
+            flow.advance()
+        self.assertEqual(profiler.num_steps, num_steps)
+        self.assertEqual(len(profiler.steps), num_steps)
+        phases = profiler.report()['phases']
+        self.assertEqual(phases['advance']['calls'], num_steps)
+        self.assertEqual(phases['policies']['calls'], num_steps)
+        # RK2: one solve at the second stage, and one for the new step
+        self.assertEqual(phases['solve']['calls'], 2 * num_steps)
+        self.assertEqual(phases['rhs']['calls'], 2 * num_steps)
+        record = profiler.steps[-1]
+        self.assertEqual(record['num_vortices'], len(flow.wake))
+        self.assertAlmostEqual(record['dt'], 0.1)
+        # own times add up to the time of the step
+        total = sum(p['self_time'] for p in record['phases'].values())
+        self.assertAlmostEqual(total, record['elapsed'])
+        self.assertGreater(record['phases']['wake_velocity']['pairs'], 0)
+        self.assertIn('phase', profiler.summary())
+
+    def test_shed_velocity(self):
+        # the vortex shed at the second stage of RK2 is counted in its own
+        # phase
+        profiler = Profiler()
+        flow = self.flow(profiler=profiler)
+        flow.advance()
+        phase = profiler.steps[0]['phases']['shed_velocity']
+        self.assertEqual(phase['calls'], 1)
+        self.assertEqual(phase['pairs'], len(flow.wake) - 1)
+
+    def test_single_point_pairs(self):
+        profiler = Profiler()
+        flow = self.flow(profiler=profiler)
+        num_vortices = len(flow.wake)
+        flow.wake.induced_velocity(np.array([0.5, 0.5]))
+        flow.bound.induced_velocity(np.array([0.5, 0.5]))
+        flow.advance()
+        phases = profiler.report()['phases']
+        step = profiler.steps[0]['phases']
+        self.assertEqual(phases['wake_velocity']['pairs'] -
+                         step['wake_velocity']['pairs'], num_vortices)
+        self.assertEqual(phases['bound_velocity']['pairs'] -
+                         step['bound_velocity']['pairs'],
+                         flow.bound.num_panels)
+
+    def test_same_results(self):
+        profiler = Profiler()
+        flow = self.flow(profiler=profiler)
+        plain = self.flow()
+        for i in range(5):
+            flow.advance()
+            plain.advance()
+        np.testing.assert_array_equal(flow.wake.positions,
+                                      plain.wake.positions)
+        profiler.detach()
+        self.assertNotIn('advance', vars(flow))
+        self.assertNotIn('induced_velocity', vars(flow.wake))
+        flow.advance()
+        self.assertEqual(profiler.num_steps, 5)
+
+    def test_callback(self):
+        records = []
+        profiler = Profiler(keep_steps=False)
+        profiler.add_callback(lambda stepper, record: records.append(record))
+        flow = self.flow()
+        profiler.attach(flow)
+        for i in range(3):
+            flow.advance()
+        self.assertEqual([r['step'] for r in records], [0, 1, 2])
+        self.assertEqual(profiler.steps, [])
+        self.assertEqual(profiler.report()['num_steps'], 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import os
+import shutil
+import tempfile
+from pysces.sweep import Sweep
+from pysces.timestepper import RungeKutta2
+from pysces.body import flat_plate, Pitching
+from pysces.panel import BoundVortices
+import numpy as np
+from numpy.testing import assert_array_equal
+
+def setup_case(frequency, amplitude):
+    if frequency < 0:
+        raise ValueError("negative frequency")
+    body = Pitching(flat_plate(10), amplitude, frequency)
+    return RungeKutta2(0.1, (1,0), BoundVortices(body))
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'sweep.npz')
+        self.parameters = {'frequency': [-1., 1., 2.], 'amplitude': [5., 10.]}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_run(self):
+        sweep = Sweep(setup_case, self.parameters, 3, self.filename,
+                      num_workers=2)
+        self.assertEqual(sweep.num_cases, 6)
+        sweep.run()
+        failed = [case['frequency'] < 0 for case in sweep.cases]
+        assert_array_equal(sweep.status, np.where(failed, 2, 1))
+        self.assertTrue('negative frequency' in sweep.errors[0])
+        # final wake matches a simulation run directly
+        index = 5
+        flow = setup_case(**sweep.cases[index])
+        for i in range(3):
+            flow.advance()
+        assert_array_equal(sweep.wake(index).positions, flow.wake.positions)
+        self.assertTrue(sweep.wake(0) is None)
+
+    def test_resume(self):
+        sweep = Sweep(setup_case, self.parameters, 3, self.filename,
+                      num_workers=1)
+        sweep.run()
+        # results are loaded from the file, and completed cases not rerun
+        resumed = Sweep(setup_case, self.parameters, 3, self.filename)
+        assert_array_equal(resumed.status, sweep.status)
+        assert_array_equal(resumed.wake(4).strengths,
+                           sweep.wake(4).strengths)
+        self.assertEqual(len(resumed.pending()), 0)
+        self.assertEqual(len(resumed.pending(retry_failed=True)), 2)
+        elapsed = np.array(resumed.elapsed)
+        resumed.run()
+        assert_array_equal(resumed.elapsed, elapsed)
+
+    def test_different_parameters(self):
+        Sweep(setup_case, self.parameters, 3, self.filename,
+              num_workers=1).save()
+        self.assertRaises(ValueError, Sweep, setup_case,
+                          {'frequency': [1.], 'amplitude': [5.]}, 3,
+                          self.filename)
+
+if __name__ == "__main__":
+    unittest.main()
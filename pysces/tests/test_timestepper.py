@@ -1,9 +1,13 @@
 import unittest
+import os
+import shutil
 import sys
+import tempfile
 from pysces.timestepper import *
-from pysces.body import flat_plate
+from pysces.body import flat_plate, Pitching
 from pysces.panel import BoundVortices
 from pysces.vortex import Vortices
+from pysces.wake import FarWake
 import numpy as np
 from numpy.testing import assert_array_equal, assert_array_almost_equal
 
@@ -33,6 +37,29 @@ class TestTimestepper(unittest.TestCase):
     def test_rk4(self):
         self.check_timestepper(RungeKutta4)
 
+    def test_bogacki_shampine(self):
+        self.check_timestepper(BogackiShampine)
+
+    def test_dormand_prince(self):
+        self.check_timestepper(DormandPrince)
+
+    def test_adams_bashforth2(self):
+        self.check_timestepper(AdamsBashforth2)
+
+    def test_adams_bashforth3(self):
+        self.check_timestepper(AdamsBashforth3)
+
+    def test_float32(self):
+        body = flat_plate(20)
+        bound = BoundVortices(body, dtype=np.float32)
+        flow = RungeKutta2(0.1, (1,0), bound, dtype=np.float32)
+        flow.advance()
+        self.assertEqual(flow.wake.positions.dtype, np.float32)
+        self.assertEqual(flow.wake.strengths.dtype, np.float32)
+        self.assertEqual(bound.vortices.strengths.dtype, np.float32)
+        self.assertAlmostEqual(bound.vortices.circulation,
+                               -flow.wake.circulation, 5)
+
     def check_vortex_pair(self, cls, tol):
         # compare with exact solution for a pair of vortices:
         # uniform rotation at frequency omega about center of vorticity (here 0)
@@ -71,5 +98,218 @@ class TestTimestepper(unittest.TestCase):
         tol = 6.4e-10
         self.check_vortex_pair(RungeKutta4, tol)
 
+    def test_vortex_pair_adams_bashforth2(self):
+        tol = 1.e-5
+        self.check_vortex_pair(AdamsBashforth2, tol)
+
+    def test_vortex_pair_adams_bashforth3(self):
+        tol = 6.e-8
+        self.check_vortex_pair(AdamsBashforth3, tol)
+
+    def test_adams_bashforth_history(self):
+        # history covers a leading portion of the wake, and is discarded
+        # when the timestep changes
+        body = Pitching(flat_plate(10), 10, 2 * np.pi)
+        bound = BoundVortices(body)
+        flow = AdamsBashforth3(0.05, (1,0), bound)
+        for i in range(4):
+            flow.advance()
+        self.assertEqual([len(v) for v in flow.history], [4, 3, 2])
+        self.assertAlmostEqual(bound.vortices.circulation,
+                               -flow.wake.circulation)
+        flow.advance(0.025)
+        self.assertEqual(len(flow.history), 1)
+        # a replaced wake invalidates the history
+        wake = flow.wake
+        flow.replace_wake(wake.positions, wake.strengths,
+                          np.arange(len(wake)))
+        flow.advance(0.025)
+        self.assertEqual(len(flow.history), 1)
+        # as does a wake policy
+        flow = AdamsBashforth3(0.05, (1,0), bound,
+                               wake_policies=[FarWake(age=0.1)])
+        for i in range(4):
+            flow.advance()
+        self.assertTrue(flow.wake_policies[0].num_removed > 0)
+        self.assertEqual(len(flow.history), 1)
+
+    def check_adaptive_pair(self, cls, tol):
+        # adaptive steppers, stopping exactly at the final time
+        Uinfty = (0,0)
+        vort = Vortices([(-2,0), (1,0)], [2 * np.pi, 4 * np.pi])
+        stepper = cls(0.2, Uinfty, wake=vort, rtol=1.e-8, atol=1.e-8)
+        t = 2.
+        while stepper.time < t - 1.e-12:
+            stepper.advance(min(stepper.dt, t - stepper.time))
+        omega = 1./3
+        v = np.array([np.cos(omega * t), np.sin(omega * t)])
+        exact = np.array([-2 * v, v])
+        assert_array_almost_equal(stepper.wake.positions, exact, tol)
+
+    def test_vortex_pair_bogacki_shampine(self):
+        self.check_adaptive_pair(BogackiShampine, 7)
+
+    def test_vortex_pair_dormand_prince(self):
+        self.check_adaptive_pair(DormandPrince, 8)
+
+    def test_adaptive_rejection(self):
+        # a large initial timestep is rejected, and the body state and shed
+        # vortex are restored before retrying
+        body = Pitching(flat_plate(10), 10, 2 * np.pi)
+        bound = BoundVortices(body)
+        flow = DormandPrince(0.5, (1,0), bound, rtol=1.e-5, atol=1.e-5)
+        flow.advance()
+        flow.advance()
+        self.assertTrue(flow.num_rejected > 0)
+        self.assertTrue(flow.last_dt < 0.5)
+        self.assertEqual(len(flow.wake), 3)
+        self.assertAlmostEqual(bound.time, flow.time)
+        self.assertAlmostEqual(bound.vortices.circulation,
+                               -flow.wake.circulation)
+        # velocity reused from the last stage matches a fresh evaluation
+        assert_array_almost_equal(flow._fsal, flow._wake_velocity())
+
+    def check_checkpoint(self, cls, **kwargs):
+        # a run restored from a checkpoint continues bit-identically
+        def setup():
+            body = Pitching(flat_plate(10), 10, 2 * np.pi)
+            return cls(0.05, (1,0), BoundVortices(body),
+                       wake_policies=[FarWake(age=0.2)], **kwargs)
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'checkpoint')
+            flow = setup()
+            for i in range(3):
+                flow.advance()
+            flow.save_checkpoint(path)
+            flow.save_checkpoint(path)
+            pressure = flow.bound.pressure()
+            for i in range(6):
+                flow.advance()
+            restored = setup()
+            restored.load_checkpoint(path)
+            assert_array_equal(restored.bound.pressure(), pressure)
+            for i in range(6):
+                restored.advance()
+        finally:
+            shutil.rmtree(tmpdir)
+        self.assertEqual(restored.time, flow.time)
+        assert_array_equal(restored.wake.positions, flow.wake.positions)
+        assert_array_equal(restored.wake.strengths, flow.wake.strengths)
+        self.assertEqual(restored.wake.circulation, flow.wake.circulation)
+        assert_array_equal(restored.bound.vortices.strengths,
+                           flow.bound.vortices.strengths)
+        assert_array_equal(restored.bound.pressure(), flow.bound.pressure())
+        assert_array_equal(restored.wake_ages, flow.wake_ages)
+        self.assertEqual(restored.removed_circulation,
+                         flow.removed_circulation)
+        self.assertEqual(restored.wake_policies[0].num_removed,
+                         flow.wake_policies[0].num_removed)
+
+    def check_interrupted_save(self, interrupt):
+        # a checkpoint saved, then modified as by an interrupted save, can
+        # still be loaded, and does not prevent later saves
+        def setup():
+            body = Pitching(flat_plate(10), 10, 2 * np.pi)
+            return RungeKutta2(0.05, (1,0), BoundVortices(body))
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'checkpoint')
+            flow = setup()
+            flow.advance()
+            flow.save_checkpoint(path)
+            interrupt(path)
+            restored = setup()
+            restored.load_checkpoint(path)
+            self.assertEqual(restored.time, flow.time)
+            assert_array_equal(restored.wake.positions, flow.wake.positions)
+            flow.advance()
+            flow.save_checkpoint(path)
+            self.assertFalse(os.path.exists(path + '.old'))
+            restored.load_checkpoint(path)
+            self.assertEqual(restored.time, flow.time)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_checkpoint_stale_old(self):
+        # interrupted after the new checkpoint was moved into place, before
+        # the previous one was removed
+        self.check_interrupted_save(
+            lambda path: shutil.copytree(path, path + '.old'))
+
+    def test_checkpoint_missing(self):
+        # interrupted between moving the previous checkpoint away and moving
+        # the new one into place
+        self.check_interrupted_save(
+            lambda path: os.rename(path, path + '.old'))
+
+    def test_checkpoint_rk4(self):
+        self.check_checkpoint(RungeKutta4)
+
+    def test_checkpoint_adams_bashforth(self):
+        self.check_checkpoint(AdamsBashforth3)
+
+    def test_checkpoint_dormand_prince(self):
+        self.check_checkpoint(DormandPrince, rtol=1.e-4, atol=1.e-4)
+
+    def check_tracers(self, cls):
+        # tracers move like wake vortices of zero strength
+        tracers = np.array([[-0.5, 0.1], [1.2, -0.05], [2., 0.3]])
+        def setup(**kwargs):
+            body = Pitching(flat_plate(10), 10, 2 * np.pi)
+            return cls(0.05, (1,0), BoundVortices(body), **kwargs)
+        flow = setup(tracers=tracers)
+        reference = setup(wake=Vortices(tracers, np.zeros(3)))
+        plain = setup()
+        for i in range(6):
+            flow.advance()
+            reference.advance()
+            plain.advance()
+        self.assertEqual(flow.num_tracers, 3)
+        assert_array_almost_equal(flow.tracers,
+                                  reference.wake.positions[:3], 12)
+        assert_array_almost_equal(flow.wake.positions,
+                                  reference.wake.positions[3:], 12)
+        # tracers induce no velocity
+        assert_array_almost_equal(flow.wake.positions, plain.wake.positions,
+                                  12)
+
+    def test_tracers_rk4(self):
+        self.check_tracers(RungeKutta4)
+
+    def test_tracers_adams_bashforth(self):
+        self.check_tracers(AdamsBashforth3)
+
+    def test_tracers_adaptive(self):
+        # tracers do not affect the choice of timestep
+        body = Pitching(flat_plate(10), 10, 2 * np.pi)
+        flow = DormandPrince(0.05, (1,0), BoundVortices(body),
+                             tracers=np.random.rand(50, 2))
+        body = Pitching(flat_plate(10), 10, 2 * np.pi)
+        plain = DormandPrince(0.05, (1,0), BoundVortices(body))
+        for i in range(4):
+            flow.advance()
+            plain.advance()
+        self.assertAlmostEqual(flow.dt, plain.dt, 12)
+        assert_array_almost_equal(flow.wake.positions, plain.wake.positions,
+                                  12)
+
+    def test_fsal_new_tracers(self):
+        # the last stage is not reused after the tracers are replaced
+        def setup():
+            body = Pitching(flat_plate(10), 10, 2 * np.pi)
+            flow = DormandPrince(0.05, (1,0), BoundVortices(body),
+                                 tracers=[[0.5, 0.5], [1., -0.5]])
+            flow.advance()
+            flow.tracers = [[2., 0.2], [-1., 0.1]]
+            return flow
+        flow = setup()
+        fresh = setup()
+        fresh._fsal = None
+        flow.advance()
+        fresh.advance()
+        assert_array_equal(flow.tracers, fresh.tracers)
+        assert_array_equal(flow.wake.positions, fresh.wake.positions)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import os
+import shutil
+import tempfile
+from pysces.trajectory import *
+from pysces.timestepper import RungeKutta2
+from pysces.body import flat_plate, Pitching
+from pysces.panel import BoundVortices
+from pysces.vortex import Vortices
+import numpy as np
+from numpy.testing import assert_array_equal, assert_array_almost_equal
+
+class TestTrajectory(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_record(self):
+        body = Pitching(flat_plate(10), 10, 2 * np.pi)
+        bound = BoundVortices(body)
+        recorder = TrajectoryRecorder(self.path, interval=2, chunk_size=3)
+        flow = RungeKutta2(0.1, (1,0), bound, recorders=[recorder],
+                           tracers=[(1, 0.5), (2, 0.5)])
+        saved = [(flow.time, np.array(flow.wake.positions))]
+        for i in range(10):
+            flow.advance()
+            if i % 2 == 1:
+                saved.append((flow.time, np.array(flow.wake.positions)))
+        recorder.close()
+        reader = TrajectoryReader(self.path)
+        self.assertEqual(reader.num_chunks, 2)
+        self.assertEqual(len(reader), 6)
+        for (t, positions), snapshot in zip(saved, reader):
+            self.assertEqual(snapshot['time'], t)
+            assert_array_equal(snapshot['wake_positions'], positions)
+        # last snapshot
+        assert_array_equal(snapshot['wake_strengths'], flow.wake.strengths)
+        assert_array_equal(snapshot['bound_strengths'],
+                           bound.vortices.strengths)
+        assert_array_equal(snapshot['body_points'], body.get_points())
+        self.assertEqual(snapshot['gam_shed'], bound.get_newly_shed()[1])
+        self.assertEqual(snapshot['motion'][0], body.get_motion().theta)
+        assert_array_equal(snapshot['tracer_positions'], flow.tracers)
+
+    def test_wake_only(self):
+        wake = Vortices([(-1,0), (1,0)], [1, 1])
+        with TrajectoryRecorder(self.path) as recorder:
+            flow = RungeKutta2(0.1, (0,0), wake=wake, recorders=[recorder])
+            flow.advance()
+        snapshots = list(TrajectoryReader(self.path))
+        self.assertEqual(len(snapshots), 2)
+        self.assertFalse('bound_strengths' in snapshots[0])
+        assert_array_equal(snapshots[1]['wake_positions'],
+                           flow.wake.positions)
+
+    def test_stale_chunks(self):
+        # chunks left by an earlier, longer run are not read
+        wake = Vortices([(-1,0), (1,0)], [1, 1])
+        for num_steps in (10, 3):
+            with TrajectoryRecorder(self.path, chunk_size=2) as recorder:
+                flow = RungeKutta2(0.1, (0,0), wake=wake,
+                                   recorders=[recorder])
+                for i in range(num_steps):
+                    flow.advance()
+        reader = TrajectoryReader(self.path)
+        self.assertEqual(reader.num_chunks, 2)
+        self.assertEqual(len(reader), 4)
+        assert_array_equal(reader.time_ranges[:,1], [0.1, flow.time])
+
+    def test_resume(self):
+        # a run resumed from a checkpoint continues the trajectory, replacing
+        # the snapshots recorded after the checkpoint
+        checkpoint = os.path.join(self.path, 'checkpoint')
+        trajectory = os.path.join(self.path, 'trajectory')
+        def setup(recorder):
+            body = Pitching(flat_plate(10), 10, 2 * np.pi)
+            return RungeKutta2(0.1, (1,0), BoundVortices(body),
+                               recorders=[recorder])
+        with TrajectoryRecorder(trajectory, chunk_size=3) as recorder:
+            flow = setup(recorder)
+            for i in range(4):
+                flow.advance()
+            flow.save_checkpoint(checkpoint)
+            for i in range(4):
+                flow.advance()
+        with TrajectoryRecorder(trajectory, chunk_size=3) as recorder:
+            flow = setup(recorder)
+            flow.load_checkpoint(checkpoint)
+            for i in range(6):
+                flow.advance()
+        reader = TrajectoryReader(trajectory)
+        snapshots = list(reader)
+        self.assertEqual(len(snapshots), 11)
+        assert_array_almost_equal([s['time'] for s in snapshots],
+                                  0.1 * np.arange(11))
+        assert_array_equal(snapshots[-1]['wake_positions'],
+                           flow.wake.positions)
+        self.assertEqual(reader.time_ranges[0,0], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from pysces.treecode import *
+from pysces.vortex import Vortices
+import numpy as np
+from numpy.testing import assert_array_equal, assert_array_almost_equal
+
+class TestBarnesHut(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.pos = np.random.rand(1000, 2)
+        self.gam = np.random.randn(1000)
+
+    def compute_error(self, evaluator, x=None):
+        vort = Vortices(self.pos, self.gam)
+        vort.core_radius = 1.e-3
+        vel_direct = vort.induced_velocity(x)
+        vort.evaluator = evaluator
+        vel = vort.induced_velocity(x)
+        return np.max(np.abs(vel - vel_direct)) / np.max(np.abs(vel_direct))
+
+    def test_opening_angle(self):
+        err_coarse = self.compute_error(BarnesHut(theta=0.7))
+        err_fine = self.compute_error(BarnesHut(theta=0.3))
+        self.assertTrue(err_fine < err_coarse)
+        self.assertTrue(err_fine < 1.e-4)
+
+    def test_exact(self):
+        # with theta = 0, every interaction is computed directly
+        self.assertTrue(self.compute_error(BarnesHut(theta=0)) < 1.e-12)
+
+    def test_targets(self):
+        x = 2 * np.random.rand(200, 2) - 0.5
+        self.assertTrue(self.compute_error(BarnesHut(theta=0.3), x) < 1.e-4)
+
+    def test_tree(self):
+        evaluator = BarnesHut(leaf_size=10)
+        vort = Vortices(self.pos, self.gam)
+        vort.evaluator = evaluator
+        vort.induced_velocity()
+        tree = evaluator.tree
+        leaves = list(tree.leaves())
+        self.assertTrue(all(len(leaf) <= 10 for leaf in leaves))
+        assert_array_equal(np.sort(np.concatenate(leaves)), np.arange(1000))
+
+    def test_tree_reused(self):
+        # the tree is rebuilt only when the vortices change
+        evaluator = BarnesHut()
+        x = np.random.rand(20, 2)
+        vel = evaluator.induced_velocity(x, self.pos, self.gam, 1.e-3)
+        tree = evaluator.tree
+        evaluator.induced_velocity(self.pos, self.pos, self.gam, 1.e-3)
+        self.assertTrue(evaluator.tree is tree)
+        assert_array_equal(
+            evaluator.induced_velocity(x, self.pos, self.gam, 1.e-3), vel)
+        evaluator.induced_velocity(x, self.pos, 2 * self.gam, 1.e-3)
+        self.assertFalse(evaluator.tree is tree)
+        tree = evaluator.tree
+        evaluator.order = 6
+        evaluator.induced_velocity(x, self.pos, 2 * self.gam, 1.e-3)
+        self.assertFalse(evaluator.tree is tree)
+
+    def test_query_radius(self):
+        tree = QuadTree(self.pos, self.gam)
+        point = (0.3, 0.6)
+        radius = 0.1
+        r = self.pos - point
+        expected, = np.where(np.sum(r * r, 1) <= radius**2)
+        assert_array_equal(tree.query_radius(point, radius), expected)
+
+    def test_coincident(self):
+        # coincident vortices cannot be separated, and stay in one leaf
+        tree = QuadTree(np.zeros((20, 2)), np.ones(20), leaf_size=4)
+        vel = tree.induced_velocity([(1,0)], 1.e-3)
+        assert_array_almost_equal(vel, [(0, 20 / (2 * np.pi))])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from pysces.vic import *
+from pysces.vortex import Vortices
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
+class TestVortexInCell(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.pos = np.random.rand(1000, 2)
+        self.gam = np.random.randn(1000)
+
+    def compute_error(self, evaluator, x=None):
+        vort = Vortices(self.pos, self.gam)
+        vort.core_radius = 1.e-3
+        vel_direct = vort.induced_velocity(x)
+        vort.evaluator = evaluator
+        vel = vort.induced_velocity(x)
+        return (np.sqrt(np.sum((vel - vel_direct)**2)) /
+                np.sqrt(np.sum(vel_direct**2)))
+
+    def test_p3m(self):
+        self.assertTrue(self.compute_error(VortexInCell()) < 2.e-3)
+
+    def test_sigma(self):
+        err_coarse = self.compute_error(VortexInCell(sigma=2))
+        err_fine = self.compute_error(VortexInCell(sigma=4))
+        self.assertTrue(err_fine < err_coarse)
+
+    def test_targets(self):
+        x = 2 * np.random.rand(200, 2) - 0.5
+        self.assertTrue(self.compute_error(VortexInCell(), x) < 2.e-3)
+
+    def test_num_pairs(self):
+        # the grid is refined with the number of particles, so the number of
+        # pairs in the correction grows like N
+        pairs = []
+        for n in (1000, 16000):
+            pos = np.random.rand(n, 2)
+            evaluator = VortexInCell()
+            evaluator.induced_velocity(pos, pos, np.ones(n), 1.e-3)
+            pairs.append(evaluator.num_pairs / n)
+        self.assertTrue(pairs[1] < 2 * pairs[0])
+        self.assertTrue(pairs[1] < 1000)
+
+    def test_block_size(self):
+        evaluator = VortexInCell()
+        vel = evaluator.induced_velocity(self.pos, self.pos, self.gam, 1.e-3)
+        vel_blocks = evaluator.induced_velocity(self.pos, self.pos, self.gam,
+                                                1.e-3, block_size=7)
+        assert_array_almost_equal(vel_blocks, vel, 12)
+
+    def test_mesh_only(self):
+        # far from an isolated blob, the mesh velocity is that of a point
+        # vortex
+        evaluator = VortexInCell(spacing=0.05, correction=False)
+        x = np.array([(1,0), (0,-1.5)])
+        vel = evaluator.induced_velocity(x, np.zeros((1,2)), [2 * np.pi], 0)
+        assert_array_almost_equal(vel, [(0,1), (1/1.5,0)], 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -74,6 +74,33 @@ class TestVortex(unittest.TestCase):
         vort.append(v, s)
         self.check_vortices(vort, [v], [s])
 
+    def test_append_growth(self):
+        vort = Vortices()
+        capacities = set()
+        for i in range(100):
+            vort.append((i, 0), i)
+            capacities.add(vort.capacity)
+            self.assertTrue(vort.capacity >= len(vort))
+        self.assertEqual(len(vort), 100)
+        # storage grows geometrically, not at every append
+        self.assertTrue(len(capacities) < 10)
+        assert_array_equal(vort.positions[:,0], np.arange(100))
+        assert_array_equal(vort.strengths, np.arange(100))
+        self.assertEqual(vort.circulation, np.sum(np.arange(100)))
+
+    def test_append_views(self):
+        # arrays returned before an append or assignment are not modified
+        vort = Vortices([(0,0), (1,0)], [1, 2])
+        pos = vort.positions
+        gam = vort.strengths
+        vort.append((2,0), 3)
+        vort.positions = vort.positions + 1
+        vort.strengths = 2 * vort.strengths
+        assert_array_equal(pos, [(0,0), (1,0)])
+        assert_array_equal(gam, [1, 2])
+        assert_array_equal(vort.positions, [(1,1), (2,1), (3,1)])
+        assert_array_equal(vort.strengths, [2, 4, 6])
+
     def test_iter(self):
         v1 = (-1,0)
         v2 = (1,0)
@@ -159,3 +186,67 @@ class TestVortex(unittest.TestCase):
         vel = vort.induced_velocity(x)
         vel_expected = np.array([(0,0.5/eps), (0,1./eps), (0,0.5/eps)])
         assert_array_equal(vel, vel_expected)
+
+    def test_induced_velocity_blocked(self):
+        # blocked evaluation should agree with a sum of single vortices
+        np.random.seed(0)
+        pos = np.random.rand(50, 2)
+        gam = np.random.randn(50)
+        x = np.random.rand(37, 2)
+        vort = Vortices(pos, gam)
+        vort.core_radius = 0.05
+        vort.block_size = 7
+        vel = vort.induced_velocity(x)
+        vel_expected = np.zeros_like(x)
+        for xvort, g in vort:
+            vel_expected += vort.induced_velocity_single(x, xvort, g)
+        assert_array_almost_equal(vel, vel_expected, 12)
+        vort.block_size = 1000
+        assert_array_almost_equal(vort.induced_velocity(x), vel, 12)
+
+    def test_induced_velocity_threads(self):
+        np.random.seed(0)
+        pos = np.random.rand(200, 2)
+        gam = np.random.randn(200)
+        vort = Vortices(pos, gam)
+        vort.block_size = 16
+        vel = vort.induced_velocity()
+        vort.num_workers = 4
+        # rows of tiles are summed in a different order
+        assert_array_almost_equal(vort.induced_velocity(), vel, 12)
+        x = np.random.rand(50, 2)
+        vort.num_workers = 1
+        vel = vort.induced_velocity(x)
+        vort.num_workers = 3
+        assert_array_equal(vort.induced_velocity(x), vel)
+
+    def test_float32(self):
+        np.random.seed(0)
+        pos = np.random.rand(100, 2)
+        gam = np.random.randn(100)
+        vort = Vortices(pos, gam, dtype=np.float32)
+        vort.append((0.5, 0.5), 1)
+        self.assertEqual(vort.positions.dtype, np.float32)
+        self.assertEqual(vort.strengths.dtype, np.float32)
+        vel = vort.induced_velocity()
+        self.assertEqual(vel.dtype, np.float32)
+        vel64 = Vortices(vort.positions, vort.strengths).induced_velocity()
+        np.testing.assert_allclose(vel, vel64, rtol=1.e-3, atol=1.e-3)
+        motion = RigidMotion(0.1, (1,2))
+        vel = vort.induced_velocity(pos, motion=motion)
+        self.assertEqual(vel.dtype, np.float32)
+        # mixed precision: accumulate in double precision
+        vort.accumulate_dtype = np.float64
+        self.assertEqual(vort.induced_velocity().dtype, np.float64)
+
+    def test_self_induced_symmetric(self):
+        # self-induced velocity should match the velocity at given points
+        np.random.seed(1)
+        pos = np.random.rand(100, 2)
+        gam = np.random.randn(100)
+        vort = Vortices(pos, gam)
+        vort.core_radius = 0.02
+        for block_size in (7, 100, 256):
+            vort.block_size = block_size
+            assert_array_almost_equal(vort.induced_velocity(),
+                                      vort.induced_velocity(pos.copy()), 12)
@@ -0,0 +1,117 @@
+import unittest
+from pysces.wake import *
+from pysces.body import flat_plate, Pitching
+from pysces.panel import BoundVortices
+from pysces.timestepper import RungeKutta2
+from pysces.vortex import Vortices
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
+def impulse(vort):
+    return np.dot(vort.strengths, vort.positions)
+
+class TestAmalgamation(unittest.TestCase):
+    def test_merge_conserves(self):
+        np.random.seed(0)
+        pos = 10 * np.random.rand(500, 2)
+        gam = np.random.randn(500)
+        stepper = RungeKutta2(0.1, (0,0), wake=Vortices(pos, gam))
+        circ = stepper.wake.circulation
+        imp = impulse(stepper.wake)
+        merge = Amalgamation(1.)
+        merge.apply(stepper)
+        wake = stepper.wake
+        self.assertTrue(len(wake) < 500)
+        self.assertEqual(merge.num_merged, 500 - len(wake))
+        self.assertAlmostEqual(wake.circulation, circ)
+        assert_array_almost_equal(impulse(wake), imp)
+
+    def test_same_sign(self):
+        # vortices of opposite sign are never merged
+        wake = Vortices([(0,0), (0.1,0), (0.2,0)], [1, -1, 2])
+        stepper = RungeKutta2(0.1, (0,0), wake=wake)
+        Amalgamation(1.).apply(stepper)
+        wake = stepper.wake
+        self.assertEqual(len(wake), 2)
+        assert_array_almost_equal(wake.positions, [(0.4/3,0), (0.1,0)])
+        assert_array_almost_equal(wake.strengths, [3, -1])
+
+    def test_max_strength(self):
+        wake = Vortices([(0,0), (0.1,0)], [1, 2])
+        stepper = RungeKutta2(0.1, (0,0), wake=wake)
+        Amalgamation(1., max_strength=2.5).apply(stepper)
+        self.assertEqual(len(stepper.wake), 2)
+
+    def test_timestepper(self):
+        body = Pitching(flat_plate(10), 10, 2 * np.pi)
+        bound = BoundVortices(body)
+        merge = Amalgamation(0.2, body_distance=0.5)
+        flow = RungeKutta2(0.05, (1,0), bound, wake_policies=[merge])
+        num_steps = 60
+        for i in range(num_steps):
+            flow.advance()
+        wake = flow.wake
+        self.assertEqual(len(wake) + merge.num_merged, num_steps + 1)
+        self.assertTrue(merge.num_merged > 0)
+        self.assertAlmostEqual(bound.vortices.circulation, -wake.circulation)
+        # vortices near the body are left alone
+        q = body.get_points()
+        near = wake.positions[:,0] < q[:,0].max() + 0.5
+        self.assertTrue(np.sum(near) > 5)
+
+class TestFarWake(unittest.TestCase):
+    def run_flow(self, policy, num_steps=60):
+        body = Pitching(flat_plate(10), 10, 2 * np.pi)
+        bound = BoundVortices(body)
+        flow = RungeKutta2(0.05, (1,0), bound, wake_policies=[policy])
+        for i in range(num_steps):
+            flow.advance()
+        return flow
+
+    def test_drop_distance(self):
+        policy = FarWake(distance=1.)
+        flow = self.run_flow(policy)
+        wake = flow.wake
+        self.assertTrue(policy.num_removed > 0)
+        self.assertEqual(len(wake) + policy.num_removed, 61)
+        self.assertTrue(np.max(wake.positions[:,0]) < 2.1)
+        # circulation of dropped vortices is still accounted for
+        self.assertAlmostEqual(flow.bound.vortices.circulation,
+                               -wake.circulation - flow.removed_circulation)
+        self.assertTrue(policy.last_error > 0)
+        self.assertTrue(policy.max_error >= policy.last_error)
+
+    def test_drop_age(self):
+        policy = FarWake(age=1.)
+        flow = self.run_flow(policy)
+        self.assertTrue(np.all(flow.wake_ages <= 1.))
+        self.assertEqual(len(flow.wake), 21)
+
+    def test_lump(self):
+        policy = FarWake(distance=1., lump_size=0.5)
+        flow = self.run_flow(policy)
+        wake = flow.wake
+        self.assertTrue(policy.num_removed > 0)
+        self.assertAlmostEqual(flow.removed_circulation, 0)
+        self.assertAlmostEqual(flow.bound.vortices.circulation,
+                               -wake.circulation)
+
+    def test_lump_conserves(self):
+        np.random.seed(0)
+        pos = 10 * np.random.rand(500, 2)
+        gam = np.random.randn(500)
+        stepper = RungeKutta2(0.1, (0,0), wake=Vortices(pos, gam))
+        stepper.advance()
+        circ = stepper.wake.circulation
+        imp = impulse(stepper.wake)
+        FarWake(age=0, lump_size=2.).apply(stepper)
+        # at most one vortex of each sign per cell
+        self.assertTrue(len(stepper.wake) <= 2 * 36)
+        self.assertAlmostEqual(stepper.wake.circulation, circ)
+        assert_array_almost_equal(impulse(stepper.wake), imp)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, FarWake)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,19 +1,70 @@
 """A module to easily set up and manage a simulation"""
+import os
+import shutil
 import numpy as np
+from .force import Impulse
 from .vortex import Vortices
 
-__all__ = ['ExplicitEuler', 'RungeKutta2', 'RungeKutta4']
+__all__ = ['ExplicitEuler', 'RungeKutta2', 'RungeKutta4',
+           'BogackiShampine', 'DormandPrince', 'AdamsBashforth2',
+           'AdamsBashforth3']
+
+def _scalar(value):
+    """Return the value of a 0-d array (e.g., loaded from a checkpoint)"""
+    return np.asarray(value)[()]
+
 
 class Timestepper(object):
     """Base class for timesteppers for unsteady boundary element simulation"""
 
-    def __init__(self, dt, Uinfty=(1,0), bound=None, wake=None):
-        """Initialize a simulation"""
+    def __init__(self, dt, Uinfty=(1,0), bound=None, wake=None,
+                 dtype=np.float64, wake_policies=None, recorders=None,
+                 tracers=None, profiler=None):
+        """Initialize a simulation
+
+        Parameters
+        ----------
+        dt : float
+            Timestep
+        Uinfty : array_like, optional
+            Farfield fluid velocity (default (1,0))
+        bound : BoundVortices, optional
+            Bound elements representing the body (default None)
+        wake : Vortices, optional
+            Initial wake vortices (default None)
+        dtype : data-type, optional
+            Floating point type used to store and advance the wake (default
+            float64).  For single precision runs, the bound elements should
+            be created with the same type.
+        wake_policies : list, optional
+            Objects such as :class:`Amalgamation` whose ``apply`` method is
+            called with the timestepper after each step, to reduce the number
+            of wake vortices (default None)
+        recorders : list, optional
+            Objects such as :class:`TrajectoryRecorder` whose ``record``
+            method is called with the timestepper after it is initialized and
+            after each step (default None).  Recorders with ``save_state``
+            and ``restore_state`` methods are saved in checkpoints.
+        tracers : array_like, optional
+            Initial positions (shape (m,2)) of passive tracers, which are
+            advanced with the flow but induce no velocity (default None)
+        profiler : Profiler, optional
+            If given, attached to the timestepper after it is initialized, to
+            measure the time spent in each phase of each step (default None)
+        """
         self._dt = dt
-        self._Uinfty = np.array(Uinfty)
+        self._dtype = np.dtype(dtype)
+        self._Uinfty = np.array(Uinfty, dtype=self._dtype)
         self._bound = bound
         self._has_body = (bound is not None)
+        self._wake_policies = list(wake_policies or [])
+        self._recorders = list(recorders or [])
+        if tracers is None:
+            tracers = np.zeros((0, 2))
+        self._initial_tracers = np.array(tracers, ndmin=2, dtype=self._dtype)
         self.initialize(wake)
+        if profiler is not None:
+            profiler.attach(self)
 
     def initialize(self, wake=None):
         """Initialize a timestepper
@@ -25,27 +76,48 @@ class Timestepper(object):
         """
         self._time = 0
         if wake is None:
-            self._wake = Vortices()
+            self._wake = Vortices(dtype=self._dtype)
         else:
-            self._wake = Vortices(wake.positions, wake.strengths)
+            self._wake = Vortices(wake.positions, wake.strengths,
+                                  dtype=self._dtype)
+            self._wake.evaluator = wake.evaluator
+            self._wake.core_radius = wake.core_radius
+        # time at which each wake vortex was shed
+        self._birth_times = [0] * len(self._wake)
+        # circulation of vortices removed from the wake by wake policies
+        self._removed_circulation = 0
+        # incremented whenever wake vortices or tracers are replaced
+        self._wake_version = 0
+        self._tracers = np.array(self._initial_tracers)
+        self._impulse = Impulse(self._Uinfty)
 
         if self._has_body:
             self._bound.time = 0
             self._bound.update_strengths_unsteady(self._dt, self._Uinfty)
-            self._wake.append(*self._bound.get_newly_shed())
+            self._shed()
+        self._update_impulse()
+        for recorder in self._recorders:
+            recorder.record(self)
 
     def advance(self, dt=None):
         """Advance the simulation for one timestep"""
         if not dt:
             dt = self._dt
-        x = self._wake.positions
+        x = self._positions()
         self._advance(x, dt)    # defer to subclass
+        for recorder in self._recorders:
+            recorder.record(self)
 
     @property
     def time(self):
         """Current simulation time"""
         return self._time
 
+    @property
+    def Uinfty(self):
+        """Farfield fluid velocity"""
+        return self._Uinfty
+
     @property
     def bound(self):
         """Body panels used in the simulation"""
@@ -56,6 +128,236 @@ class Timestepper(object):
         """Wake vortices used in the simulation"""
         return self._wake
 
+    @property
+    def tracers(self):
+        """Positions of passive tracers"""
+        return self._tracers
+
+    @tracers.setter
+    def tracers(self, value):
+        self._tracers = np.array(value, ndmin=2, dtype=self._dtype)
+        self._wake_version += 1
+
+    @property
+    def num_tracers(self):
+        return self._tracers.shape[0]
+
+    def _positions(self):
+        """Positions advanced by the timestepper
+
+        These are the positions of the tracers (if any), followed by the
+        positions of the wake vortices.  Newly shed vortices are appended at
+        the end, so the positions of older particles keep their indices.
+        """
+        if not self.num_tracers:
+            return self._wake.positions
+        if not len(self._wake):
+            return np.array(self._tracers)
+        return np.vstack([self._tracers, self._wake.positions])
+
+    @property
+    def wake_ages(self):
+        """Time since each wake vortex was shed
+
+        Vortices in the initial wake have age equal to the simulation time.
+        """
+        return self._time - np.array(self._birth_times, dtype=np.float64)
+
+    @property
+    def removed_circulation(self):
+        """Total circulation removed from the wake by wake policies
+
+        This is included when enforcing Kelvin's circulation theorem, so the
+        bound circulation is not affected by removing vortices.
+        """
+        return self._removed_circulation
+
+    def replace_wake(self, positions, strengths, index):
+        """Replace the wake vortices, e.g. after merging or removing some
+
+        Parameters
+        ----------
+        positions : array, shape (m,2)
+            New positions of wake vortices
+        strengths : array, shape (m,)
+            New strengths of wake vortices
+        index : array of int, shape (m,)
+            For each new vortex, the index of a current wake vortex from which
+            it takes its age
+
+        Notes
+        -----
+        Any change in the total circulation of the wake is added to
+        :attr:`removed_circulation`.
+        """
+        circ = self._wake.circulation
+        self._impulse.remove(self._time,
+                             (self._wake.positions, self._wake.strengths),
+                             (positions, strengths))
+        self._wake.positions = np.reshape(positions, (-1, 2))
+        self._wake.strengths = strengths
+        self._removed_circulation += circ - self._wake.circulation
+        self._wake_version += 1
+        birth = np.array(self._birth_times)
+        self._birth_times = list(birth[np.asarray(index, dtype=int)])
+
+    def _save_state(self):
+        """Return the state that may be changed while computing a step"""
+        bound_state = self._bound.save_state() if self._has_body else None
+        return self._time, self._wake.positions, bound_state
+
+    def _restore_state(self, state):
+        """Restore a state returned by :meth:`_save_state`"""
+        self._time, self._wake.positions, bound_state = state
+        if self._has_body:
+            self._bound.restore_state(bound_state)
+
+    def save_checkpoint(self, path):
+        """Save the full state of the simulation in the directory ``path``
+
+        Each array is saved as a separate ``.npy`` file, which
+        :meth:`load_checkpoint` maps into memory rather than reading.  The
+        checkpoint is written to a temporary directory which then replaces
+        ``path``, so an existing checkpoint is not lost if the run is
+        interrupted while saving: the previous checkpoint is kept in
+        ``path + '.old'`` until the new one is in place.  Recorders write the
+        snapshots recorded so far before the checkpoint is saved.
+        """
+        path = os.path.normpath(path)
+        tmp_path = path + '.tmp'
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        for name, value in self._get_state().items():
+            if value is not None:
+                np.save(os.path.join(tmp_path, name + '.npy'), value)
+        old_path = path + '.old'
+        if os.path.exists(path):
+            # remove a copy left by an interrupted save
+            if os.path.exists(old_path):
+                shutil.rmtree(old_path)
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+
+    def load_checkpoint(self, path):
+        """Restore the state saved by :meth:`save_checkpoint`
+
+        The timestepper should be set up as the one that saved the checkpoint
+        (same class, body, wake policies and parameters).  The restored run
+        continues exactly as the original one would have.
+
+        If ``path`` does not exist because a save was interrupted, the
+        previous checkpoint, kept in ``path + '.old'``, is loaded instead.
+        """
+        path = os.path.normpath(path)
+        if not os.path.exists(path) and os.path.exists(path + '.old'):
+            path = path + '.old'
+        state = {}
+        for filename in os.listdir(path):
+            name, ext = os.path.splitext(filename)
+            if ext == '.npy':
+                state[name] = np.load(os.path.join(path, filename),
+                                      mmap_mode='r')
+        self._set_state(state)
+
+    def _get_state(self):
+        """Return the state of the simulation as a dict of arrays or scalars"""
+        positions, strengths, circulation = self._wake.save_state()
+        state = {'time': self._time,
+                 'dt': self._dt,
+                 'wake_positions': positions,
+                 'wake_strengths': strengths,
+                 'wake_circulation': circulation,
+                 'birth_times': np.array(self._birth_times, dtype=np.float64),
+                 'removed_circulation': self._removed_circulation,
+                 'wake_version': self._wake_version,
+                 'tracers': self._tracers}
+        if self._has_body:
+            (state['bound_time'], state['bound_strengths'],
+             state['x_shed'], state['gam_shed'],
+             state['bound_history_times'], state['bound_history_jumps'],
+             state['bound_tangential']) = self._bound.save_state()
+        for name, value in self._impulse.save_state().items():
+            state['impulse_' + name] = value
+        for k, policy in enumerate(self._wake_policies):
+            if hasattr(policy, 'save_state'):
+                for name, value in policy.save_state().items():
+                    state['policy%d_%s' % (k, name)] = value
+        for k, recorder in enumerate(self._recorders):
+            if hasattr(recorder, 'save_state'):
+                for name, value in recorder.save_state().items():
+                    state['recorder%d_%s' % (k, name)] = value
+        return state
+
+    def _set_state(self, state):
+        """Restore a state returned by :meth:`_get_state`"""
+        self._time = _scalar(state['time'])
+        self._dt = _scalar(state['dt'])
+        self._wake.restore_state((state.get('wake_positions'),
+                                  state.get('wake_strengths'),
+                                  _scalar(state['wake_circulation'])))
+        self._birth_times = state['birth_times'].tolist()
+        self._removed_circulation = _scalar(state['removed_circulation'])
+        self._wake_version = _scalar(state['wake_version'])
+        self._tracers = np.array(state['tracers'])
+        self._impulse.restore_state(dict(
+            (name[len('impulse_'):], value) for name, value in state.items()
+            if name.startswith('impulse_')))
+        if self._has_body:
+            self._bound.restore_state((_scalar(state['bound_time']),
+                                       np.array(state['bound_strengths']),
+                                       np.array(state['x_shed']),
+                                       _scalar(state['gam_shed']),
+                                       state['bound_history_times'],
+                                       state['bound_history_jumps'],
+                                       state['bound_tangential']))
+        for k, policy in enumerate(self._wake_policies):
+            if hasattr(policy, 'restore_state'):
+                prefix = 'policy%d_' % k
+                policy.restore_state(dict(
+                    (name[len(prefix):], _scalar(value))
+                    for name, value in state.items()
+                    if name.startswith(prefix)))
+        for k, recorder in enumerate(self._recorders):
+            if hasattr(recorder, 'restore_state'):
+                prefix = 'recorder%d_' % k
+                recorder.restore_state(dict(
+                    (name[len(prefix):], value)
+                    for name, value in state.items()
+                    if name.startswith(prefix)))
+
+    def _bound_circulation(self):
+        """Bound circulation required by Kelvin's circulation theorem"""
+        return -(self._wake.circulation + self._removed_circulation)
+
+    def _shed(self):
+        """Add the vortex most recently shed by the body to the wake"""
+        self._wake.append(*self._bound.get_newly_shed())
+        self._birth_times.append(self._time)
+
+    @property
+    def impulse(self):
+        """Moments of the vorticity at the latest steps (see :class:`Impulse`)
+
+        Used by :func:`compute_forces` to find the force on the body.
+        """
+        return self._impulse
+
+    def _update_impulse(self):
+        self._impulse.update(self._time, self._wake, self._bound)
+
+    @property
+    def wake_policies(self):
+        """Policies applied to the wake after each step"""
+        return self._wake_policies
+
+    @property
+    def recorders(self):
+        """Recorders called after each step"""
+        return self._recorders
+
     @property
     def dt(self):
         """Timestep for the simulation"""
@@ -65,13 +367,14 @@ class Timestepper(object):
         """Compute the induced velocity at each of the wake vortices
 
         This is the right-hand side for the timestepper that advances the
-        positions of the wake vortices
+        positions of the wake vortices (and of any tracers, which come first)
 
         Parameters
         ----------
         pos : array, optional
-            Array (shape (n,2)) of positions of wake vortices.  Default is the
-            current positions of wake vortices.
+            Array (shape (n,2)) of positions of tracers and wake vortices, as
+            returned by :meth:`_positions`.  Default is the current positions
+            of tracers and wake vortices.
         dt : float, optional
             Timestep between current simulation time, and time at which the
             velocity is to be computed (default is 0).
@@ -87,27 +390,40 @@ class Timestepper(object):
         are updated, and the strengths of bound elements are updated as well to
         satisfy the no-flow-through boundary condition.
 
+        When there are tracers, the velocity at the tracers and the wake
+        vortices is computed in a single evaluation for all the targets.
+
         """
         wake = self._wake
         bound = self._bound
+        num_tracers = self.num_tracers
         if pos is None:
-            pos = wake.positions
+            pos = self._positions()
             shed = None
         else:
-            wake.positions = pos
+            if len(wake):
+                wake.positions = pos[num_tracers:]
             if self._has_body:
                 # update body position and strengths of surface elements
                 bound.time = self._time + dt
-                bound.update_strengths_unsteady(dt, self._Uinfty, wake)
-                shed = Vortices(*bound.get_newly_shed())
-        vel = wake.induced_velocity()
+                bound.update_strengths_unsteady(dt, self._Uinfty, wake,
+                                                self._bound_circulation())
+                shed = Vortices(*bound.get_newly_shed(), dtype=self._dtype)
+        if num_tracers:
+            vel = wake.induced_velocity(pos)
+        else:
+            vel = wake.induced_velocity()
         vel += self._Uinfty
         if self._has_body:
             vel += bound.induced_velocity(pos)
             if shed:
-                vel += shed.induced_velocity(pos)
+                vel += self._shed_velocity(shed, pos)
         return vel
 
+    def _shed_velocity(self, shed, x):
+        """Velocity induced at x by the vortex shed at an intermediate stage"""
+        return shed.induced_velocity(x)
+
     def _update_flow(self, wake_pos, dt):
         """Update the flow with new positions of wake vortices
 
@@ -122,34 +438,47 @@ class Timestepper(object):
         -----
         The body motion is updated to the new time, the strengths of the
         bound elements are updated to enforce the no-flow-through boundary
-        condition, and a newly shed vortex is added to the wake.
+        condition, and a newly shed vortex is added to the wake.  Finally,
+        any wake policies are applied.
 
         """
-        self._wake.positions = wake_pos
+        if self.num_tracers:
+            self._tracers = wake_pos[:self.num_tracers]
+            wake_pos = wake_pos[self.num_tracers:]
+        if len(self._wake):
+            self._wake.positions = wake_pos
         self._time += dt
         if self._has_body:
             self._bound.time = self._time
-            self._bound.update_strengths_unsteady(dt, self._Uinfty, self._wake)
-            self._wake.append(*self._bound.get_newly_shed())
+            self._bound.update_strengths_unsteady(dt, self._Uinfty, self._wake,
+                                                  self._bound_circulation())
+            self._shed()
+        for policy in self._wake_policies:
+            policy.apply(self)
+        self._update_impulse()
 
 
-class ExplicitEuler(Timestepper):
-    """Timestepper using the explicit Euler method"""
+# The formulas of the fixed-step methods only use _wake_velocity and
+# _update_flow, so they are kept in mixins that are shared with the ensemble
+# timesteppers (see ensemble.py).
+
+class _EulerMethod(object):
+    """Step of the explicit Euler method"""
 
     def _advance(self, x, dt):
         vel = self._wake_velocity()
         self._update_flow(x + vel * dt, dt)
 
-class RungeKutta2(Timestepper):
-    """Timestepper using 2nd-order Runge Kutta"""
+class _RungeKutta2Method(object):
+    """Step of the 2nd-order Runge Kutta method"""
 
     def _advance(self, x, dt):
         k1 = self._wake_velocity()
         k2 = self._wake_velocity(x + dt/2 * k1, dt/2)
         self._update_flow(x + dt * k2, dt)
 
-class RungeKutta4(Timestepper):
-    """Timestepper using 4th-order Runge Kutta"""
+class _RungeKutta4Method(object):
+    """Step of the 4th-order Runge Kutta method"""
 
     def _advance(self, x, dt):
         k1 = self._wake_velocity()
@@ -157,3 +486,292 @@ class RungeKutta4(Timestepper):
         k3 = self._wake_velocity(x + dt/2 * k2, dt/2)
         k4 = self._wake_velocity(x + dt * k3, dt)
         self._update_flow(x + dt/6 * (k1 + 2 * k2 + 2 * k3 + k4), dt)
+
+
+class ExplicitEuler(_EulerMethod, Timestepper):
+    """Timestepper using the explicit Euler method"""
+
+class RungeKutta2(_RungeKutta2Method, Timestepper):
+    """Timestepper using 2nd-order Runge Kutta"""
+
+class RungeKutta4(_RungeKutta4Method, Timestepper):
+    """Timestepper using 4th-order Runge Kutta"""
+
+
+class AdaptiveRungeKutta(Timestepper):
+    """Base class for embedded Runge-Kutta methods with step size control
+
+    Each step is computed with a pair of Runge-Kutta methods of different
+    order that share the same stages, and the difference between them is
+    used to estimate the error.  If the error is too large, the step is
+    rejected: the wake, the body and the shed vortex are restored to their
+    states at the beginning of the step, and the step is retried with a
+    smaller timestep.  After each step, the timestep :attr:`dt` is adjusted
+    so that the estimated error is close to the tolerance.
+
+    If the last stage of the method is evaluated at the new positions
+    (first same as last, FSAL), its velocity is reused as the first stage of
+    the next step, so only the newly shed vortex needs a new evaluation.
+
+    Subclasses define the Butcher tableau in the class attributes ``A``,
+    ``b``, ``b_err`` (difference between the weights of the two methods) and
+    ``c``, the order of the error estimate in ``error_order``, and whether
+    the method is FSAL in ``first_same_as_last``.
+
+    Parameters
+    ----------
+    dt : float
+        Initial timestep
+    rtol, atol : float, optional
+        Relative and absolute tolerances for the positions of wake vortices
+        (default 1.e-6 each)
+    dt_min : float, optional
+        Steps no smaller than this are always accepted (default 1.e-6 times
+        the initial timestep)
+    dt_max : float, optional
+        Largest timestep allowed (default None, for no limit)
+    **kwargs
+        Other arguments are passed to :class:`Timestepper`
+    """
+
+    safety = 0.9
+    min_factor = 0.2
+    max_factor = 5.
+    first_same_as_last = False
+
+    def __init__(self, dt, Uinfty=(1,0), bound=None, wake=None, rtol=1.e-6,
+                 atol=1.e-6, dt_min=None, dt_max=None, **kwargs):
+        self.rtol = rtol
+        self.atol = atol
+        self.dt_min = 1.e-6 * dt if dt_min is None else dt_min
+        self.dt_max = dt_max
+        self.num_rejected = 0
+        self._fsal = None
+        super(AdaptiveRungeKutta, self).__init__(dt, Uinfty, bound, wake,
+                                                 **kwargs)
+
+    def initialize(self, wake=None):
+        super(AdaptiveRungeKutta, self).initialize(wake)
+        self._fsal = None
+        self._fsal_version = self._wake_version
+        self._last_dt = None
+
+    def _get_state(self):
+        state = super(AdaptiveRungeKutta, self)._get_state()
+        state['fsal'] = self._fsal
+        state['fsal_version'] = self._fsal_version
+        state['last_dt'] = self._last_dt
+        state['num_rejected'] = self.num_rejected
+        return state
+
+    def _set_state(self, state):
+        super(AdaptiveRungeKutta, self)._set_state(state)
+        fsal = state.get('fsal')
+        self._fsal = None if fsal is None else np.array(fsal)
+        self._fsal_version = _scalar(state['fsal_version'])
+        last_dt = state.get('last_dt')
+        self._last_dt = None if last_dt is None else _scalar(last_dt)
+        self.num_rejected = _scalar(state['num_rejected'])
+
+    @property
+    def last_dt(self):
+        """Size of the most recent accepted step"""
+        return self._last_dt
+
+    def _point_velocity(self, x):
+        """Velocity at points x, for the current state of wake and body"""
+        vel = self._wake.induced_velocity(x)
+        vel += self._Uinfty
+        if self._has_body:
+            vel += self._bound.induced_velocity(x)
+        return vel
+
+    def _error_norm(self, err, x, y):
+        if err.size == 0:
+            return 0.
+        scale = self.atol + self.rtol * np.maximum(np.abs(x), np.abs(y))
+        return np.sqrt(np.mean((err / scale)**2))
+
+    def _advance(self, x, dt):
+        k1 = self._fsal
+        # the last stage is stale if the tracers or the wake were replaced
+        if k1 is None or self._fsal_version != self._wake_version:
+            k1 = self._wake_velocity()
+        while True:
+            state = self._save_state()
+            k = [k1]
+            for a, c in zip(self.A, self.c[1:]):
+                pos = x + dt * sum(aj * kj for aj, kj in zip(a, k) if aj)
+                k.append(self._wake_velocity(pos, c * dt))
+            y = x + dt * sum(bj * kj for bj, kj in zip(self.b, k) if bj)
+            err = dt * sum(ej * kj for ej, kj in zip(self.b_err, k) if ej)
+            # tracers do not affect the choice of timestep
+            m = self.num_tracers
+            err_norm = self._error_norm(err[m:], x[m:], y[m:])
+            if err_norm == 0:
+                factor = self.max_factor
+            else:
+                factor = min(self.max_factor,
+                             max(self.min_factor, self.safety *
+                                 err_norm**(-1. / (self.error_order + 1))))
+            if err_norm <= 1 or dt <= self.dt_min:
+                break
+            self.num_rejected += 1
+            self._restore_state(state)
+            dt = max(dt * factor, self.dt_min)
+
+        version = self._wake_version
+        num_vortices = len(self._wake)
+        self._update_flow(y, dt)
+        self._last_dt = dt
+        self._dt = dt * factor
+        if self.dt_max is not None:
+            self._dt = min(self._dt, self.dt_max)
+        # first same as last: the last stage is the velocity at the new
+        # positions, so only the newly shed vortex needs a new evaluation
+        self._fsal = None
+        if self.first_same_as_last and version == self._wake_version:
+            shed = len(self._wake) - num_vortices
+            if shed:
+                new = self._point_velocity(self._wake.positions[-shed:])
+                self._fsal = np.vstack([k[-1], new])
+            else:
+                self._fsal = k[-1]
+            self._fsal_version = self._wake_version
+
+
+class BogackiShampine(AdaptiveRungeKutta):
+    """Adaptive timestepper using the Bogacki-Shampine 3(2) pair"""
+
+    A = [[1/2.],
+         [0, 3/4.],
+         [2/9., 1/3., 4/9.]]
+    b = [2/9., 1/3., 4/9., 0]
+    b_err = [2/9. - 7/24., 1/3. - 1/4., 4/9. - 1/3., -1/8.]
+    c = [0, 1/2., 3/4., 1]
+    error_order = 2
+    first_same_as_last = True
+
+
+class DormandPrince(AdaptiveRungeKutta):
+    """Adaptive timestepper using the Dormand-Prince 5(4) pair"""
+
+    A = [[1/5.],
+         [3/40., 9/40.],
+         [44/45., -56/15., 32/9.],
+         [19372/6561., -25360/2187., 64448/6561., -212/729.],
+         [9017/3168., -355/33., 46732/5247., 49/176., -5103/18656.],
+         [35/384., 0, 500/1113., 125/192., -2187/6784., 11/84.]]
+    b = [35/384., 0, 500/1113., 125/192., -2187/6784., 11/84., 0]
+    b_err = [35/384. - 5179/57600., 0, 500/1113. - 7571/16695.,
+             125/192. - 393/640., -2187/6784. + 92097/339200.,
+             11/84. - 187/2100., -1/40.]
+    c = [0, 1/5., 3/10., 4/5., 8/9., 1, 1]
+    error_order = 4
+    first_same_as_last = True
+
+
+class AdamsBashforth(Timestepper):
+    """Base class for Adams-Bashforth multistep methods
+
+    Velocities of the wake vortices from previous steps are kept in a
+    history buffer, so each step requires only one evaluation of the wake
+    velocity (plus the solve for the bound strengths at the new time).
+
+    Since a vortex is shed at each step, older velocities are known only for
+    the older vortices.  Vortices appear in the wake in the order they are
+    shed, so the velocity from j steps ago covers a leading portion of the
+    current wake, and each vortex is advanced with the highest order method
+    for which its history is available (Euler for a newly shed vortex).
+
+    Until :attr:`order` velocities are available, and whenever the history
+    is no longer valid (the timestep changes, or a wake policy replaces the
+    wake vortices), steps are taken with a Runge-Kutta method of the same
+    order.  Subclasses set :attr:`order`.
+    """
+
+    # COEFFICIENTS[m-1] are the weights of the method of order m, applied to
+    # the velocities at the current step, the previous step, ...
+    COEFFICIENTS = [[1.],
+                    [3/2., -1/2.],
+                    [23/12., -16/12., 5/12.]]
+
+    def initialize(self, wake=None):
+        super(AdamsBashforth, self).initialize(wake)
+        self._history = []
+        self._history_dt = None
+        self._history_version = self._wake_version
+
+    @property
+    def history(self):
+        """Wake velocities at previous steps, most recent first"""
+        return self._history
+
+    def _get_state(self):
+        state = super(AdamsBashforth, self)._get_state()
+        for k, vel in enumerate(self._history):
+            state['history%d' % k] = vel
+        state['history_dt'] = self._history_dt
+        state['history_version'] = self._history_version
+        return state
+
+    def _set_state(self, state):
+        super(AdamsBashforth, self)._set_state(state)
+        self._history = []
+        while 'history%d' % len(self._history) in state:
+            self._history.append(
+                np.array(state['history%d' % len(self._history)]))
+        history_dt = state.get('history_dt')
+        self._history_dt = None if history_dt is None else _scalar(history_dt)
+        self._history_version = _scalar(state['history_version'])
+
+    def _advance(self, x, dt):
+        if (dt != self._history_dt or
+                self._history_version != self._wake_version):
+            self._history = []
+        vel = self._wake_velocity()
+        self._history.insert(0, vel)
+        del self._history[self.order:]
+        if len(self._history) < self.order:
+            y = self._startup(x, vel, dt)
+        else:
+            y = np.array(x)
+            lengths = [len(v) for v in self._history] + [0]
+            for m in range(1, self.order + 1):
+                # vortices with exactly m velocities in the history
+                lo, hi = lengths[m], lengths[m-1]
+                if hi > lo:
+                    coefs = self.COEFFICIENTS[m-1]
+                    y[lo:hi] += dt * sum(c * v[lo:hi] for c, v in
+                                         zip(coefs, self._history))
+        # the history is invalidated if wake policies replace the vortices
+        self._history_version = self._wake_version
+        self._update_flow(y, dt)
+        self._history_dt = dt
+
+
+class AdamsBashforth2(AdamsBashforth):
+    """Timestepper using the 2nd-order Adams-Bashforth method
+
+    The first step is taken with 2nd-order Runge Kutta.
+    """
+
+    order = 2
+
+    def _startup(self, x, k1, dt):
+        k2 = self._wake_velocity(x + dt/2 * k1, dt/2)
+        return x + dt * k2
+
+
+class AdamsBashforth3(AdamsBashforth):
+    """Timestepper using the 3rd-order Adams-Bashforth method
+
+    The first two steps are taken with Kutta's 3rd-order Runge Kutta method.
+    """
+
+    order = 3
+
+    def _startup(self, x, k1, dt):
+        k2 = self._wake_velocity(x + dt/2 * k1, dt/2)
+        k3 = self._wake_velocity(x + dt * (2 * k2 - k1), dt)
+        return x + dt/6 * (k1 + 4 * k2 + k3)
@@ -0,0 +1,318 @@
+"""Record the history of a simulation on disk
+
+A :class:`TrajectoryRecorder` attached to a :class:`Timestepper` saves a
+snapshot of the simulation every few steps: the time, the wake vortices,
+the passive tracers, the strengths of the bound vortices, the most recently
+shed vortex, and the points and motion of the body.  Snapshots are collected
+into chunks, and each chunk is written to its own ``.npz`` file by a
+background thread, so that writing overlaps with computing the next steps
+and the history is never held in memory.  A :class:`TrajectoryReader`
+iterates over the snapshots, loading one chunk at a time.
+
+The directory also holds a manifest, listing the chunks written so far and
+the times of their first and last snapshots.  Readers only use the chunks
+in the manifest, so chunks left over from an earlier run in the same
+directory are ignored.
+"""
+from __future__ import division
+
+import json
+import os
+import threading
+
+import numpy as np
+from ._util import _replace
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+__all__ = ['TrajectoryRecorder', 'TrajectoryReader']
+
+
+def _chunk_filename(path, index):
+    return os.path.join(path, 'chunk%06d.npz' % index)
+
+
+def _manifest_filename(path):
+    return os.path.join(path, 'manifest.json')
+
+
+def _write_manifest(path, time_ranges):
+    filename = _manifest_filename(path)
+    with open(filename + '.tmp', 'w') as f:
+        json.dump({'num_chunks': len(time_ranges),
+                   'time_ranges': time_ranges}, f)
+    _replace(filename + '.tmp', filename)
+
+
+class TrajectoryRecorder(object):
+    """Write snapshots of a simulation to a directory of chunked arrays
+
+    Pass the recorder to a :class:`Timestepper` in the ``recorders``
+    argument, so that :meth:`record` is called with the timestepper at the
+    start of the simulation and after each step::
+
+        with TrajectoryRecorder('run1', interval=10) as recorder:
+            flow = RungeKutta2(dt, Uinfty, bound, recorders=[recorder])
+            for i in range(num_steps):
+                flow.advance()
+
+    A new recorder starts a new trajectory, replacing any trajectory already
+    in the directory.  The state of the recorder is saved in the checkpoints
+    of the timestepper, so a run resumed with
+    :meth:`Timestepper.load_checkpoint` continues the trajectory from the
+    checkpoint, dropping the snapshots recorded after it.
+
+    Parameters
+    ----------
+    path : str
+        Directory in which to write the chunks (created if necessary)
+    interval : int, optional
+        A snapshot is saved once every ``interval`` calls to :meth:`record`
+        (default 1)
+    chunk_size : int, optional
+        Number of snapshots in each file (default 100)
+    max_pending : int, optional
+        Number of chunks waiting to be written before :meth:`record` blocks,
+        which limits memory use if the disk cannot keep up (default 2)
+    """
+
+    def __init__(self, path, interval=1, chunk_size=100, max_pending=2):
+        self.path = path
+        self.interval = interval
+        self.chunk_size = chunk_size
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._calls = 0
+        self._num_chunks = 0
+        # times of the first and last snapshots of each chunk
+        self._time_ranges = []
+        self._snapshots = []
+        _write_manifest(path, [])
+        self._error = None
+        self._queue = queue.Queue(max_pending)
+        self._thread = threading.Thread(target=self._write_chunks)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def record(self, stepper):
+        """Record a snapshot of the timestepper, if one is due"""
+        self._check_error()
+        calls = self._calls
+        self._calls += 1
+        if calls % self.interval:
+            return
+        # a full chunk is sent when the next snapshot is due, so the
+        # snapshot recorded when a run is set up is not written before
+        # restore_state replaces it
+        if len(self._snapshots) >= self.chunk_size:
+            self.flush()
+        self._snapshots.append(self._snapshot(stepper))
+
+    def _snapshot(self, stepper):
+        wake = stepper.wake
+        if len(wake):
+            positions = np.reshape(wake.positions, (-1, 2))
+            strengths = wake.strengths
+        else:
+            positions = np.zeros((0, 2))
+            strengths = np.zeros(0)
+        snapshot = {'time': stepper.time,
+                    'wake_positions': np.array(positions),
+                    'wake_strengths': np.array(strengths),
+                    'tracer_positions': np.array(stepper.tracers)}
+        bound = stepper.bound
+        if bound is not None:
+            x_shed, gam_shed = bound.get_newly_shed()
+            body = bound.body
+            motion = body.get_motion()
+            if motion:
+                motion = np.concatenate([[motion.theta], motion.x,
+                                         [motion.thetadot], motion.xdot])
+            else:
+                motion = np.zeros(6)
+            snapshot.update(bound_strengths=np.array(bound.vortices.strengths),
+                            x_shed=x_shed, gam_shed=gam_shed,
+                            body_points=np.array(body.get_points()),
+                            motion=motion)
+        return snapshot
+
+    def flush(self):
+        """Send the snapshots recorded so far to be written as a chunk"""
+        if not self._snapshots:
+            return
+        snapshots, self._snapshots = self._snapshots, []
+        chunk = {'wake_count': [len(s['wake_strengths']) for s in snapshots],
+                 'tracer_count': [len(s['tracer_positions'])
+                                  for s in snapshots]}
+        for name in snapshots[0]:
+            values = [s[name] for s in snapshots]
+            if name.startswith(('wake_', 'tracer_')):
+                chunk[name] = np.concatenate(values)
+            else:
+                chunk[name] = np.array(values)
+        self._time_ranges.append([float(snapshots[0]['time']),
+                                  float(snapshots[-1]['time'])])
+        self._queue.put((self._num_chunks, chunk, list(self._time_ranges)))
+        self._num_chunks += 1
+
+    def save_state(self):
+        """Return the counters of the recorder, as a dict
+
+        The snapshots recorded so far are written first, so the trajectory
+        up to this point is complete on disk.
+        """
+        self.flush()
+        self._queue.join()
+        self._check_error()
+        return {'calls': self._calls, 'num_chunks': self._num_chunks,
+                'time_ranges': np.array(self._time_ranges).reshape(-1, 2)}
+
+    def restore_state(self, state):
+        """Restore a state returned by :meth:`save_state`
+
+        Snapshots recorded since the recorder was created are discarded, and
+        recording continues after the last chunk written before the state
+        was saved.
+        """
+        self._queue.join()
+        self._check_error()
+        self._snapshots = []
+        self._calls = int(state['calls'])
+        self._num_chunks = int(state['num_chunks'])
+        self._time_ranges = np.reshape(state['time_ranges'], (-1, 2)).tolist()
+        _write_manifest(self.path, self._time_ranges)
+
+    def close(self):
+        """Write any remaining snapshots, and wait for writing to finish"""
+        if self._thread is None:
+            return
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._check_error()
+
+    def _check_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _write_chunks(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            try:
+                if self._error is None:
+                    self._write_chunk(*item)
+            except Exception as error:
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def _write_chunk(self, index, chunk, time_ranges):
+        filename = _chunk_filename(self.path, index)
+        # write to a temporary file, so readers never see a partial chunk,
+        # and add the chunk to the manifest once it is complete
+        with open(filename + '.tmp', 'wb') as f:
+            np.savez(f, **chunk)
+        _replace(filename + '.tmp', filename)
+        _write_manifest(self.path, time_ranges)
+
+
+class TrajectoryReader(object):
+    """Read snapshots written by a :class:`TrajectoryRecorder`
+
+    Iterating over the reader yields one snapshot at a time, as a dict with
+    keys ``time``, ``wake_positions``, ``wake_strengths`` and
+    ``tracer_positions``, and (if there is a body) ``bound_strengths``,
+    ``x_shed``, ``gam_shed``, ``body_points`` and ``motion`` (theta, x, y,
+    thetadot, xdot, ydot).  Only one chunk is held in memory at a time.
+
+    Parameters
+    ----------
+    path : str
+        Directory containing the chunks
+
+    Notes
+    -----
+    Only the chunks listed in the manifest are read.  For a directory
+    without a manifest, all consecutively numbered chunks are read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        manifest = _manifest_filename(path)
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                time_ranges = json.load(f)['time_ranges']
+            num_chunks = len(time_ranges)
+        else:
+            time_ranges = None
+            num_chunks = 0
+            while os.path.exists(_chunk_filename(path, num_chunks)):
+                num_chunks += 1
+        self._time_ranges = time_ranges
+        self._filenames = [_chunk_filename(path, k)
+                           for k in range(num_chunks)]
+
+    @property
+    def num_chunks(self):
+        return len(self._filenames)
+
+    @property
+    def time_ranges(self):
+        """Times of the first and last snapshots of each chunk
+
+        An array of shape (num_chunks, 2), or None if the directory has no
+        manifest.
+        """
+        if self._time_ranges is None:
+            return None
+        return np.reshape(self._time_ranges, (-1, 2))
+
+    @property
+    def times(self):
+        """Times of all snapshots"""
+        times = []
+        for filename in self._filenames:
+            with np.load(filename) as data:
+                times.append(data['time'])
+        return np.concatenate(times) if times else np.zeros(0)
+
+    def __len__(self):
+        return len(self.times)
+
+    def __iter__(self):
+        for filename in self._filenames:
+            for snapshot in self._read_chunk(filename):
+                yield snapshot
+
+    @staticmethod
+    def _read_chunk(filename):
+        with np.load(filename) as data:
+            chunk = dict((name, data[name]) for name in data.files)
+        offsets = {}
+        for prefix in ('wake_', 'tracer_'):
+            counts = chunk.pop(prefix + 'count')
+            offsets[prefix] = np.concatenate([[0], np.cumsum(counts)])
+        for i in range(len(chunk['time'])):
+            snapshot = {}
+            for name, values in chunk.items():
+                prefix = name[:name.find('_') + 1]
+                if prefix in offsets:
+                    lo, hi = offsets[prefix][i:i+2]
+                    snapshot[name] = values[lo:hi]
+                else:
+                    snapshot[name] = values[i]
+            yield snapshot
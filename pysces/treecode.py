@@ -0,0 +1,311 @@
+"""Barnes-Hut treecode for velocities induced by point vortices
+
+Vortices are sorted into an adaptive quadtree, and the velocity induced by
+all the vortices in a box is approximated by a truncated multipole expansion
+about the center of the box whenever the box is small compared with its
+distance from the target point.  See Barnes and Hut [1]_.
+
+References
+----------
+.. [1] Barnes, J. and Hut, P., "A hierarchical O(N log N) force-calculation
+   algorithm", Nature 324, 446-449, 1986.
+"""
+from __future__ import division
+
+import numpy as np
+from .vortex import Vortices, _direct_velocity
+
+__all__ = ['BarnesHut', 'QuadTree']
+
+
+class QuadTree(object):
+    """An adaptive quadtree of point vortices
+
+    Each box is split into four children until it contains no more than
+    ``leaf_size`` vortices.  Every box stores the coefficients of the
+    multipole expansion of the velocity induced by the vortices it contains.
+
+    Parameters
+    ----------
+    positions : 2d array, shape (n,2)
+        Locations of vortices
+    strengths : 1d array, shape (n,)
+        Strengths of vortices
+    leaf_size : int, optional
+        Maximum number of vortices in a leaf box (default 16)
+    order : int, optional
+        Number of terms in the multipole expansions (default 4).  An order
+        of 2 corresponds to a monopole plus dipole approximation.
+    """
+
+    # boxes are not split beyond this depth (e.g., for coincident vortices)
+    MAX_DEPTH = 40
+
+    def __init__(self, positions, strengths, leaf_size=16, order=4):
+        self._positions = np.array(positions, ndmin=2, dtype=np.float64)
+        self._strengths = np.array(strengths, ndmin=1, dtype=np.float64)
+        self._leaf_size = leaf_size
+        self._order = order
+        self._build()
+
+    def _build(self):
+        pos = self._positions
+        n = pos.shape[0]
+        perm = np.arange(n)
+        if n:
+            lower = pos.min(axis=0)
+            upper = pos.max(axis=0)
+        else:
+            lower = upper = np.zeros(2)
+        center = [0.5 * (lower + upper)]
+        half = [0.5 * np.max(upper - lower)]
+        start = [0]
+        end = [n]
+        children = [[]]
+        depth = [0]
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            lo, hi = start[node], end[node]
+            if hi - lo <= self._leaf_size or depth[node] >= self.MAX_DEPTH:
+                continue
+            c = center[node]
+            idx = perm[lo:hi]
+            quadrant = ((pos[idx,0] >= c[0]) * 2 + (pos[idx,1] >= c[1]))
+            order = np.argsort(quadrant, kind='mergesort')
+            perm[lo:hi] = idx[order]
+            counts = np.bincount(quadrant, minlength=4)
+            h = 0.5 * half[node]
+            offset = lo
+            for quad in range(4):
+                if counts[quad] == 0:
+                    continue
+                sx = 1 if quad >= 2 else -1
+                sy = 1 if quad % 2 else -1
+                children[node].append(len(center))
+                stack.append(len(center))
+                center.append(c + h * np.array([sx, sy]))
+                half.append(h)
+                start.append(offset)
+                end.append(offset + counts[quad])
+                children.append([])
+                depth.append(depth[node] + 1)
+                offset += counts[quad]
+        self._perm = perm
+        self._center = np.array(center)
+        self._half = np.array(half)
+        self._start = np.array(start)
+        self._end = np.array(end)
+        self._children = children
+        # multipole coefficients a_k = sum_j q_j (z_j - z_c)^k,
+        # with q_j = gam_j / (2 pi i)
+        p = self._order
+        z = pos[perm,0] + 1j * pos[perm,1]
+        q = self._strengths[perm] / (2j * np.pi)
+        zc = self._center[:,0] + 1j * self._center[:,1]
+        self._coefs = np.zeros((len(center), p), dtype=complex)
+        for node in range(len(center)):
+            lo, hi = start[node], end[node]
+            w = z[lo:hi] - zc[node]
+            term = q[lo:hi].copy()
+            for k in range(p):
+                self._coefs[node, k] = np.sum(term)
+                term *= w
+
+    @property
+    def positions(self):
+        """Locations of vortices in the tree"""
+        return self._positions
+
+    @property
+    def strengths(self):
+        """Strengths of vortices in the tree"""
+        return self._strengths
+
+    @property
+    def num_nodes(self):
+        """Total number of boxes in the tree"""
+        return len(self._children)
+
+    def leaves(self):
+        """Iterate over the leaf boxes of the tree
+
+        Yields
+        ------
+        indices : 1d array
+            Indices (into :attr:`positions`) of the vortices in each leaf
+        """
+        for node, kids in enumerate(self._children):
+            if not kids:
+                yield self._perm[self._start[node]:self._end[node]]
+
+    def query_radius(self, point, radius):
+        """Return indices of the vortices within a distance of a point
+
+        Parameters
+        ----------
+        point : array_like, shape (2,)
+            Center of the search region
+        radius : float
+            Radius of the search region
+
+        Returns
+        -------
+        indices : 1d array
+            Indices (into :attr:`positions`) of the vortices lying within
+            ``radius`` of ``point``
+        """
+        point = np.asarray(point, dtype=np.float64)
+        found = []
+        stack = [0] if len(self._positions) else []
+        while stack:
+            node = stack.pop()
+            # distance from point to the box
+            gap = np.abs(point - self._center[node]) - self._half[node]
+            if np.sum(np.maximum(gap, 0)**2) > radius**2:
+                continue
+            if self._children[node]:
+                stack.extend(self._children[node])
+            else:
+                idx = self._perm[self._start[node]:self._end[node]]
+                r = self._positions[idx] - point
+                found.append(idx[np.sum(r * r, 1) <= radius**2])
+        if not found:
+            return np.zeros(0, dtype=int)
+        return np.sort(np.concatenate(found))
+
+    def induced_velocity(self, x, core_radius, theta=0.5, block_size=None):
+        """Compute the velocity induced at points x by the vortices in the tree
+
+        Parameters
+        ----------
+        x : 2d array, shape (n,2)
+            Locations at which to compute induced velocity
+        core_radius : float
+            Velocities are regularized as solid-body rotation within this
+            radius (see :meth:`Vortices.induced_velocity_single`)
+        theta : float, optional
+            Opening angle (default 0.5).  A box of width w is approximated by
+            its multipole expansion at targets further than w / theta from
+            its center.
+        block_size : int, optional
+            Number of targets and sources in each block of the direct sums
+            over leaves (default :attr:`Vortices.block_size`)
+
+        Returns
+        -------
+        vel : 2d array, shape (n,2)
+        """
+        if block_size is None:
+            block_size = Vortices.block_size
+        x = np.array(x, ndmin=2, dtype=np.float64)
+        vel = np.zeros((x.shape[0], 2))
+        if x.shape[0] == 0 or self._positions.shape[0] == 0:
+            return vel
+        z = x[:,0] + 1j * x[:,1]
+        f = np.zeros(x.shape[0], dtype=complex)
+        xs = self._positions[self._perm]
+        gs = self._strengths[self._perm]
+        p = self._order
+        stack = [(0, np.arange(x.shape[0]))]
+        while stack:
+            node, targets = stack.pop()
+            c = self._center[node]
+            d = z[targets] - (c[0] + 1j * c[1])
+            dist = np.abs(d)
+            h = self._half[node]
+            far = ((2 * h < theta * dist) &
+                   (dist - np.sqrt(2) * h >= core_radius))
+            if np.any(far):
+                dinv = 1 / d[far]
+                coefs = self._coefs[node]
+                g = coefs[p - 1] * np.ones_like(dinv)
+                for k in range(p - 2, -1, -1):
+                    g = g * dinv + coefs[k]
+                f[targets[far]] += g * dinv
+                targets = targets[~far]
+                if targets.size == 0:
+                    continue
+            kids = self._children[node]
+            if kids:
+                stack.extend((kid, targets) for kid in kids)
+            else:
+                lo, hi = self._start[node], self._end[node]
+                vel[targets] += _direct_velocity(x[targets], xs[lo:hi],
+                                                 gs[lo:hi], core_radius,
+                                                 block_size)
+        vel[:,0] += f.real
+        vel[:,1] -= f.imag
+        return vel
+
+
+class BarnesHut(object):
+    """Barnes-Hut treecode for the velocity induced by point vortices
+
+    To use the method for a set of vortices, set its ``evaluator``::
+
+        vort.evaluator = BarnesHut(theta=0.3)
+
+    The quadtree built for the most recent evaluation is kept in
+    :attr:`tree`, and is reused until the vortices move or change strength.
+    Within a timestep, the wake is evaluated at the collocation points of
+    the body and then at the vortices themselves, so both evaluations share
+    one tree.  The tree may also be used directly, for instance to find
+    nearby vortices.
+
+    Parameters
+    ----------
+    theta : float, optional
+        Opening angle (default 0.5).  Smaller values are more accurate and
+        more expensive; theta = 0 is equivalent to direct summation.
+    order : int, optional
+        Number of terms in the multipole expansions (default 4)
+    leaf_size : int, optional
+        Maximum number of vortices in a leaf box (default 16)
+    """
+
+    def __init__(self, theta=0.5, order=4, leaf_size=16):
+        self.theta = theta
+        self.order = order
+        self.leaf_size = leaf_size
+        self.tree = None
+
+    def build(self, xvort, gam):
+        """Return the quadtree for the given vortices
+
+        The current :attr:`tree` is returned if it was built for the same
+        vortices, with the same parameters.  Otherwise a new tree is built.
+        """
+        tree = self.tree
+        if (tree is None or tree._leaf_size != self.leaf_size or
+                tree._order != self.order or
+                not np.array_equal(tree.positions, xvort) or
+                not np.array_equal(tree.strengths, gam)):
+            tree = self.tree = QuadTree(xvort, gam, self.leaf_size,
+                                        self.order)
+        return tree
+
+    def induced_velocity(self, x, xvort, gam, core_radius, block_size=None):
+        """Compute the velocity induced at points x by vortices at xvort
+
+        Parameters
+        ----------
+        x : 2d array, shape (n,2)
+            Locations at which to compute induced velocity
+        xvort : 2d array, shape (m,2)
+            Locations of vortices
+        gam : 1d array, shape (m,)
+            Strengths of vortices
+        core_radius : float
+            Velocities are regularized as solid-body rotation within this
+            radius
+        block_size : int, optional
+            Number of targets and sources in each block of the direct sums
+            over leaves (default :attr:`Vortices.block_size`)
+
+        Returns
+        -------
+        vel : 2d array, shape (n,2)
+        """
+        tree = self.build(xvort, gam)
+        return tree.induced_velocity(x, core_radius, self.theta, block_size)
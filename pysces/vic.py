@@ -0,0 +1,263 @@
+"""Vortex-in-cell (particle-mesh) evaluation of induced velocities
+
+Circulation is spread onto a uniform grid with the :math:`M_4'`
+interpolation kernel, the velocity on the grid is found by a discrete
+convolution evaluated with FFTs, and the velocity is then interpolated back
+to the target points with the same kernel.  Free-space boundary conditions
+are obtained by zero-padding the grid to twice its size (Hockney and
+Eastwood [1]_).
+
+The convolution uses the velocity kernel of a Gaussian vortex blob of radius
+:math:`\\sigma`, which is smooth on the scale of the grid.  The difference
+between the point-vortex kernel and the blob kernel decays like
+:math:`e^{-r^2/\\sigma^2}`, so adding it back for nearby pairs of particles
+(the particle-particle, particle-mesh or P3M method) recovers the velocity of
+the regularized point vortices used by :class:`Vortices`.
+
+References
+----------
+.. [1] Hockney, R. W. and Eastwood, J. W., "Computer Simulation Using
+   Particles", Institute of Physics, 1988.
+"""
+from __future__ import division
+
+import numpy as np
+from .vortex import Vortices
+
+__all__ = ['VortexInCell']
+
+
+def _m4prime(s):
+    """Return the M4' interpolation kernel at (signed) distances s"""
+    s = np.abs(s)
+    w = np.where(s < 1, 1 - 2.5 * s**2 + 1.5 * s**3,
+                 0.5 * (2 - s)**2 * (1 - s))
+    w[s >= 2] = 0
+    return w
+
+
+def _blob_factor(rsq, sigma):
+    """Return (1 - exp(-r^2 / sigma^2)) / r^2, the Gaussian blob factor"""
+    fac = np.empty_like(rsq)
+    small = rsq < 1.e-12 * sigma**2
+    fac[small] = 1 / sigma**2
+    fac[~small] = -np.expm1(-rsq[~small] / sigma**2) / rsq[~small]
+    return fac
+
+
+class VortexInCell(object):
+    """Particle-mesh evaluator for the velocity induced by point vortices
+
+    To use the method for a set of vortices, set its ``evaluator``::
+
+        vort.evaluator = VortexInCell()
+
+    Parameters
+    ----------
+    spacing : float, optional
+        Grid spacing.  If None (default), the spacing is chosen so that
+        ``num_cells`` cells span the largest dimension of the particles.
+    num_cells : int, optional
+        Number of grid cells spanning the particles, if ``spacing`` is not
+        given.  If None (default), it is chosen from the number N of
+        particles, as the square root of N / ``particles_per_cell`` (and
+        at least 16), so that the cost of the correction grows like N for
+        uniformly distributed particles.
+    particles_per_cell : float, optional
+        Average number of particles per grid cell, used to choose
+        ``num_cells`` (default 1)
+    sigma : float, optional
+        Radius of the Gaussian blob used on the mesh, in units of the grid
+        spacing (default 3).  Larger values reduce the interpolation error
+        on the mesh, and increase the cost of the short-range correction.
+    cutoff : float, optional
+        Radius, in units of ``sigma``, within which the short-range
+        correction is computed by direct summation (default 3)
+    correction : bool, optional
+        If True (default), add the short-range particle-particle correction,
+        so that the result approximates the velocity induced by regularized
+        point vortices.  If False, return the (smoother) velocity induced by
+        Gaussian blobs of radius ``sigma``.
+
+    Notes
+    -----
+    The cost is O(N + G log G) for N particles on a grid of G points, plus
+    the cost of the correction, which is proportional to the number of pairs
+    of particles closer than ``cutoff * sigma``.  The number of pairs in the
+    correction of the most recent evaluation is kept in :attr:`num_pairs`.
+    """
+
+    def __init__(self, spacing=None, num_cells=None, sigma=3., cutoff=3.,
+                 correction=True, particles_per_cell=1.):
+        self.spacing = spacing
+        self.num_cells = num_cells
+        self.particles_per_cell = particles_per_cell
+        self.sigma = sigma
+        self.cutoff = cutoff
+        self.correction = correction
+        self.num_pairs = 0
+        self._kernel_key = None
+        self._kernel_hat = None
+
+    def _grid(self, pts, num_particles=None):
+        lower = pts.min(axis=0)
+        upper = pts.max(axis=0)
+        h = self.spacing
+        if h is None:
+            num_cells = self.num_cells
+            if num_cells is None:
+                if num_particles is None:
+                    num_particles = pts.shape[0]
+                num_cells = max(int(np.ceil(np.sqrt(
+                    num_particles / self.particles_per_cell))), 16)
+            h = max(np.max(upper - lower), 1.e-300) / num_cells
+        margin = 3
+        origin = lower - margin * h
+        cells = np.ceil((upper - lower) / h).astype(int)
+        shape = tuple(cells + 2 * margin + 1)
+        return origin, h, shape
+
+    def _weights(self, x, origin, h):
+        """Return grid indices and M4' weights in each direction"""
+        s = (x - origin) / h
+        base = np.floor(s).astype(int) - 1
+        idx = base[:, :, np.newaxis] + np.arange(4)
+        w = _m4prime(s[:, :, np.newaxis] - idx)
+        return idx, w
+
+    def _kernel(self, h, shape):
+        """Return the transforms of the blob velocity kernel on the grid"""
+        key = (h, shape, self.sigma)
+        if key != self._kernel_key:
+            nx, ny = shape
+            rx = np.fft.fftfreq(2 * nx, 1 / (2 * nx)) * h
+            ry = np.fft.fftfreq(2 * ny, 1 / (2 * ny)) * h
+            rx, ry = np.meshgrid(rx, ry, indexing='ij')
+            fac = _blob_factor(rx * rx + ry * ry, self.sigma * h) / (2 * np.pi)
+            self._kernel_hat = (np.fft.rfft2(-ry * fac),
+                                np.fft.rfft2(rx * fac))
+            self._kernel_key = key
+        return self._kernel_hat
+
+    def mesh_velocity(self, x, xvort, gam):
+        """Velocity induced at points x by Gaussian blobs, computed on a mesh
+
+        Parameters
+        ----------
+        x : 2d array, shape (n,2)
+            Locations at which to compute induced velocity
+        xvort : 2d array, shape (m,2)
+            Locations of vortices
+        gam : 1d array, shape (m,)
+            Strengths of vortices
+
+        Returns
+        -------
+        vel : 2d array, shape (n,2)
+        """
+        x = np.asarray(x, dtype=np.float64)
+        xvort = np.asarray(xvort, dtype=np.float64)
+        grid = self._grid(np.vstack([x, xvort]), xvort.shape[0])
+        return self._mesh_velocity(x, xvort, gam, *grid)
+
+    def _mesh_velocity(self, x, xvort, gam, origin, h, shape):
+        nx, ny = shape
+        # spread circulation onto the grid
+        idx, w = self._weights(xvort, origin, h)
+        weights = (w[:, 0, :, np.newaxis] * w[:, 1, np.newaxis, :] *
+                   np.asarray(gam)[:, np.newaxis, np.newaxis])
+        cells = (idx[:, 0, :, np.newaxis] * (2 * ny) +
+                 idx[:, 1, np.newaxis, :])
+        circ = np.bincount(cells.ravel(), weights.ravel(), 4 * nx * ny)
+        circ_hat = np.fft.rfft2(circ.reshape((2 * nx, 2 * ny)))
+        # convolve with the blob kernel, and interpolate back to targets
+        idx, w = self._weights(x, origin, h)
+        weights = w[:, 0, :, np.newaxis] * w[:, 1, np.newaxis, :]
+        vel = np.zeros((x.shape[0], 2))
+        for k, kernel_hat in enumerate(self._kernel(h, shape)):
+            field = np.fft.irfft2(circ_hat * kernel_hat, (2 * nx, 2 * ny))
+            values = field[idx[:, 0, :, np.newaxis], idx[:, 1, np.newaxis, :]]
+            vel[:, k] = np.sum(values * weights, axis=(1, 2))
+        return vel
+
+    def _correction(self, x, xvort, gam, core_radius, h, block_size):
+        """Point vortex velocity, minus blob velocity, for nearby pairs
+
+        The pairs are summed in blocks of at most ``block_size`` targets by
+        ``block_size`` sources, so the temporary arrays stay small.
+        """
+        sigma = self.sigma * h
+        cell_size = self.cutoff * sigma
+        lower = np.minimum(x.min(axis=0), xvort.min(axis=0))
+        src_cell = np.floor((xvort - lower) / cell_size).astype(int)
+        tgt_cell = np.floor((x - lower) / cell_size).astype(int)
+        ny = max(src_cell[:,1].max(), tgt_cell[:,1].max()) + 3
+        src_key = (src_cell[:,0] + 1) * ny + src_cell[:,1] + 1
+        tgt_key = (tgt_cell[:,0] + 1) * ny + tgt_cell[:,1] + 1
+        order = np.argsort(src_key, kind='mergesort')
+        sorted_key = src_key[order]
+        xs = xvort[order]
+        gs = np.asarray(gam)[order] / (2 * np.pi)
+        vel = np.zeros((x.shape[0], 2))
+        self.num_pairs = 0
+        tgt_order = np.argsort(tgt_key, kind='mergesort')
+        keys, first = np.unique(tgt_key[tgt_order], return_index=True)
+        last = np.append(first[1:], len(tgt_order))
+        for key, lo_t, hi_t in zip(keys, first, last):
+            idx = []
+            for row in (key - ny, key, key + ny):
+                lo, hi = np.searchsorted(sorted_key, (row - 1, row + 2))
+                if hi > lo:
+                    idx.append(np.arange(lo, hi))
+            if not idx:
+                continue
+            idx = np.concatenate(idx)
+            self.num_pairs += (hi_t - lo_t) * len(idx)
+            for i in range(lo_t, hi_t, block_size):
+                targets = tgt_order[i:min(i + block_size, hi_t)]
+                xt = x[targets]
+                for j in range(0, len(idx), block_size):
+                    src = idx[j:j+block_size]
+                    rx = xt[:, 0, np.newaxis] - xs[np.newaxis, src, 0]
+                    ry = xt[:, 1, np.newaxis] - xs[np.newaxis, src, 1]
+                    rsq = rx * rx + ry * ry
+                    fac = (1 / np.maximum(rsq, core_radius**2) -
+                           _blob_factor(rsq, sigma))
+                    vel[targets, 0] -= np.dot(ry * fac, gs[src])
+                    vel[targets, 1] += np.dot(rx * fac, gs[src])
+        return vel
+
+    def induced_velocity(self, x, xvort, gam, core_radius, block_size=None):
+        """Compute the velocity induced at points x by vortices at xvort
+
+        Parameters
+        ----------
+        x : 2d array, shape (n,2)
+            Locations at which to compute induced velocity
+        xvort : 2d array, shape (m,2)
+            Locations of vortices
+        gam : 1d array, shape (m,)
+            Strengths of vortices
+        core_radius : float
+            Velocities are regularized as solid-body rotation within this
+            radius (used only by the short-range correction)
+        block_size : int, optional
+            Number of targets and sources in each block of the short-range
+            correction (default :attr:`Vortices.block_size`)
+
+        Returns
+        -------
+        vel : 2d array, shape (n,2)
+        """
+        x = np.asarray(x, dtype=np.float64)
+        xvort = np.asarray(xvort, dtype=np.float64)
+        if block_size is None:
+            block_size = Vortices.block_size
+        if x.shape[0] == 0 or xvort.shape[0] == 0:
+            return np.zeros((x.shape[0], 2))
+        origin, h, shape = self._grid(np.vstack([x, xvort]), xvort.shape[0])
+        vel = self._mesh_velocity(x, xvort, gam, origin, h, shape)
+        if self.correction:
+            vel += self._correction(x, xvort, gam, core_radius, h,
+                                    block_size)
+        return vel
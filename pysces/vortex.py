@@ -1,34 +1,78 @@
 import numpy as np
+from multiprocessing.pool import ThreadPool
 
 __all__ = ['Vortices']
 
+# thread pools shared by all Vortices, keyed by number of workers
+_pools = {}
+
+def _thread_pool(num_workers):
+    if num_workers not in _pools:
+        _pools[num_workers] = ThreadPool(num_workers)
+    return _pools[num_workers]
+
 class Vortices(object):
     core_radius = 1.e-3
+    block_size = 256
+    num_workers = 1
+    evaluator = None
+    accumulate_dtype = None
 
-    def __init__(self, positions=None, strengths=None):
+    def __init__(self, positions=None, strengths=None, dtype=np.float64):
+        self._dtype = np.dtype(dtype)
+        # Positions and strengths are stored at the start of buffers that
+        # grow geometrically, so that appending is amortized O(1).  The
+        # arrays _positions and _strengths are views of the live region.
+        self._position_buffer = None
+        self._strength_buffer = None
         if positions is None:
             self._positions = None
         else:
-            self._positions = np.array(positions, ndmin=2, dtype=np.float64)
+            self._set_positions(np.array(positions, ndmin=2,
+                                         dtype=self._dtype))
 
         if strengths is None:
             self._circulation = 0
             if positions is None:
                 self._strengths = None
             else:
-                self._strengths = np.zeros(self._positions.shape[0],
-                                           dtype=np.float64)
+                self._set_strengths(np.zeros(self._positions.shape[0],
+                                             dtype=self._dtype))
         else:
-            self._strengths = np.array(strengths, ndmin=1, dtype=np.float64)
+            self._set_strengths(np.array(strengths, ndmin=1,
+                                         dtype=self._dtype))
             self._circulation = np.sum(self._strengths)
 
+    @staticmethod
+    def _new_buffer(value, capacity):
+        buf = np.empty((max(capacity, value.shape[0]),) + value.shape[1:],
+                       dtype=value.dtype)
+        buf[:value.shape[0]] = value
+        return buf
+
+    @staticmethod
+    def _capacity(buf):
+        return 0 if buf is None else buf.shape[0]
+
+    def _set_positions(self, value):
+        # copy into a fresh buffer, so that views previously returned by
+        # the positions property are unaffected
+        buf = self._new_buffer(value, self._capacity(self._position_buffer))
+        self._position_buffer = buf
+        self._positions = buf[:value.shape[0]]
+
+    def _set_strengths(self, value):
+        buf = self._new_buffer(value, self._capacity(self._strength_buffer))
+        self._strength_buffer = buf
+        self._strengths = buf[:value.shape[0]]
+
     @property
     def positions(self):
         return self._positions
 
     @positions.setter
     def positions(self, value):
-        self._positions = np.array(value, dtype=np.float64)
+        self._set_positions(np.array(value, dtype=self._dtype))
 
     @property
     def strengths(self):
@@ -36,14 +80,24 @@ class Vortices(object):
 
     @strengths.setter
     def strengths(self, value):
-        strengths = np.array(value, ndmin=1, dtype=np.float64)
-        self._strengths = strengths
-        self._circulation = np.sum(strengths)
+        self._set_strengths(np.array(value, ndmin=1, dtype=self._dtype))
+        self._circulation = np.sum(self._strengths)
 
     @property
     def circulation(self):
         return self._circulation
 
+    @property
+    def dtype(self):
+        """Data type used to store positions and strengths"""
+        return self._dtype
+
+    @property
+    def capacity(self):
+        """Number of vortices that can be held before buffers must grow"""
+        return min(self._capacity(self._position_buffer),
+                   self._capacity(self._strength_buffer))
+
     def __len__(self):
         if self._positions is None:
             return 0
@@ -55,16 +109,51 @@ class Vortices(object):
         return iter(zip(self._positions, self._strengths))
 
     def append(self, position, strength):
-        position = np.array(position, ndmin=2)
-        strength = np.array(strength, ndmin=1)
+        """Append vortices with the given positions and strengths
+
+        Storage grows by doubling, so appending a vortex at each step is
+        amortized O(1).
+        """
+        position = np.array(position, ndmin=2, dtype=self._dtype)
+        strength = np.array(strength, ndmin=1, dtype=self._dtype)
+        n = len(self)
+        m = n + position.shape[0]
+        if m > self._capacity(self._position_buffer):
+            self._position_buffer = self._new_buffer(
+                self._position_buffer[:n] if n else position[:0], 2 * m)
+        if m > self._capacity(self._strength_buffer):
+            self._strength_buffer = self._new_buffer(
+                self._strength_buffer[:n] if n else strength[:0], 2 * m)
+        self._position_buffer[n:m] = position
+        self._strength_buffer[n:m] = strength
+        self._positions = self._position_buffer[:m]
+        self._strengths = self._strength_buffer[:m]
+        self._circulation += np.sum(strength)
+
+    def save_state(self):
+        """Return the state of the vortices, for use with :meth:`restore_state`
+
+        The circulation is saved as well, since it is accumulated as vortices
+        are appended, and may differ in the last bits from the sum of the
+        strengths.
+        """
         if self._positions is None:
-            self._positions = position
-            self._strengths = strength
-            self._circulation = np.sum(strength)
+            return None, None, self._circulation
+        return (np.array(self._positions), np.array(self._strengths),
+                self._circulation)
+
+    def restore_state(self, state):
+        """Restore a state returned by :meth:`save_state`"""
+        positions, strengths, circulation = state
+        if positions is None:
+            self._positions = self._strengths = None
+            self._position_buffer = self._strength_buffer = None
         else:
-            self._positions = np.append(self._positions, position, axis=0)
-            self._strengths = np.append(self._strengths, strength)
-            self._circulation += np.sum(strength)
+            self._set_positions(np.array(positions, ndmin=2,
+                                         dtype=self._dtype))
+            self._set_strengths(np.array(strengths, ndmin=1,
+                                         dtype=self._dtype))
+        self._circulation = circulation
 
     def induced_velocity_single(self, x, xvort, gam):
         r"""Compute velocity induced at points x by a single vortex
@@ -103,7 +192,27 @@ class Vortices(object):
         return np.squeeze(vel)
 
     def induced_velocity(self, x=None, motion=None):
-        """Compute the induced velocity at the given point(s)"""
+        """Compute the induced velocity at the given point(s)
+
+        If :attr:`evaluator` is None (the default), the sum over all vortices
+        is evaluated directly, in blocks of at most :attr:`block_size` targets
+        by :attr:`block_size` sources, so that the temporary arrays stay small
+        regardless of the number of vortices.  If :attr:`num_workers` is
+        greater than 1, blocks are evaluated concurrently by a pool of threads
+        (NumPy releases the GIL for the array operations).  When x is None and
+        there is no motion, the targets are the vortices themselves, and each
+        pairwise interaction is computed once and applied to both vortices.
+
+        If :attr:`evaluator` is set, the sum is computed by
+        ``evaluator.induced_velocity(x, xvort, gam, core_radius,
+        block_size=block_size)``, for instance a :class:`FastMultipole`
+        object, which uses :attr:`block_size` for any direct sums.
+
+        The arithmetic is done in :attr:`dtype`.  If :attr:`accumulate_dtype`
+        is set (e.g., to ``np.float64`` for vortices stored in single
+        precision), the contributions of each block are summed, and the
+        velocity is returned, in that type instead.
+        """
         if motion is None:
             positions = self._positions
         else:
@@ -111,8 +220,206 @@ class Vortices(object):
         if x is None:
             x = self._positions
         else:
-            x = np.array(x)
-        vel = np.zeros_like(x, dtype=np.float64)
-        for xvort, gam in zip(positions, self._strengths):
-            vel += self.induced_velocity_single(x, xvort, gam)
+            x = np.array(x, dtype=self._dtype)
+        vel = np.zeros(x.shape, dtype=self.accumulate_dtype or self._dtype)
+        if positions is None or x.size == 0:
+            return vel
+        targets = np.reshape(x, (-1, 2))
+        if (self.evaluator is None and x is self._positions and
+                positions is self._positions):
+            # targets are the vortices themselves: use the symmetry of the
+            # pairwise interactions
+            _direct_self_velocity(positions, self._strengths,
+                                  self.core_radius, self.block_size, out=vel,
+                                  num_workers=self.num_workers)
+        elif self.evaluator is None:
+            _direct_velocity(targets, positions, self._strengths,
+                             self.core_radius, self.block_size,
+                             out=np.reshape(vel, (-1, 2)),
+                             num_workers=self.num_workers)
+        else:
+            vel[...] = np.reshape(
+                self.evaluator.induced_velocity(targets, positions,
+                                                self._strengths,
+                                                self.core_radius,
+                                                block_size=self.block_size),
+                vel.shape)
         return vel
+
+
+def _direct_velocity(x, xvort, gam, core_radius, block_size, out=None,
+                     num_workers=1):
+    """Sum the velocities induced at points x by vortices at xvort
+
+    This is the same computation as :meth:`Vortices.induced_velocity_single`,
+    summed over all vortices, but evaluated in tiles of at most
+    ``block_size`` targets by ``block_size`` sources.
+
+    Parameters
+    ----------
+    x : 2d array, shape (n,2)
+        Locations at which to compute induced velocity
+    xvort : 2d array, shape (m,2)
+        Locations of vortices
+    gam : 1d array, shape (m,)
+        Strengths of vortices
+    core_radius : float
+        Velocities are regularized as solid-body rotation within this radius
+    block_size : int
+        Maximum number of targets (and sources) handled in a single tile
+    out : 2d array, shape (n,2), optional
+        If given, induced velocities are added to this array
+    num_workers : int, optional
+        Number of threads among which blocks of targets are divided
+        (default 1).  Each thread adds into its own slice of ``out``.
+
+    Returns
+    -------
+    out : 2d array, shape (n,2)
+    """
+    if out is None:
+        out = np.zeros((x.shape[0], 2))
+    rsq_min = core_radius**2
+    gam_fac = np.asarray(gam) / (2 * np.pi)
+    nsrc = xvort.shape[0]
+
+    def target_block(i):
+        xi = x[i:i+block_size]
+        vel = out[i:i+block_size]
+        for j in range(0, nsrc, block_size):
+            rx = xi[:,0,np.newaxis] - xvort[np.newaxis,j:j+block_size,0]
+            ry = xi[:,1,np.newaxis] - xvort[np.newaxis,j:j+block_size,1]
+            rsq = rx * rx
+            rsq += ry * ry
+            np.maximum(rsq, rsq_min, out=rsq)
+            rx /= rsq
+            ry /= rsq
+            vel[:,0] -= np.dot(ry, gam_fac[j:j+block_size])
+            vel[:,1] += np.dot(rx, gam_fac[j:j+block_size])
+
+    blocks = range(0, x.shape[0], block_size)
+    if num_workers > 1 and len(blocks) > 1:
+        _thread_pool(num_workers).map(target_block, blocks)
+    else:
+        for i in blocks:
+            target_block(i)
+    return out
+
+
+def _direct_self_velocity(xvort, gam, core_radius, block_size, out=None,
+                          num_workers=1):
+    """Sum the velocities induced by vortices at xvort on each other
+
+    Since the interaction between a pair of vortices is antisymmetric, the
+    distance and denominator for each pair are computed only once, and used
+    for both vortices.  Tiles of at most ``block_size`` by ``block_size``
+    pairs are evaluated for the diagonal and upper triangle only.
+
+    Parameters
+    ----------
+    xvort : 2d array, shape (n,2)
+        Locations of vortices
+    gam : 1d array, shape (n,)
+        Strengths of vortices
+    core_radius : float
+        Velocities are regularized as solid-body rotation within this radius
+    block_size : int
+        Maximum number of vortices in each dimension of a tile
+    out : 2d array, shape (n,2), optional
+        If given, induced velocities are added to this array
+    num_workers : int, optional
+        Number of threads among which rows of tiles are divided (default 1).
+        Each thread adds into its own array, and these are summed at the end.
+
+    Returns
+    -------
+    out : 2d array, shape (n,2)
+    """
+    n = xvort.shape[0]
+    if out is None:
+        out = np.zeros((n, 2))
+    rsq_min = core_radius**2
+    gam_fac = np.asarray(gam) / (2 * np.pi)
+
+    def tile_row(i, vel):
+        xi = xvort[i:i+block_size]
+        gi = gam_fac[i:i+block_size]
+        for j in range(i, n, block_size):
+            rx = xi[:,0,np.newaxis] - xvort[np.newaxis,j:j+block_size,0]
+            ry = xi[:,1,np.newaxis] - xvort[np.newaxis,j:j+block_size,1]
+            rsq = rx * rx
+            rsq += ry * ry
+            np.maximum(rsq, rsq_min, out=rsq)
+            rx /= rsq
+            ry /= rsq
+            gj = gam_fac[j:j+block_size]
+            vel[i:i+block_size,0] -= np.dot(ry, gj)
+            vel[i:i+block_size,1] += np.dot(rx, gj)
+            if j != i:
+                vel[j:j+block_size,0] += np.dot(gi, ry)
+                vel[j:j+block_size,1] -= np.dot(gi, rx)
+
+    blocks = range(0, n, block_size)
+    if num_workers > 1 and len(blocks) > 1:
+        def worker(k):
+            vel = np.zeros_like(out)
+            for i in blocks[k::num_workers]:
+                tile_row(i, vel)
+            return vel
+        for vel in _thread_pool(num_workers).map(worker, range(num_workers)):
+            out += vel
+    else:
+        for i in blocks:
+            tile_row(i, out)
+    return out
+
+
+def _batched_velocity(x, xvort, gam, core_radius, block_size, out=None):
+    """Sum the velocities induced at points x by vortices at xvort, in batches
+
+    Each of K independent sets of targets is paired with its own set of
+    vortices, and all K sums are evaluated together, in tiles of at most
+    about ``block_size**2`` pairs in total.
+
+    Parameters
+    ----------
+    x : 3d array, shape (K,n,2)
+        Locations at which to compute induced velocity
+    xvort : 3d array, shape (K,m,2)
+        Locations of vortices
+    gam : 2d array, shape (K,m)
+        Strengths of vortices
+    core_radius : float or array broadcastable to shape (K,1,1)
+        Velocities are regularized as solid-body rotation within this radius
+        (which may differ for each set)
+    block_size : int
+        Number of sources in each tile
+    out : 3d array, shape (K,n,2), optional
+        If given, induced velocities are added to this array
+
+    Returns
+    -------
+    out : 3d array, shape (K,n,2)
+    """
+    num_batches, n = x.shape[:2]
+    if out is None:
+        out = np.zeros((num_batches, n, 2))
+    rsq_min = core_radius**2
+    gam_fac = np.asarray(gam)[:,:,np.newaxis] / (2 * np.pi)
+    nsrc = xvort.shape[1]
+    num_targets = max(block_size // max(num_batches, 1), 1)
+    for i in range(0, n, num_targets):
+        xi = x[:,i:i+num_targets]
+        vel = out[:,i:i+num_targets]
+        for j in range(0, nsrc, block_size):
+            rx = xi[:,:,0,np.newaxis] - xvort[:,np.newaxis,j:j+block_size,0]
+            ry = xi[:,:,1,np.newaxis] - xvort[:,np.newaxis,j:j+block_size,1]
+            rsq = rx * rx
+            rsq += ry * ry
+            np.maximum(rsq, rsq_min, out=rsq)
+            rx /= rsq
+            ry /= rsq
+            g = gam_fac[:,j:j+block_size]
+            vel[:,:,0] -= np.matmul(ry, g)[:,:,0]
+            vel[:,:,1] += np.matmul(rx, g)[:,:,0]
+    return out
@@ -0,0 +1,263 @@
+"""Policies for limiting the number of wake vortices in long simulations
+
+A vortex is shed into the wake at every timestep, so the cost of each step
+grows without bound.  The classes in this module reduce the number of wake
+vortices far from the body.  Pass them to a :class:`Timestepper` in the
+``wake_policies`` argument; they are applied after each step, once the newly
+shed vortex has been added to the wake.
+"""
+from __future__ import division
+
+import numpy as np
+from .vortex import Vortices
+
+__all__ = ['Amalgamation', 'FarWake']
+
+
+def _body_distance(pos, bound):
+    """Distance from each position to the bounding box of the body"""
+    if bound is None:
+        return np.full(pos.shape[0], np.inf)
+    q = bound.body.get_points()
+    lower = q.min(axis=0)
+    upper = q.max(axis=0)
+    gap = np.maximum(np.maximum(lower - pos, pos - upper), 0)
+    return np.sqrt(np.sum(gap * gap, 1))
+
+
+def _merge_cells(pos, gam, candidates, cell_size, max_strength=None):
+    """Merge vortices of the same sign lying in the same square cell
+
+    Each group of candidates with the same sign in a cell of the given size
+    is replaced by a single vortex with the total strength of the group,
+    located at its center of vorticity.  The merged vortex takes the place
+    of the first member of the group.
+
+    Returns
+    -------
+    pos, gam : arrays
+        Positions and strengths of all vortices, with merged vortices in
+        place of the first member of each group
+    keep : 1d array of bool
+        Which entries of pos and gam remain after merging
+    """
+    keep = np.ones(len(gam), dtype=bool)
+    if len(candidates) < 2:
+        return pos, gam, keep
+    cells = np.floor(pos[candidates] / cell_size).astype(np.int64)
+    keys = np.column_stack([cells, gam[candidates] >= 0])
+    _, first, group = np.unique(keys, axis=0, return_index=True,
+                                return_inverse=True)
+    group = group.ravel()
+    num_groups = len(first)
+    count = np.bincount(group, minlength=num_groups)
+    total = np.bincount(group, gam[candidates], num_groups)
+    merge = count > 1
+    if max_strength is not None:
+        merge &= np.abs(total) <= max_strength
+    if not np.any(merge):
+        return pos, gam, keep
+    # center of vorticity of each group (plain mean if total is zero)
+    zero = total == 0
+    weight = np.where(zero[group], 1, gam[candidates])
+    norm = np.where(zero, count, total)
+    center = np.column_stack([
+        np.bincount(group, weight * pos[candidates,k], num_groups) / norm
+        for k in (0, 1)])
+    keep[candidates[merge[group]]] = False
+    rep = candidates[first[merge]]
+    keep[rep] = True
+    pos = np.array(pos)
+    gam = np.array(gam)
+    pos[rep] = center[merge]
+    gam[rep] = total[merge]
+    return pos, gam, keep
+
+
+class _WakePolicy(object):
+    """Base class for wake policies
+
+    Subclasses list, in ``_state_attributes``, the attributes that change
+    as the policy is applied, which are saved in checkpoints.
+    """
+
+    _state_attributes = ('_steps',)
+
+    def save_state(self):
+        """Return the counters and statistics of the policy, as a dict"""
+        return dict((name, getattr(self, name))
+                    for name in self._state_attributes)
+
+    def restore_state(self, state):
+        """Restore a state returned by :meth:`save_state`"""
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class Amalgamation(_WakePolicy):
+    """Merge nearby vortices of the same sign in the far wake
+
+    Vortices further than ``body_distance`` from the body are sorted into
+    square cells whose diagonal is ``distance``.  All vortices of the same
+    sign in a cell are replaced by a single vortex with their total strength,
+    located at their center of vorticity, so that the total circulation and
+    the linear impulse of the wake are unchanged (see Spalart [1]_).
+
+    Parameters
+    ----------
+    distance : float
+        Vortices are merged only if they are closer than this distance
+    max_strength : float, optional
+        If given, vortices are not merged if the merged vortex would be
+        stronger than this (default None)
+    body_distance : float, optional
+        Only vortices at least this far from the bounding box of the body
+        are merged (default 0)
+    interval : int, optional
+        Vortices are merged once every ``interval`` steps (default 1)
+
+    References
+    ----------
+    .. [1] Spalart, P. R., "Vortex methods for separated flows", NASA
+       Technical Memorandum 100068, 1988.
+    """
+
+    _state_attributes = ('_steps', 'num_merged')
+
+    def __init__(self, distance, max_strength=None, body_distance=0.,
+                 interval=1):
+        self.distance = distance
+        self.max_strength = max_strength
+        self.body_distance = body_distance
+        self.interval = interval
+        self.num_merged = 0
+        self._steps = 0
+
+    def apply(self, stepper):
+        """Merge vortices in the wake of the given :class:`Timestepper`"""
+        self._steps += 1
+        if self._steps % self.interval:
+            return
+        wake = stepper.wake
+        if len(wake) < 2:
+            return
+        pos = wake.positions
+        gam = wake.strengths
+        far = _body_distance(pos, stepper.bound) >= self.body_distance
+        candidates, = np.where(far)
+        if len(candidates) < 2:
+            return
+        new_pos, new_gam, keep = _merge_cells(pos, gam, candidates,
+                                              self.distance / np.sqrt(2),
+                                              self.max_strength)
+        if np.all(keep):
+            return
+        self.num_merged += len(wake) - np.count_nonzero(keep)
+        stepper.replace_wake(new_pos[keep], new_gam[keep],
+                             np.flatnonzero(keep))
+
+
+class FarWake(_WakePolicy):
+    """Remove or lump vortices in the far wake
+
+    A wake vortex is in the far wake if it is further than ``distance`` from
+    the bounding box of the body, or older than ``age``.  Far-wake vortices
+    are either dropped, or (if ``lump_size`` is given) lumped into
+    super-particles: the vortices of each sign in a square cell of side
+    ``lump_size`` are replaced by a single vortex at their center of
+    vorticity, which preserves the monopole and dipole moments of each cell.
+
+    When vortices are dropped, their circulation is recorded by the
+    timestepper (see :attr:`Timestepper.removed_circulation`), so that the
+    bound circulation still satisfies Kelvin's theorem.
+
+    Parameters
+    ----------
+    distance : float, optional
+        Distance from the body beyond which vortices are in the far wake
+    age : float, optional
+        Age beyond which vortices are in the far wake
+    lump_size : float, optional
+        Size of cells in which far-wake vortices are lumped together.  If
+        None (default), far-wake vortices are dropped.
+    interval : int, optional
+        The policy is applied once every ``interval`` steps (default 1)
+
+    Attributes
+    ----------
+    last_error : float
+        Largest change in the velocity at the collocation points of the body
+        caused by the most recent application of the policy
+    max_error : float
+        Largest value of ``last_error`` so far
+    num_removed : int
+        Total number of vortices removed (dropped, or absorbed by lumping)
+    """
+
+    _state_attributes = ('_steps', 'num_removed', 'last_error', 'max_error')
+
+    def __init__(self, distance=None, age=None, lump_size=None, interval=1):
+        if distance is None and age is None:
+            raise ValueError("distance or age must be specified")
+        self.distance = distance
+        self.age = age
+        self.lump_size = lump_size
+        self.interval = interval
+        self.last_error = 0.
+        self.max_error = 0.
+        self.num_removed = 0
+        self._steps = 0
+
+    def far_wake(self, stepper):
+        """Return indices of vortices in the far wake of a timestepper"""
+        wake = stepper.wake
+        far = np.zeros(len(wake), dtype=bool)
+        if len(wake) == 0:
+            return np.flatnonzero(far)
+        if self.distance is not None:
+            far |= (_body_distance(wake.positions, stepper.bound) >
+                    self.distance)
+        if self.age is not None:
+            far |= stepper.wake_ages > self.age
+        return np.flatnonzero(far)
+
+    def apply(self, stepper):
+        """Drop or lump vortices in the far wake of a :class:`Timestepper`"""
+        self._steps += 1
+        if self._steps % self.interval:
+            return
+        candidates = self.far_wake(stepper)
+        if len(candidates) == 0:
+            return
+        wake = stepper.wake
+        pos = wake.positions
+        gam = wake.strengths
+        if self.lump_size is None:
+            new_pos, new_gam = pos, gam
+            keep = np.ones(len(wake), dtype=bool)
+            keep[candidates] = False
+        else:
+            new_pos, new_gam, keep = _merge_cells(pos, gam, candidates,
+                                                  self.lump_size)
+        num_removed = len(wake) - np.count_nonzero(keep)
+        if num_removed == 0:
+            return
+        # velocity at collocation points due to the far wake, before and
+        # after
+        bound = stepper.bound
+        if bound is not None:
+            xcoll = bound.collocation_pts
+            motion = bound.body.get_motion()
+            if motion:
+                xcoll = motion.map_position(xcoll)
+            lumped = candidates[keep[candidates]]
+            before = Vortices(pos[candidates], gam[candidates])
+            after = Vortices(new_pos[lumped], new_gam[lumped])
+            before.core_radius = after.core_radius = wake.core_radius
+            err = (before.induced_velocity(xcoll) -
+                   after.induced_velocity(xcoll))
+            self.last_error = np.max(np.sqrt(np.sum(err * err, 1)))
+            self.max_error = max(self.max_error, self.last_error)
+        self.num_removed += num_removed
+        stepper.replace_wake(new_pos[keep], new_gam[keep],
+                             np.flatnonzero(keep))
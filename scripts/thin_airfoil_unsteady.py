@@ -37,17 +37,13 @@ print("Ratio of last vortex strength to circulation: %f" %
       (stepper.wake.strengths[-1] / stepper.wake.circulation))
 s, gam, dgam = compute_gam(body, stepper.bound.vortices)
 
-pts = body.get_points()
-mid = pts[:-1]+0.5*np.diff(pts, axis=0)
-xmid = mid[:,0]
-rho = 1
-qinf = 0.5*rho*(Uinfty[0]**2+Uinfty[1]**2)
-# See Kuethe and Chow for the following pressure coefficient formula
-cp = -rho*np.linalg.norm(Uinfty)*gam/qinf
-print('xmid',xmid)
+# pressure difference across the plate, from the unsteady Bernoulli equation
+xcoll = body.get_motion().map_position(bound.collocation_pts)[:,0]
+cp = bound.pressure_coefficient(Uinfty)
+print('xcoll',xcoll)
 print('cp',cp)
 plt.subplot(211)
-plt.plot(xmid,cp,'x')
+plt.plot(xcoll,cp,'x')
 plt.xlabel('Distance along chord')
 plt.ylabel('$C_p$')
 plt.title('Computed coefficient of pressure, AoA = %.1f deg' % alpha_deg)